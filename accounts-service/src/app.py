@@ -1,18 +1,55 @@
-from flask import Flask, jsonify, request, abort
+import time
+
+_import_started = time.perf_counter()
+
+import os
+import sys
+
+# Add the current directory to sys.path
+current_dir = os.path.dirname(os.path.abspath(__file__))
+if current_dir not in sys.path:
+    sys.path.insert(0, current_dir)
+
+from flask import Blueprint, Flask, current_app, jsonify, request, abort
 from flask_sqlalchemy import SQLAlchemy
 import logging
+import re
+from config import get_config
+from banking_common.scheduler import Scheduler, register_maintenance_jobs
+from banking_common.ratelimit import init_rate_limiting
+from banking_common.tracing import init_tracing
+from banking_common.profiling import init_profiling
+from banking_common.sharding import init_sharding
+from banking_common.wire import render
+from closures import init_closures
+
+_import_ms = round((time.perf_counter() - _import_started) * 1000, 1)
+
+logger = logging.getLogger(__name__)
+
+db = SQLAlchemy()
+bp = Blueprint('accounts', __name__)
 
-app = Flask(__name__)
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///accounts.db'
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-db = SQLAlchemy(app)
+_currency_pattern = re.compile(r'^[A-Z]{3}$')
 
 class Account(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, nullable=False)
     balance = db.Column(db.Float, default=0.0)
+    # ISO 4217 code; balances and the account's transactions are in this currency
+    currency = db.Column(db.String(3), nullable=False, default='USD', server_default='USD')
+    # 'open', or 'closing' while a deletion archives the account's transactions
+    status = db.Column(db.String(16), nullable=False, default='open', server_default='open')
+    archived_transactions = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    transactions_remaining = db.Column(db.Integer)
 
-@app.route('/accounts', methods=['POST'])
+def _session_for(account_id):
+    router = current_app.extensions.get('shard_router')
+    if router is None:
+        return db.session
+    return router.session_for(account_id)
+
+@bp.route('/accounts', methods=['POST'])
 def create_account():
     data = request.json
     if not data or 'user_id' not in data:
@@ -25,54 +62,144 @@ def create_account():
         initial_balance = 0
     if  initial_balance < 0:
         return jsonify({'error': 'Initial balance cannot be negative'}), 400
+    currency = data.get('currency', current_app.config['DEFAULT_CURRENCY'])
+    if not isinstance(currency, str) or not _currency_pattern.match(currency):
+        return jsonify({'error': 'Currency must be a three letter ISO 4217 code'}), 400
 
     try:
-        new_account = Account(user_id=data['user_id'], balance=data.get('initial_balance', 0.0))
-        db.session.add(new_account)
-        db.session.commit()
-        return jsonify({'id': new_account.id, 'user_id': new_account.user_id, 'balance': new_account.balance}), 201
+        new_account = Account(user_id=data['user_id'], balance=data.get('initial_balance', 0.0), currency=currency)
+        router = current_app.extensions.get('shard_router')
+        if router is not None:
+            # New accounts are placed by owner, their id then routes back to that shard
+            router.insert(new_account, data['user_id'])
+        else:
+            db.session.add(new_account)
+            db.session.commit()
+        return render({'id': new_account.id, 'user_id': new_account.user_id, 'balance': new_account.balance,
+                       'currency': new_account.currency}, 201)
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
 
-@app.route('/accounts/<int:account_id>', methods=['GET'])
+@bp.route('/accounts/<int:account_id>', methods=['GET'])
 def get_account(account_id):
-    account = Account.query.get(account_id)
+    account = _session_for(account_id).get(Account, account_id)
     if account is None:
         return jsonify({'error': 'Account does not exist'}), 404
-    return jsonify({'id': account.id, 'user_id': account.user_id, 'balance': account.balance})
+    return render({'id': account.id, 'user_id': account.user_id, 'balance': account.balance,
+                   'currency': account.currency, 'status': account.status})
 
-@app.route('/accounts/<int:account_id>/balance', methods=['PUT'])
+@bp.route('/accounts/<int:account_id>/balance', methods=['PUT'])
 def update_balance(account_id):
-    account = Account.query.get_or_404(account_id)
+    session = _session_for(account_id)
+    account = session.get(Account, account_id)
+    if account is None:
+        abort(404)
     data = request.json
     if not data or 'balance' not in data:
         return jsonify({'error': 'Invalid input'}), 400
     if data['balance'] < 0:
         return jsonify({'error': 'Invalid input'}), 400
+    if account.status != 'open':
+        return jsonify({'error': 'Account is being closed'}), 409
 
     try:
         account.balance = data['balance']
-        db.session.commit()
-        return jsonify({'id': account.id, 'user_id': account.user_id, 'balance': account.balance})
+        session.commit()
+        return render({'id': account.id, 'user_id': account.user_id, 'balance': account.balance})
     except Exception as e:
-        db.session.rollback()
+        session.rollback()
         return jsonify({'error': str(e)}), 500
 
-@app.route('/accounts/<int:account_id>', methods=['DELETE'])
+@bp.route('/accounts/<int:account_id>', methods=['DELETE'])
 def delete_account(account_id):
-    account = Account.query.get(account_id)
+    session = _session_for(account_id)
+    account = session.get(Account, account_id)
+    if account is None:
+        return jsonify({'error': 'Account does not exist'}), 404
+    # Archiving the account's transactions can take long, so it is left to
+    # the account_closures job, which deletes the account once it is done
+    if account.status != 'closing':
+        account.status = 'closing'
+        session.commit()
+    response = jsonify(_closure_progress(account))
+    response.headers['Location'] = f'/accounts/{account_id}/closure'
+    return response, 202
+
+@bp.route('/accounts/<int:account_id>/closure', methods=['GET'])
+def get_closure(account_id):
+    account = _session_for(account_id).get(Account, account_id)
     if account is None:
         return jsonify({'error': 'Account does not exist'}), 404
-    db.session.delete(account)
-    db.session.commit()
-    return jsonify({'message': 'Account deleted successfully'}), 200
+    if account.status != 'closing':
+        return jsonify({'error': 'Account is not being closed'}), 404
+    return jsonify(_closure_progress(account)), 200
+
+def _closure_progress(account):
+    return {
+        'id': account.id,
+        'status': account.status,
+        'archived_transactions': account.archived_transactions or 0,
+        'transactions_remaining': account.transactions_remaining
+    }
+
+@bp.route('/maintenance/jobs', methods=['GET'])
+def list_jobs():
+    return jsonify({'jobs': current_app.extensions['scheduler'].metrics()}), 200
+
+@bp.route('/health', methods=['GET'])
+def health():
+    return jsonify({
+        'status': 'ok',
+        'import_ms': current_app.config['IMPORT_MS'],
+        'boot_ms': current_app.config['BOOT_MS']
+    }), 200
+
+def init_db(app):
+    with app.app_context():
+        db.create_all()
+
+def _reloader_watcher():
+    # `python app.py` runs under the debug reloader: this first process only
+    # watches files, and the child it starts with WERKZEUG_RUN_MAIN set serves
+    return __name__ == '__main__' and os.environ.get('WERKZEUG_RUN_MAIN') != 'true'
+
+def create_app(config_name=None):
+    boot_started = time.perf_counter()
+    app = Flask(__name__)
+    app.config.from_object(get_config(config_name))
+
+    # Engines connect lazily; the only query at boot is create_all when CREATE_SCHEMA is set
+    db.init_app(app)
+    init_sharding(app, db.metadata)
+    if app.config['MIGRATIONS_ENABLED']:
+        from flask_migrate import Migrate
+        Migrate(app, db)
+
+    init_tracing(app)
+    init_profiling(app)
+
+    scheduler = Scheduler(max_workers=app.config['SCHEDULER_MAX_WORKERS'])
+    register_maintenance_jobs(scheduler, app, db)
+    init_rate_limiting(app, scheduler)
+    init_closures(app, db, Account, scheduler)
+    app.extensions['scheduler'] = scheduler
+
+    app.register_blueprint(bp)
+
+    if app.config['CREATE_SCHEMA']:
+        init_db(app)
+
+    # Jobs run in every serving process, whatever server started it
+    if app.config['SCHEDULER_ENABLED'] and not _reloader_watcher():
+        scheduler.start()
+
+    app.config['IMPORT_MS'] = _import_ms
+    app.config['BOOT_MS'] = round((time.perf_counter() - boot_started) * 1000, 1)
+    logger.info('App created in %.1f ms (imports took %.1f ms)', app.config['BOOT_MS'], app.config['IMPORT_MS'])
+    return app
 
-def init_db():
-    db.create_all()
+app = create_app()
 
 if __name__ == '__main__':
-    init_db()
-    app.run(debug=True, host='0.0.0.0', port=5001)
-else:
-    init_db()
\ No newline at end of file
+    app.run(debug=True, host='0.0.0.0', port=5001)
\ No newline at end of file
@@ -0,0 +1,105 @@
+import json
+import logging
+import urllib.request
+
+from flask import current_app
+
+from banking_common.service_auth import service_headers
+from banking_common.tracing import inject_headers
+
+logger = logging.getLogger(__name__)
+
+
+class TransactionsClient:
+    """The part of the transactions-service API used to close accounts."""
+
+    def __init__(self, base_url, token, timeout=30.0):
+        self.base_url = base_url.rstrip('/')
+        self.token = token
+        self.timeout = timeout
+
+    def archive(self, account_id, limit):
+        body = json.dumps({'account_id': account_id, 'limit': limit, 'account_status': 'closing'}).encode('utf-8')
+        headers = service_headers(self.token, {
+            'Content-Type': 'application/json',
+            'Accept': 'application/json'
+        })
+        req = urllib.request.Request(f'{self.base_url}/transactions/archive', data=body,
+                                     headers=inject_headers(headers))
+        with urllib.request.urlopen(req, timeout=self.timeout) as response:
+            return json.loads(response.read())
+
+
+class ClosureWorker:
+    """Finishes closing accounts that were marked ``closing`` by a delete.
+
+    Each run archives the transactions of every closing account in
+    batches of ``batch_size``, at most ``max_batches`` per account, and
+    records progress on the account row after every batch. Accounts with
+    nothing left are deleted. Progress lives in the database, so a
+    restarted worker carries on where the last one stopped.
+    """
+
+    def __init__(self, app, db, model, client, batch_size=1000, max_batches=20):
+        self.app = app
+        self.db = db
+        self.model = model
+        self.client = client
+        self.batch_size = batch_size
+        self.max_batches = max_batches
+        self.closed = 0
+        self.batches = 0
+
+    def _sessions(self):
+        router = current_app.extensions.get('shard_router')
+        if router is None:
+            return [self.db.session]
+        return [router.session(shard) for shard in range(len(router))]
+
+    def run(self):
+        with self.app.app_context():
+            tracer = current_app.extensions.get('tracer')
+            for session in self._sessions():
+                closing = session.query(self.model).filter_by(status='closing').order_by(self.model.id).all()
+                for account in closing:
+                    # Each closure is a trace of its own, carried into transactions-service
+                    span = tracer.start_trace('account_closure', {'account.id': account.id}) if tracer else None
+                    error = None
+                    try:
+                        self.close(session, account)
+                    except Exception as e:
+                        error = e
+                        session.rollback()
+                        logger.warning(f'Closing account {account.id} failed: {str(e)}')
+                    finally:
+                        if tracer is not None:
+                            tracer.end_span(span, error=error)
+
+    def close(self, session, account):
+        """Archive up to ``max_batches`` batches; returns True once the account is gone."""
+        for _ in range(self.max_batches):
+            result = self.client.archive(account.id, self.batch_size)
+            self.batches += 1
+            account.archived_transactions = (account.archived_transactions or 0) + result['archived']
+            account.transactions_remaining = result['remaining']
+            session.commit()
+            if result['remaining'] == 0:
+                account_id, archived = account.id, account.archived_transactions
+                session.delete(account)
+                session.commit()
+                self.closed += 1
+                logger.info('Closed account %s after archiving %d transactions', account_id, archived)
+                return True
+        return False
+
+
+def init_closures(app, db, model, scheduler):
+    worker = ClosureWorker(
+        app, db, model,
+        TransactionsClient(app.config['TRANSACTIONS_SERVICE_URL'], app.config['SERVICE_TOKEN']),
+        batch_size=app.config['CLOSURE_BATCH_SIZE'],
+        max_batches=app.config['CLOSURE_MAX_BATCHES']
+    )
+    app.extensions['account_closures'] = worker
+    scheduler.add_job('account_closures', worker.run, interval=app.config['CLOSURE_INTERVAL'])
+    return worker
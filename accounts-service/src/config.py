@@ -0,0 +1,75 @@
+import os
+
+
+class Config:
+    SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL', 'sqlite:///accounts.db')
+    SQLALCHEMY_TRACK_MODIFICATIONS = False
+    # Create missing tables at boot. Production schemas are managed by migrations.
+    CREATE_SCHEMA = True
+    # Flask-Migrate pulls in alembic, so only load it where `flask db` is used
+    MIGRATIONS_ENABLED = True
+    # Set SCHEDULER_ENABLED=0 on all but one process to run the jobs only once
+    SCHEDULER_ENABLED = os.environ.get('SCHEDULER_ENABLED', '1') == '1'
+    SCHEDULER_MAX_WORKERS = 1
+    RATE_LIMIT_ENABLED = True
+    # Reverse proxies in front of the app whose X-Forwarded-For names the
+    # client that rate limits are keyed on
+    RATE_LIMIT_TRUSTED_PROXIES = int(os.environ.get('RATE_LIMIT_TRUSTED_PROXIES', '0'))
+    # Database URIs to spread rows over by account id, e.g.
+    # SHARD_URIS=sqlite:///shard0.db,sqlite:///shard1.db. Unset means a single database.
+    SHARD_URIS = [uri for uri in os.environ.get('SHARD_URIS', '').split(',') if uri]
+    SERVICE_NAME = 'accounts-service'
+    # 'file' writes JSON lines to TRACING_FILE, 'otlp' posts to a local collector, unset disables tracing
+    TRACING_EXPORTER = os.environ.get('TRACING_EXPORTER')
+    TRACING_SAMPLE_RATE = float(os.environ.get('TRACING_SAMPLE_RATE', '0.01'))
+    TRACING_FILE = os.environ.get('TRACING_FILE', 'traces.jsonl')
+    TRACING_OTLP_ENDPOINT = os.environ.get('TRACING_OTLP_ENDPOINT', 'http://localhost:4318/v1/traces')
+    # Sampling profiler at /admin/profile, enabled by setting a token
+    PROFILER_TOKEN = os.environ.get('PROFILER_TOKEN')
+    PROFILER_MAX_SECONDS = 60
+    # Always-on mode keeps sampling the stacks of a fraction of requests
+    PROFILER_ALWAYS_ON = os.environ.get('PROFILER_ALWAYS_ON') == '1'
+    PROFILER_REQUEST_SAMPLE_RATE = float(os.environ.get('PROFILER_REQUEST_SAMPLE_RATE', '0.01'))
+    # Shared secret the services authenticate calls to each other with,
+    # sent along with every archive request
+    SERVICE_TOKEN = os.environ.get('SERVICE_TOKEN')
+    # Currency of accounts created without one
+    DEFAULT_CURRENCY = 'USD'
+    # Deleted accounts are closed in the background: their transactions are
+    # archived by transactions-service in batches, at most
+    # CLOSURE_MAX_BATCHES per account on every run of the job
+    TRANSACTIONS_SERVICE_URL = os.environ.get('TRANSACTIONS_SERVICE_URL', 'http://localhost:5001')
+    CLOSURE_INTERVAL = 5
+    CLOSURE_BATCH_SIZE = 1000
+    CLOSURE_MAX_BATCHES = 20
+
+
+class DevelopmentConfig(Config):
+    DEBUG = True
+    SERVICE_TOKEN = os.environ.get('SERVICE_TOKEN', 'dev-service-token')
+    RATE_LIMIT_ENABLED = False
+
+
+class TestingConfig(Config):
+    TESTING = True
+    SQLALCHEMY_DATABASE_URI = 'sqlite:///:memory:'
+    SERVICE_TOKEN = 'test-service-token'
+    MIGRATIONS_ENABLED = False
+    SCHEDULER_ENABLED = False
+    RATE_LIMIT_ENABLED = False
+
+
+class ProductionConfig(Config):
+    CREATE_SCHEMA = False
+    MIGRATIONS_ENABLED = os.environ.get('MIGRATIONS_ENABLED') == '1'
+
+
+configs = {
+    'development': DevelopmentConfig,
+    'testing': TestingConfig,
+    'production': ProductionConfig
+}
+
+
+def get_config(name=None):
+    return configs[name or os.environ.get('APP_ENV', 'development')]
@@ -0,0 +1,112 @@
+import json
+import pytest
+
+from closures import TransactionsClient
+from banking_common.tracing import FileExporter, Tracer, format_traceparent
+
+
+class FakeTransactions:
+    """Stands in for transactions-service, holding a number of rows per account."""
+
+    def __init__(self, counts, fail=False):
+        self.counts = dict(counts)
+        self.fail = fail
+        self.calls = []
+
+    def archive(self, account_id, limit):
+        self.calls.append((account_id, limit))
+        if self.fail:
+            raise OSError('Connection refused')
+        archived = min(limit, self.counts.get(account_id, 0))
+        self.counts[account_id] = self.counts.get(account_id, 0) - archived
+        return {'account_id': account_id, 'archived': archived, 'remaining': self.counts[account_id]}
+
+
+@pytest.fixture
+def worker(app, monkeypatch):
+    worker = app.extensions['account_closures']
+    monkeypatch.setattr(worker, 'batch_size', 10)
+    monkeypatch.setattr(worker, 'max_batches', 2)
+    return worker
+
+def create_account(client, user_id=1):
+    response = client.post('/accounts', json={'user_id': user_id, 'initial_balance': 100})
+    assert response.status_code == 201
+    return response.get_json()['id']
+
+def test_delete_marks_account_closing(client):
+    account_id = create_account(client)
+    response = client.delete(f'/accounts/{account_id}')
+    assert response.status_code == 202
+    assert response.headers['Location'] == f'/accounts/{account_id}/closure'
+    assert response.get_json()['status'] == 'closing'
+
+    # Repeating the delete doesn't start over
+    assert client.delete(f'/accounts/{account_id}').status_code == 202
+    assert client.get(f'/accounts/{account_id}').get_json()['status'] == 'closing'
+    assert client.put(f'/accounts/{account_id}/balance', json={'balance': 5}).status_code == 409
+
+def test_worker_archives_in_batches(client, worker, monkeypatch):
+    closing = create_account(client, user_id=1)
+    untouched = create_account(client, user_id=2)
+    transactions = FakeTransactions({closing: 35, untouched: 5})
+    monkeypatch.setattr(worker, 'client', transactions)
+    client.delete(f'/accounts/{closing}')
+
+    # Two batches per run, then progress is reported
+    worker.run()
+    assert transactions.calls == [(closing, 10), (closing, 10)]
+    progress = client.get(f'/accounts/{closing}/closure').get_json()
+    assert progress['archived_transactions'] == 20
+    assert progress['transactions_remaining'] == 15
+
+    worker.run()
+    assert client.get(f'/accounts/{closing}').status_code == 404
+    assert client.get(f'/accounts/{closing}/closure').status_code == 404
+    assert client.get(f'/accounts/{untouched}').status_code == 200
+    assert transactions.counts == {closing: 0, untouched: 5}
+    assert worker.closed == 1
+
+def test_worker_retries_after_failure(client, worker, monkeypatch):
+    account_id = create_account(client)
+    monkeypatch.setattr(worker, 'client', FakeTransactions({account_id: 5}, fail=True))
+    client.delete(f'/accounts/{account_id}')
+
+    worker.run()
+    assert client.get(f'/accounts/{account_id}').get_json()['status'] == 'closing'
+
+    worker.client.fail = False
+    worker.run()
+    assert client.get(f'/accounts/{account_id}').status_code == 404
+
+def test_client_authenticates_and_propagates_the_trace(tmp_path, monkeypatch):
+    sent = []
+
+    class Response:
+        def __init__(self, body):
+            self.body = body
+        def __enter__(self):
+            return self
+        def __exit__(self, *exc):
+            return False
+        def read(self):
+            return self.body
+
+    def urlopen(req, timeout):
+        sent.append(req)
+        return Response(b'{"account_id": 7, "archived": 1, "remaining": 0}')
+
+    monkeypatch.setattr('closures.urllib.request.urlopen', urlopen)
+    tracer = Tracer(FileExporter(str(tmp_path / 'traces.jsonl'), 'accounts-service'), sample_rate=1.0)
+    span = tracer.start_trace('account_closure')
+    try:
+        result = TransactionsClient('http://transactions/', 'secret').archive(7, 50)
+    finally:
+        tracer.end_span(span)
+
+    assert result['remaining'] == 0
+    req = sent[0]
+    assert req.full_url == 'http://transactions/transactions/archive'
+    assert req.get_header('Authorization') == 'Bearer secret'
+    assert req.get_header('Traceparent') == format_traceparent(span)
+    assert json.loads(req.data) == {'account_id': 7, 'limit': 50, 'account_status': 'closing'}
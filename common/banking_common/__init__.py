@@ -0,0 +1,6 @@
+"""Infrastructure shared by the accounts and transactions services.
+
+Scheduling, rate limiting, tracing, profiling, sharding, response
+encoding and service-to-service authentication live here once and are
+installed into both service images.
+"""
@@ -0,0 +1,184 @@
+import hmac
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter
+
+from flask import Blueprint, Response, abort, current_app, jsonify, request
+
+MAX_DEPTH = 128
+
+admin = Blueprint('profiling', __name__)
+
+
+def _frame_name(frame):
+    code = frame.f_code
+    return f'{os.path.basename(code.co_filename)}:{code.co_name}'
+
+
+def collapse(frame, max_depth=MAX_DEPTH):
+    """One stack as a ``root;...;leaf`` line, the format flamegraph tools read."""
+    names = []
+    while frame is not None and len(names) < max_depth:
+        names.append(_frame_name(frame))
+        frame = frame.f_back
+    return ';'.join(reversed(names))
+
+
+def format_collapsed(counts):
+    return ''.join(f'{stack} {count}\n' for stack, count in counts.most_common())
+
+
+class StackSampler:
+    """Counts the stacks of running threads by polling them from a thread of its own.
+
+    Sampling from a thread instead of a profiling signal sees every
+    request thread, not only the main one, and costs nothing between
+    samples.
+    """
+
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self.counts = Counter()
+        self.samples = 0
+        self._lock = threading.Lock()
+
+    def sample(self, thread_ids=None, exclude=()):
+        frames = sys._current_frames()
+        own = threading.get_ident()
+        stacks = [collapse(frame) for thread_id, frame in frames.items()
+                  if thread_id != own and thread_id not in exclude
+                  and (thread_ids is None or thread_id in thread_ids)]
+        with self._lock:
+            self.counts.update(stacks)
+            self.samples += 1
+
+    def run_for(self, seconds, exclude=()):
+        """Sample every thread but the excluded ones for ``seconds``, on the calling thread."""
+        deadline = time.monotonic() + seconds
+        while time.monotonic() < deadline:
+            self.sample(exclude=exclude)
+            time.sleep(self.interval)
+        return self.counts
+
+    def snapshot(self, reset=False):
+        with self._lock:
+            counts, samples = Counter(self.counts), self.samples
+            if reset:
+                self.counts.clear()
+                self.samples = 0
+        return counts, samples
+
+
+class RequestProfiler(StackSampler):
+    """Always-on mode: samples the threads serving a fraction of requests.
+
+    A background thread polls only the threads of requests picked at
+    ``sample_rate``, so the other requests pay for one random draw.
+    """
+
+    def __init__(self, sample_rate=0.01, interval=0.01, max_stacks=10000):
+        super().__init__(interval)
+        self.sample_rate = sample_rate
+        self.max_stacks = max_stacks
+        self.profiled_requests = 0
+        self._active = set()
+        self._thread = threading.Thread(target=self._loop, name='request-profiler', daemon=True)
+        self._thread.start()
+
+    def start_request(self):
+        if random.random() >= self.sample_rate:
+            return False
+        with self._lock:
+            self._active.add(threading.get_ident())
+            self.profiled_requests += 1
+        return True
+
+    def end_request(self):
+        with self._lock:
+            self._active.discard(threading.get_ident())
+
+    def _loop(self):
+        while True:
+            time.sleep(self.interval)
+            with self._lock:
+                active = set(self._active)
+                full = len(self.counts) >= self.max_stacks
+            if active and not full:
+                self.sample(thread_ids=active)
+
+
+def _authorize():
+    token = current_app.config.get('PROFILER_TOKEN')
+    if not token:
+        abort(404)
+    scheme, _, supplied = request.headers.get('Authorization', '').partition(' ')
+    if scheme.lower() != 'bearer' or not hmac.compare_digest(supplied.encode(), token.encode()):
+        return jsonify({'error': 'Invalid profiler token'}), 401
+    return None
+
+
+def _collapsed_response(counts, samples):
+    response = Response(format_collapsed(counts), mimetype='text/plain')
+    response.headers['X-Profile-Samples'] = str(samples)
+    return response
+
+
+@admin.route('/admin/profile', methods=['GET'])
+def profile():
+    denied = _authorize()
+    if denied is not None:
+        return denied
+    seconds = request.args.get('seconds', 5.0, type=float)
+    interval = request.args.get('interval', 0.005, type=float)
+    if not 0 < seconds <= current_app.config['PROFILER_MAX_SECONDS'] or not 0.001 <= interval <= 1:
+        return jsonify({'error': 'Invalid profiling parameters'}), 400
+
+    lock = current_app.extensions['profiler_lock']
+    if not lock.acquire(blocking=False):
+        return jsonify({'error': 'A profile is already running'}), 409
+    try:
+        sampler = StackSampler(interval)
+        # This thread only waits on the sampler, leave it out of the profile
+        sampler.run_for(seconds, exclude={threading.get_ident()})
+    finally:
+        lock.release()
+    return _collapsed_response(*sampler.snapshot())
+
+
+@admin.route('/admin/profile/requests', methods=['GET'])
+def request_profile():
+    denied = _authorize()
+    if denied is not None:
+        return denied
+    profiler = current_app.extensions.get('request_profiler')
+    if profiler is None:
+        return jsonify({'error': 'Request profiling is disabled'}), 404
+    return _collapsed_response(*profiler.snapshot(reset=request.args.get('reset') == '1'))
+
+
+def init_profiling(app):
+    app.config.setdefault('PROFILER_TOKEN', None)
+    app.config.setdefault('PROFILER_MAX_SECONDS', 60)
+    app.config.setdefault('PROFILER_ALWAYS_ON', False)
+    app.config.setdefault('PROFILER_REQUEST_SAMPLE_RATE', 0.01)
+    app.extensions['profiler_lock'] = threading.Lock()
+    app.register_blueprint(admin)
+
+    if not app.config['PROFILER_ALWAYS_ON']:
+        return None
+    profiler = RequestProfiler(app.config['PROFILER_REQUEST_SAMPLE_RATE'])
+    app.extensions['request_profiler'] = profiler
+
+    @app.before_request
+    def start_request_profile():
+        request.environ['profiling.sampled'] = profiler.start_request()
+
+    @app.teardown_request
+    def end_request_profile(exc):
+        if request.environ.pop('profiling.sampled', False):
+            profiler.end_request()
+
+    return profiler
@@ -0,0 +1,224 @@
+import math
+import sqlite3
+import threading
+import time
+
+from flask import current_app, jsonify, request
+from werkzeug.middleware.proxy_fix import ProxyFix
+
+
+class MemoryStore:
+    """Token buckets held in process memory."""
+
+    def __init__(self):
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def consume(self, key, rate, burst, cost=1, now=None):
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            tokens, updated = self._buckets.get(key, (burst, now))
+            tokens = min(burst, tokens + (now - updated) * rate)
+            allowed = tokens >= cost
+            if allowed:
+                tokens -= cost
+            self._buckets[key] = (tokens, now)
+        return allowed, 0.0 if allowed else (cost - tokens) / rate
+
+    def prune(self, max_idle, now=None):
+        """Drop buckets untouched for ``max_idle`` seconds; they have refilled anyway."""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            idle = [key for key, (_, updated) in self._buckets.items() if now - updated >= max_idle]
+            for key in idle:
+                del self._buckets[key]
+        return len(idle)
+
+    def __len__(self):
+        return len(self._buckets)
+
+
+class SQLiteStore:
+    """Token buckets in a local SQLite file, shared by every worker process on the host."""
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        connection = self._connection()
+        connection.execute(
+            'CREATE TABLE IF NOT EXISTS buckets (key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL)'
+        )
+
+    def _connection(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=1.0, isolation_level=None)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=OFF')
+            self._local.connection = connection
+        return connection
+
+    def consume(self, key, rate, burst, cost=1, now=None):
+        # Wall clock, since monotonic clocks are not comparable across processes
+        now = time.time() if now is None else now
+        connection = self._connection()
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            row = connection.execute('SELECT tokens, updated FROM buckets WHERE key = ?', (key,)).fetchone()
+            tokens, updated = row if row else (burst, now)
+            tokens = min(burst, tokens + max(0.0, now - updated) * rate)
+            allowed = tokens >= cost
+            if allowed:
+                tokens -= cost
+            connection.execute('INSERT OR REPLACE INTO buckets (key, tokens, updated) VALUES (?, ?, ?)',
+                               (key, tokens, now))
+            connection.execute('COMMIT')
+        except Exception:
+            connection.execute('ROLLBACK')
+            raise
+        return allowed, 0.0 if allowed else (cost - tokens) / rate
+
+    def prune(self, max_idle, now=None):
+        now = time.time() if now is None else now
+        return self._connection().execute('DELETE FROM buckets WHERE updated <= ?', (now - max_idle,)).rowcount
+
+    def __len__(self):
+        return self._connection().execute('SELECT COUNT(*) FROM buckets').fetchone()[0]
+
+
+class LoadShedder:
+    """Tracks requests in flight so overload is answered early instead of queued."""
+
+    def __init__(self):
+        self.in_flight = 0
+        self.shed = 0
+        self._lock = threading.Lock()
+
+    def enter(self, max_in_flight):
+        with self._lock:
+            if max_in_flight and self.in_flight >= max_in_flight:
+                self.shed += 1
+                return False
+            self.in_flight += 1
+            return True
+
+    def leave(self):
+        with self._lock:
+            self.in_flight -= 1
+
+    def reject(self):
+        with self._lock:
+            self.shed += 1
+
+
+def queue_time(header, now=None):
+    """Seconds a request waited in the proxy, from an ``X-Request-Start`` header.
+
+    Accepts ``t=<timestamp>`` in seconds, milliseconds or microseconds.
+    """
+    if not header:
+        return None
+    header = header.strip()
+    if header.startswith('t='):
+        header = header[2:]
+    try:
+        started = float(header)
+    except ValueError:
+        return None
+    if started > 1e14:
+        started /= 1e6
+    elif started > 1e11:
+        started /= 1e3
+    now = time.time() if now is None else now
+    return max(0.0, now - started)
+
+
+def _account_id():
+    if request.view_args and 'account_id' in request.view_args:
+        return request.view_args['account_id']
+    if 'account_id' in request.args:
+        return request.args.get('account_id')
+    data = request.get_json(silent=True)
+    if isinstance(data, dict):
+        return data.get('account_id')
+    return None
+
+
+def _client_id():
+    # Never a header the caller picks, or every request could claim a
+    # fresh bucket. Behind proxies, RATE_LIMIT_TRUSTED_PROXIES makes this
+    # the address the nearest trusted proxy saw.
+    return request.remote_addr
+
+
+def _max_idle(config):
+    # Time for the slowest bucket to refill from empty, after which an
+    # idle bucket is indistinguishable from a new one
+    return max(burst / rate for rate, burst in (config['RATE_LIMIT_CLIENT'], config['RATE_LIMIT_ACCOUNT']))
+
+
+def _rejected(status, message, retry_after):
+    response = jsonify({'error': message})
+    response.status_code = status
+    response.headers['Retry-After'] = str(max(1, math.ceil(retry_after)))
+    return response
+
+
+def init_rate_limiting(app, scheduler=None):
+    app.config.setdefault('RATE_LIMIT_ENABLED', True)
+    # (tokens per second, burst size)
+    app.config.setdefault('RATE_LIMIT_CLIENT', (50, 100))
+    app.config.setdefault('RATE_LIMIT_ACCOUNT', (20, 40))
+    # Path of a SQLite file to share buckets between worker processes
+    app.config.setdefault('RATE_LIMIT_STORE_PATH', None)
+    app.config.setdefault('LOAD_SHED_MAX_IN_FLIGHT', 64)
+    app.config.setdefault('LOAD_SHED_MAX_QUEUE_TIME', 1.0)
+    app.config.setdefault('RATE_LIMIT_EXEMPT', ('/health',))
+    app.config.setdefault('RATE_LIMIT_TRUSTED_PROXIES', 0)
+    app.config.setdefault('RATE_LIMIT_PRUNE_INTERVAL', 300)
+
+    if app.config['RATE_LIMIT_TRUSTED_PROXIES']:
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=app.config['RATE_LIMIT_TRUSTED_PROXIES'])
+
+    path = app.config['RATE_LIMIT_STORE_PATH']
+    store = SQLiteStore(path) if path else MemoryStore()
+    shedder = LoadShedder()
+    app.extensions['rate_limiter'] = store
+    app.extensions['load_shedder'] = shedder
+    if scheduler is not None:
+        scheduler.add_job('rate_limit_prune', lambda: store.prune(_max_idle(app.config)),
+                          interval=app.config['RATE_LIMIT_PRUNE_INTERVAL'], jitter=30)
+
+    @app.before_request
+    def limit_request():
+        config = current_app.config
+        if not config['RATE_LIMIT_ENABLED'] or request.path in config['RATE_LIMIT_EXEMPT']:
+            return None
+
+        max_queue_time = config['LOAD_SHED_MAX_QUEUE_TIME']
+        waited = queue_time(request.headers.get('X-Request-Start'))
+        if max_queue_time and waited is not None and waited > max_queue_time:
+            shedder.reject()
+            return _rejected(503, 'Service overloaded', 1)
+
+        rate, burst = config['RATE_LIMIT_CLIENT']
+        allowed, retry_after = store.consume(f'client:{_client_id()}', rate, burst)
+        if not allowed:
+            return _rejected(429, 'Too many requests', retry_after)
+
+        account_id = _account_id()
+        if account_id is not None:
+            rate, burst = config['RATE_LIMIT_ACCOUNT']
+            allowed, retry_after = store.consume(f'account:{account_id}', rate, burst)
+            if not allowed:
+                return _rejected(429, 'Too many requests for this account', retry_after)
+
+        if not shedder.enter(config['LOAD_SHED_MAX_IN_FLIGHT']):
+            return _rejected(503, 'Service overloaded', 1)
+        request.environ['ratelimit.entered'] = True
+        return None
+
+    @app.teardown_request
+    def release_request(exc):
+        if request.environ.pop('ratelimit.entered', False):
+            shedder.leave()
@@ -0,0 +1,181 @@
+import logging
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from sqlalchemy import text
+
+logger = logging.getLogger(__name__)
+
+
+class Job:
+    def __init__(self, name, func, interval, jitter=0.0):
+        self.name = name
+        self.func = func
+        self.interval = interval
+        self.jitter = jitter
+        self.next_run = None
+        self.running = False
+        self.runs = 0
+        self.failures = 0
+        self.skipped = 0
+        self.last_run_at = None
+        self.last_duration = None
+        self.max_duration = 0.0
+        self.total_duration = 0.0
+        self.last_error = None
+
+    def schedule_next(self, now):
+        # Jitter spreads jobs out so they don't all fire on the same tick
+        self.next_run = now + self.interval + random.uniform(0, self.jitter)
+
+    def metrics(self):
+        return {
+            'name': self.name,
+            'interval': self.interval,
+            'running': self.running,
+            'runs': self.runs,
+            'failures': self.failures,
+            'skipped': self.skipped,
+            'last_run_at': self.last_run_at,
+            'last_duration': self.last_duration,
+            'max_duration': self.max_duration,
+            'avg_duration': self.total_duration / self.runs if self.runs else None,
+            'last_error': self.last_error
+        }
+
+
+class Scheduler:
+    """Runs periodic jobs on a small thread pool, off the request path.
+
+    At most ``max_workers`` jobs run at once and a job never overlaps
+    with itself; a tick that finds it still running is counted as skipped.
+    """
+
+    def __init__(self, max_workers=1, tick=1.0):
+        self.max_workers = max_workers
+        self.tick = tick
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._executor = None
+        self._thread = None
+
+    def add_job(self, name, func, interval, jitter=0.0, run_immediately=False):
+        if name in self._jobs:
+            raise ValueError(f"Job already registered: {name}")
+        job = Job(name, func, interval, jitter)
+        if run_immediately:
+            job.next_run = time.monotonic()
+        else:
+            job.schedule_next(time.monotonic())
+        with self._lock:
+            self._jobs[name] = job
+        return job
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='scheduler')
+        self._thread = threading.Thread(target=self._loop, name='scheduler', daemon=True)
+        self._thread.start()
+        logger.info('Scheduler started with %d job(s)', len(self._jobs))
+
+    def shutdown(self, wait=True):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        if self._executor is not None:
+            self._executor.shutdown(wait=wait)
+            self._executor = None
+
+    def _loop(self):
+        while not self._stop.is_set():
+            self.run_pending()
+            self._stop.wait(self.tick)
+
+    def run_pending(self, now=None):
+        now = time.monotonic() if now is None else now
+        due = []
+        with self._lock:
+            for job in self._jobs.values():
+                if job.next_run > now:
+                    continue
+                job.schedule_next(now)
+                if job.running:
+                    job.skipped += 1
+                    continue
+                job.running = True
+                due.append(job)
+        for job in due:
+            if self._executor is not None:
+                self._executor.submit(self._execute, job)
+            else:
+                self._execute(job)
+        return [job.name for job in due]
+
+    def run_job(self, name):
+        job = self._jobs[name]
+        with self._lock:
+            if job.running:
+                job.skipped += 1
+                return False
+            job.running = True
+        self._execute(job)
+        return True
+
+    def _execute(self, job):
+        started = time.perf_counter()
+        try:
+            job.func()
+            job.last_error = None
+        except Exception as e:
+            job.failures += 1
+            job.last_error = str(e)
+            logger.error(f'Job {job.name} failed: {str(e)}')
+        finally:
+            duration = time.perf_counter() - started
+            with self._lock:
+                job.runs += 1
+                job.last_run_at = time.time()
+                job.last_duration = duration
+                job.total_duration += duration
+                job.max_duration = max(job.max_duration, duration)
+                job.running = False
+
+    def metrics(self):
+        with self._lock:
+            return [job.metrics() for job in self._jobs.values()]
+
+
+def _engines(app, db):
+    # The default database, then every shard when rows are spread over several
+    router = app.extensions.get('shard_router')
+    return [db.engine] + (list(router.engines) if router is not None else [])
+
+
+def analyze(app, db):
+    with app.app_context():
+        for engine in _engines(app, db):
+            with engine.connect() as connection:
+                connection.execute(text('ANALYZE'))
+                connection.commit()
+
+
+def vacuum(app, db):
+    # VACUUM cannot run inside a transaction
+    with app.app_context():
+        for engine in _engines(app, db):
+            with engine.connect().execution_options(isolation_level='AUTOCOMMIT') as connection:
+                connection.execute(text('VACUUM'))
+
+
+def register_maintenance_jobs(scheduler, app, db):
+    jitter = app.config.get('SCHEDULER_JITTER', 30)
+    scheduler.add_job('analyze', lambda: analyze(app, db),
+                      interval=app.config.get('ANALYZE_INTERVAL', 3600), jitter=jitter)
+    scheduler.add_job('vacuum', lambda: vacuum(app, db),
+                      interval=app.config.get('VACUUM_INTERVAL', 24 * 3600), jitter=jitter)
@@ -0,0 +1,27 @@
+"""Authentication of calls between the services.
+
+Endpoints only other services call take ``Authorization: Bearer
+<SERVICE_TOKEN>``, a secret every service is configured with. Without a
+token configured they don't exist.
+"""
+import hmac
+
+from flask import abort, current_app, jsonify, request
+
+
+def authorize_service():
+    """None if the request carries the service token, else the error response."""
+    token = current_app.config.get('SERVICE_TOKEN')
+    if not token:
+        abort(404)
+    scheme, _, supplied = request.headers.get('Authorization', '').partition(' ')
+    if scheme.lower() != 'bearer' or not hmac.compare_digest(supplied.encode(), token.encode()):
+        return jsonify({'error': 'Invalid service token'}), 401
+    return None
+
+
+def service_headers(token, headers=None):
+    """Add the service token to outgoing request headers."""
+    headers = {} if headers is None else headers
+    headers['Authorization'] = f'Bearer {token}'
+    return headers
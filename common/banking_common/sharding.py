@@ -0,0 +1,142 @@
+import contextvars
+import heapq
+from concurrent.futures import ThreadPoolExecutor
+
+from sqlalchemy import Column, Integer, MetaData, String, Table, create_engine, event, func, insert, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import scoped_session, sessionmaker
+
+# The last id handed out for each table on a shard. Ids come from here
+# rather than from max(id), which goes back down when the newest rows are
+# deleted or archived and would hand their ids out again.
+sequences = Table(
+    'shard_sequences', MetaData(),
+    Column('name', String(64), primary_key=True),
+    Column('last_id', Integer, nullable=False)
+)
+
+
+class ShardRouter:
+    """Spreads rows over several databases by a hash of their account id.
+
+    Row ids are allocated so that ``shard_for(id)`` is the shard the row
+    lives on, which lets a lookup by id go straight to one database.
+    Rows of an account are placed with ``shard_for(account_id)``, so an
+    account and its transactions share a shard index in both services.
+    """
+
+    def __init__(self, uris, insert_retries=3):
+        if not uris:
+            raise ValueError("At least one shard URI is required")
+        self.engines = [self._make_engine(uri) for uri in uris]
+        self.sessions = [scoped_session(sessionmaker(bind=engine)) for engine in self.engines]
+        self.insert_retries = insert_retries
+        self._sequences_ready = [False] * len(self.engines)
+        self._executor = ThreadPoolExecutor(max_workers=len(self.engines), thread_name_prefix='shard')
+
+    @staticmethod
+    def _make_engine(uri):
+        engine = create_engine(uri)
+        if engine.dialect.name == 'sqlite':
+            @event.listens_for(engine, 'connect')
+            def set_sqlite_pragmas(connection, record):
+                cursor = connection.cursor()
+                cursor.execute('PRAGMA journal_mode=WAL')
+                cursor.execute('PRAGMA busy_timeout=5000')
+                cursor.close()
+        return engine
+
+    def __len__(self):
+        return len(self.engines)
+
+    def shard_for(self, key):
+        return (key - 1) % len(self.engines)
+
+    def session(self, shard):
+        return self.sessions[shard]()
+
+    def session_for(self, key):
+        return self.session(self.shard_for(key))
+
+    def insert(self, obj, key):
+        """Insert ``obj`` on the shard of ``key`` with an id that routes back to it."""
+        shard = self.shard_for(key)
+        session = self.session(shard)
+        model = type(obj)
+        for attempt in range(self.insert_retries):
+            try:
+                obj.id = self._next_id(session, shard, model)
+                session.add(obj)
+                session.commit()
+                return obj
+            except IntegrityError:
+                session.rollback()
+                if attempt == self.insert_retries - 1:
+                    raise
+            except Exception:
+                session.rollback()
+                raise
+
+    def _next_id(self, session, shard, model):
+        if not self._sequences_ready[shard]:
+            sequences.create(self.engines[shard], checkfirst=True)
+            self._sequences_ready[shard] = True
+        count = len(self.engines)
+        name = model.__tablename__
+        # The UPDATE takes the write lock, so nothing else allocates until this transaction ends
+        bumped = session.execute(
+            update(sequences).where(sequences.c.name == name).values(last_id=sequences.c.last_id + count)
+        ).rowcount
+        if bumped:
+            return session.execute(select(sequences.c.last_id).where(sequences.c.name == name)).scalar_one()
+        # First id on this shard: continue after any rows that are already there.
+        # Two first inserts racing here collide on the primary key and retry.
+        last_id = session.execute(select(func.coalesce(func.max(model.id), shard + 1 - count) + count)).scalar_one()
+        session.execute(insert(sequences).values(name=name, last_id=last_id))
+        return last_id
+
+    def _run(self, shard, func):
+        try:
+            return func(self.session(shard))
+        finally:
+            self.sessions[shard].remove()
+
+    def fan_out(self, func, shards=None):
+        """Run ``func(session)`` on every shard concurrently and return the results in shard order."""
+        shards = list(range(len(self.engines))) if shards is None else list(shards)
+        if len(shards) == 1:
+            return [func(self.session(shards[0]))]
+        # Pool threads don't inherit context variables such as the current
+        # trace span, so each task runs in a copy of the caller's context
+        futures = [self._executor.submit(contextvars.copy_context().run, self._run, shard, func) for shard in shards]
+        return [future.result() for future in futures]
+
+    def create_all(self, metadata):
+        for engine in self.engines:
+            metadata.create_all(engine)
+            sequences.create(engine, checkfirst=True)
+
+    def remove(self):
+        for session in self.sessions:
+            session.remove()
+
+
+def merge_sorted(results, key, reverse=False):
+    """Merge per-shard lists that are each already sorted by ``key``."""
+    return heapq.merge(*results, key=key, reverse=reverse)
+
+
+def init_sharding(app, metadata):
+    uris = app.config.get('SHARD_URIS')
+    if not uris:
+        return None
+    router = ShardRouter(uris)
+    app.extensions['shard_router'] = router
+    if app.config['CREATE_SCHEMA']:
+        router.create_all(metadata)
+
+    @app.teardown_appcontext
+    def remove_shard_sessions(exc):
+        router.remove()
+
+    return router
@@ -0,0 +1,320 @@
+import contextvars
+import json
+import logging
+import os
+import queue
+import re
+import threading
+import time
+import urllib.request
+
+from flask import request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+_current_span = contextvars.ContextVar('current_span', default=None)
+
+_traceparent_pattern = re.compile(r'^([0-9a-f]{2})-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$')
+
+MAX_STATEMENT_LENGTH = 500
+
+
+def parse_traceparent(header):
+    """Parse a W3C ``traceparent`` header into ``(trace_id, parent_id, sampled)``."""
+    if not header:
+        return None
+    match = _traceparent_pattern.match(header.strip().lower())
+    if match is None:
+        return None
+    version, trace_id, parent_id, flags = match.groups()
+    if version == 'ff' or trace_id == '0' * 32 or parent_id == '0' * 16:
+        return None
+    return trace_id, parent_id, bool(int(flags, 16) & 1)
+
+
+def format_traceparent(span):
+    return f'00-{span.trace_id}-{span.span_id}-01'
+
+
+class Span:
+    __slots__ = ('tracer', 'name', 'kind', 'trace_id', 'span_id', 'parent_id', 'start_ns', 'end_ns',
+                 'attributes', 'status', '_token')
+
+    def __init__(self, tracer, name, trace_id, parent_id=None, kind='internal', attributes=None):
+        self.tracer = tracer
+        self.name = name
+        self.kind = kind
+        self.trace_id = trace_id
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent_id
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+        self.attributes = attributes or {}
+        self.status = 'unset'
+        self._token = None
+
+    def to_dict(self):
+        return {
+            'name': self.name,
+            'kind': self.kind,
+            'trace_id': self.trace_id,
+            'span_id': self.span_id,
+            'parent_id': self.parent_id,
+            'start_ns': self.start_ns,
+            'end_ns': self.end_ns,
+            'attributes': self.attributes,
+            'status': self.status
+        }
+
+
+class BatchExporter:
+    """Hands finished spans to a background thread that exports them in batches.
+
+    The queue is bounded; when the exporter falls behind spans are
+    dropped rather than slowing requests down.
+    """
+
+    def __init__(self, max_queue=10000, batch_size=512, interval=1.0):
+        self.batch_size = batch_size
+        self.interval = interval
+        self.dropped = 0
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._thread = threading.Thread(target=self._loop, name='span-exporter', daemon=True)
+        self._thread.start()
+
+    def submit(self, span):
+        try:
+            self._queue.put_nowait(span)
+        except queue.Full:
+            self.dropped += 1
+
+    def _loop(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.interval
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get(timeout=max(0.0, deadline - time.monotonic())))
+                except queue.Empty:
+                    break
+            try:
+                self.export(batch)
+            except Exception as e:
+                logger.warning(f'Span export failed: {str(e)}')
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    def flush(self, timeout=5.0):
+        deadline = time.monotonic() + timeout
+        while self._queue.unfinished_tasks and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+    def export(self, spans):
+        raise NotImplementedError
+
+
+class FileExporter(BatchExporter):
+    """Appends spans to a file as JSON lines."""
+
+    def __init__(self, path, service_name, **kwargs):
+        self.path = path
+        self.service_name = service_name
+        super().__init__(**kwargs)
+
+    def export(self, spans):
+        with open(self.path, 'a') as f:
+            for span in spans:
+                record = span.to_dict()
+                record['service'] = self.service_name
+                f.write(json.dumps(record) + '\n')
+
+
+class OTLPExporter(BatchExporter):
+    """Posts spans to an OTLP/HTTP collector using the JSON encoding."""
+
+    kinds = {'internal': 1, 'server': 2, 'client': 3}
+
+    def __init__(self, endpoint, service_name, timeout=2.0, **kwargs):
+        self.endpoint = endpoint
+        self.service_name = service_name
+        self.timeout = timeout
+        super().__init__(**kwargs)
+
+    def _encode(self, spans):
+        return {'resourceSpans': [{
+            'resource': {'attributes': [
+                {'key': 'service.name', 'value': {'stringValue': self.service_name}}
+            ]},
+            'scopeSpans': [{
+                'scope': {'name': 'banking.tracing'},
+                'spans': [{
+                    'traceId': span.trace_id,
+                    'spanId': span.span_id,
+                    'parentSpanId': span.parent_id or '',
+                    'name': span.name,
+                    'kind': self.kinds.get(span.kind, 1),
+                    'startTimeUnixNano': str(span.start_ns),
+                    'endTimeUnixNano': str(span.end_ns),
+                    'attributes': [{'key': key, 'value': {'stringValue': str(value)}}
+                                   for key, value in span.attributes.items()],
+                    'status': {'code': 2 if span.status == 'error' else 0}
+                } for span in spans]
+            }]
+        }]}
+
+    def export(self, spans):
+        body = json.dumps(self._encode(spans)).encode('utf-8')
+        req = urllib.request.Request(self.endpoint, data=body, headers={'Content-Type': 'application/json'})
+        urllib.request.urlopen(req, timeout=self.timeout).close()
+
+
+class Tracer:
+    def __init__(self, exporter, sample_rate=0.01):
+        self.exporter = exporter
+        self.sample_rate = sample_rate
+
+    def _sampled(self, trace_id):
+        # Decide from the trace id so every service keeps or drops the same traces
+        return int(trace_id[-8:], 16) / 0xFFFFFFFF < self.sample_rate
+
+    def start_server_span(self, name, traceparent=None, attributes=None):
+        parent = parse_traceparent(traceparent)
+        if parent is not None:
+            trace_id, parent_id, sampled = parent
+        else:
+            trace_id, parent_id = os.urandom(16).hex(), None
+            sampled = self._sampled(trace_id)
+        if not sampled:
+            return None
+        return self._activate(Span(self, name, trace_id, parent_id, kind='server', attributes=attributes))
+
+    def start_trace(self, name, attributes=None):
+        """Start a new trace for work no request started, such as a scheduled job."""
+        trace_id = os.urandom(16).hex()
+        if not self._sampled(trace_id):
+            return None
+        return self._activate(Span(self, name, trace_id, None, attributes=attributes))
+
+    def start_span(self, name, kind='internal', attributes=None):
+        """Start a child of the current span, or nothing if this trace isn't sampled."""
+        parent = _current_span.get()
+        if parent is None:
+            return None
+        return self._activate(Span(self, name, parent.trace_id, parent.span_id, kind=kind, attributes=attributes))
+
+    def _activate(self, span):
+        span._token = _current_span.set(span)
+        return span
+
+    def end_span(self, span, error=None):
+        if span is None:
+            return
+        span.end_ns = time.time_ns()
+        if error is not None:
+            span.status = 'error'
+            span.attributes['error'] = str(error)
+        if span._token is not None:
+            try:
+                _current_span.reset(span._token)
+            except ValueError:
+                _current_span.set(None)
+            span._token = None
+        self.exporter.submit(span)
+
+
+def current_span():
+    return _current_span.get()
+
+
+def inject_headers(headers=None):
+    """Add a ``traceparent`` for the current span to outgoing request headers."""
+    headers = {} if headers is None else headers
+    span = _current_span.get()
+    if span is not None:
+        headers['traceparent'] = format_traceparent(span)
+    return headers
+
+
+def _make_exporter(app):
+    kind = app.config.get('TRACING_EXPORTER')
+    service_name = app.config.get('SERVICE_NAME', app.name)
+    if kind == 'file':
+        return FileExporter(app.config['TRACING_FILE'], service_name)
+    if kind == 'otlp':
+        return OTLPExporter(app.config['TRACING_OTLP_ENDPOINT'], service_name)
+    if kind:
+        raise ValueError(f"Unknown tracing exporter: {kind}")
+    return None
+
+
+def _instrument_sqlalchemy():
+    # Listening on the Engine class covers every engine, shards included.
+    # Statements only become spans inside a sampled request.
+    @event.listens_for(Engine, 'before_cursor_execute')
+    def start_statement_span(conn, cursor, statement, parameters, context, executemany):
+        parent = _current_span.get()
+        if parent is None:
+            return
+        span = parent.tracer.start_span('db.query', kind='client', attributes={
+            'db.system': conn.engine.dialect.name,
+            'db.statement': statement[:MAX_STATEMENT_LENGTH]
+        })
+        conn.info.setdefault('trace_spans', []).append(span)
+
+    @event.listens_for(Engine, 'after_cursor_execute')
+    def end_statement_span(conn, cursor, statement, parameters, context, executemany):
+        spans = conn.info.get('trace_spans')
+        if spans:
+            span = spans.pop()
+            span.tracer.end_span(span)
+
+    @event.listens_for(Engine, 'handle_error')
+    def fail_statement_span(context):
+        spans = context.connection.info.get('trace_spans') if context.connection is not None else None
+        if spans:
+            span = spans.pop()
+            span.tracer.end_span(span, error=context.original_exception)
+
+
+_instrumented = False
+
+
+def init_tracing(app):
+    global _instrumented
+    exporter = _make_exporter(app)
+    if exporter is None:
+        return None
+    tracer = Tracer(exporter, sample_rate=app.config.get('TRACING_SAMPLE_RATE', 0.01))
+    app.extensions['tracer'] = tracer
+    if not _instrumented:
+        _instrument_sqlalchemy()
+        _instrumented = True
+
+    @app.before_request
+    def start_request_span():
+        rule = request.url_rule.rule if request.url_rule is not None else request.path
+        span = tracer.start_server_span(f'{request.method} {rule}', request.headers.get('traceparent'), {
+            'http.method': request.method,
+            'http.route': rule,
+            'http.target': request.full_path
+        })
+        request.environ['tracing.span'] = span
+
+    @app.after_request
+    def record_response(response):
+        span = request.environ.get('tracing.span')
+        if span is not None:
+            span.attributes['http.status_code'] = response.status_code
+            if response.status_code >= 500:
+                span.status = 'error'
+            response.headers['traceparent'] = format_traceparent(span)
+        return response
+
+    @app.teardown_request
+    def end_request_span(exc):
+        tracer.end_span(request.environ.pop('tracing.span', None), error=exc)
+
+    return tracer
@@ -0,0 +1,50 @@
+from datetime import date, datetime
+
+from flask import current_app, jsonify, request
+
+try:
+    import msgpack
+except ImportError:  # msgpack is optional, clients then always get JSON
+    msgpack = None
+
+JSON_MIMETYPE = 'application/json'
+MSGPACK_MIMETYPE = 'application/msgpack'
+
+_msgpack_mimetypes = (MSGPACK_MIMETYPE, 'application/x-msgpack')
+
+
+def negotiate():
+    """Pick the response format from the Accept header, JSON unless MessagePack is preferred."""
+    if msgpack is None:
+        return JSON_MIMETYPE
+    best = request.accept_mimetypes.best_match((JSON_MIMETYPE,) + _msgpack_mimetypes, default=JSON_MIMETYPE)
+    return MSGPACK_MIMETYPE if best in _msgpack_mimetypes else JSON_MIMETYPE
+
+
+def table(objects, columns):
+    """Lay out objects column-wise, naming each field once instead of once per row."""
+    return {
+        'columns': list(columns),
+        'rows': [[getattr(obj, column) for column in columns] for obj in objects]
+    }
+
+
+def _encode_default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f'Cannot serialize {type(value).__name__}')
+
+
+def packb(payload):
+    return msgpack.packb(payload, default=_encode_default, use_bin_type=True)
+
+
+def render(payload, status=200, mimetype=None):
+    mimetype = mimetype or negotiate()
+    if mimetype == MSGPACK_MIMETYPE:
+        response = current_app.response_class(packb(payload), mimetype=MSGPACK_MIMETYPE)
+    else:
+        response = jsonify(payload)
+    response.status_code = status
+    response.vary.add('Accept')
+    return response
@@ -0,0 +1,73 @@
+"""Write throughput against the number of shards.
+
+Usage:
+    python benchmarks/bench_sharding.py [--shards 1 2 4 8] [--writers 8] [--rows 500]
+
+Each writer process inserts rows one commit at a time, the way
+create_transaction does, through its own ShardRouter. With a single
+SQLite file every writer queues on the same write lock; with more
+shards the writers spread over independent files.
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from multiprocessing import Pool
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+from models import db, Transaction
+from banking_common.sharding import ShardRouter
+
+
+def _uris(directory, shards):
+    return [f'sqlite:///{os.path.join(directory, f"shard{i}.db")}' for i in range(shards)]
+
+
+def _write(args):
+    uris, rows, seed = args
+    router = ShardRouter(uris)
+    rng = random.Random(seed)
+    for _ in range(rows):
+        account_id = rng.randint(1, 10000)
+        router.insert(Transaction(
+            account_id=account_id,
+            amount=round(rng.uniform(1, 500), 2),
+            type='deposit',
+            description='benchmark',
+            balance_after=0.0
+        ), account_id)
+    router.remove()
+    return rows
+
+
+def run(shards, writers, rows):
+    with tempfile.TemporaryDirectory() as directory:
+        uris = _uris(directory, shards)
+        ShardRouter(uris).create_all(db.metadata)
+        started = time.perf_counter()
+        with Pool(writers) as pool:
+            written = sum(pool.map(_write, [(uris, rows, seed) for seed in range(writers)]))
+        elapsed = time.perf_counter() - started
+    return written / elapsed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--shards', type=int, nargs='+', default=[1, 2, 4, 8])
+    parser.add_argument('--writers', type=int, default=8)
+    parser.add_argument('--rows', type=int, default=500, help='rows per writer')
+    args = parser.parse_args(argv)
+
+    baseline = None
+    print(f'{"shards":>6} {"rows/s":>10} {"speedup":>8}')
+    for shards in args.shards:
+        throughput = run(shards, args.writers, args.rows)
+        baseline = baseline or throughput
+        print(f'{shards:>6} {throughput:>10.0f} {throughput / baseline:>7.2f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,95 @@
+"""Payload size and encode/decode time of list_transactions pages, JSON against MessagePack.
+
+Usage:
+    python benchmarks/bench_wire.py [--rows 1000] [--repeat 20]
+
+JSON is encoded exactly as the endpoint does today, with jsonify over a
+list of dicts. MessagePack is measured both with the same dicts and
+with the column-wise table the endpoint sends.
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+import msgpack
+from flask import Flask, jsonify
+
+from models import Transaction
+from banking_common.wire import packb, table
+
+FIELDS = ('id', 'account_id', 'amount', 'type', 'description', 'balance_after', 'timestamp')
+
+
+def _transactions(count, seed=0):
+    rng = random.Random(seed)
+    start = datetime(2024, 1, 1)
+    return [Transaction(
+        id=i + 1,
+        account_id=rng.randint(1, 1000),
+        amount=round(rng.uniform(1, 500), 2),
+        type=rng.choice(('deposit', 'withdrawal', 'transfer')),
+        description=rng.choice(('Rent payment', 'Groceries', 'Salary', 'Coffee', 'Transfer to savings')),
+        balance_after=round(rng.uniform(0, 10000), 2),
+        timestamp=start + timedelta(seconds=i * 37)
+    ) for i in range(count)]
+
+
+def _dicts(transactions):
+    return [{
+        'id': t.id,
+        'account_id': t.account_id,
+        'amount': t.amount,
+        'type': t.type,
+        'description': t.description,
+        'balance_after': t.balance_after,
+        'timestamp': t.timestamp.isoformat()
+    } for t in transactions]
+
+
+def _time(func, repeat):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        result = func()
+    return (time.perf_counter() - started) / repeat * 1000, result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=1000)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args(argv)
+
+    transactions = _transactions(args.rows)
+    app = Flask(__name__)
+    cases = {
+        'json (jsonify)': (
+            lambda: jsonify({'transactions': _dicts(transactions), 'total': args.rows}).get_data(),
+            json.loads
+        ),
+        'msgpack (dicts)': (
+            lambda: packb({'transactions': _dicts(transactions), 'total': args.rows}),
+            msgpack.unpackb
+        ),
+        'msgpack (columns)': (
+            lambda: packb({'transactions': table(transactions, FIELDS), 'total': args.rows}),
+            msgpack.unpackb
+        ),
+    }
+
+    print(f'{args.rows} rows')
+    print(f'{"format":<20} {"bytes":>10} {"encode ms":>10} {"decode ms":>10}')
+    with app.app_context():
+        for name, (encode, decode) in cases.items():
+            encode_ms, payload = _time(encode, args.repeat)
+            decode_ms, _ = _time(lambda: decode(payload), args.repeat)
+            print(f'{name:<20} {len(payload):>10} {encode_ms:>10.2f} {decode_ms:>10.2f}')
+
+
+if __name__ == '__main__':
+    main()
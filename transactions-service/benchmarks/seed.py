@@ -0,0 +1,235 @@
+"""Generate a large, realistic dataset for benchmarks and local testing.
+
+Usage:
+    python benchmarks/seed.py --transactions-db transactions.db [--accounts-db accounts.db]
+        [--accounts 100000] [--transactions 1000000] [--seed 42]
+
+Distributions:
+- Accounts are picked from a Zipf distribution. A few hot accounts see
+  most of the traffic and a long tail sees almost none. The ranks are
+  shuffled, so the hot accounts are not simply the lowest ids.
+- Timestamps arrive in bursts. A two-state process alternates between
+  quiet stretches and bursts of closely spaced transactions, scaled so
+  the whole run spans --days.
+- Each account holds one currency, drawn from CURRENCY_WEIGHTS, and
+  all of its transactions use it.
+- Types follow the transaction_type enum, mixed by TYPE_WEIGHTS. A debit
+  larger than the balance becomes a deposit, so balances never go
+  negative.
+- balance_after is the running balance, which matches what
+  create_transaction computes. The account table gets the final
+  balances, so reconcile.py finds nothing to fix. sequence numbers
+  each account's rows from 1, as create_transaction does.
+
+Rows are written with executemany in large batches. The indexes and
+the full-text insert trigger are dropped during the load and then
+rebuilt in one pass. The same --seed always produces the same data.
+"""
+import argparse
+import itertools
+import logging
+import math
+import os
+import random
+import sqlite3
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+from sqlalchemy import create_engine
+
+from models import BALANCE_EFFECT, db, Transaction
+import search
+
+logger = logging.getLogger(__name__)
+
+TRANSACTION_TYPES = tuple(Transaction.__table__.c.type.type.enums)
+TYPE_WEIGHTS = {'deposit': 0.35, 'withdrawal': 0.45, 'transfer': 0.20}
+CURRENCY_WEIGHTS = {'USD': 0.6, 'EUR': 0.25, 'GBP': 0.1, 'JPY': 0.05}
+
+DESCRIPTIONS = {
+    'deposit': ('Salary', 'Refund', 'Cash deposit', 'Interest', 'Transfer from savings'),
+    'withdrawal': ('Groceries', 'Coffee', 'Rent payment', 'ATM withdrawal', 'Electricity bill',
+                   'Restaurant', 'Online shopping', 'Fuel'),
+    'transfer': ('Transfer to savings', 'Payment to friend', 'Loan repayment', 'Investment'),
+}
+
+ACCOUNT_SCHEMA = """
+CREATE TABLE IF NOT EXISTS account (
+    id INTEGER PRIMARY KEY,
+    user_id INTEGER NOT NULL,
+    balance FLOAT,
+    currency VARCHAR(3) NOT NULL DEFAULT 'USD',
+    status VARCHAR(16) NOT NULL DEFAULT 'open',
+    archived_transactions INTEGER NOT NULL DEFAULT 0,
+    transactions_remaining INTEGER
+)
+"""
+
+INSERT_TRANSACTIONS = ('INSERT INTO transactions (id, account_id, amount, type, description, balance_after, '
+                       'timestamp, currency, sequence) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)')
+
+
+class Generator:
+    def __init__(self, accounts, seed=42, zipf_s=1.1, start=datetime(2024, 1, 1), days=365,
+                 transactions=1000000, burst_gap=2.0, burst_start=0.02, burst_end=0.05):
+        self.rng = random.Random(seed)
+        self.accounts = accounts
+        self.start = start
+        # Zipf weights by rank, handed out to accounts in a shuffled order
+        ranks = list(range(1, accounts + 1))
+        self.rng.shuffle(ranks)
+        self.account_ids = ranks
+        self.cum_weights = list(itertools.accumulate(1.0 / rank ** zipf_s for rank in range(1, accounts + 1)))
+        self.types = TRANSACTION_TYPES
+        self.type_weights = list(itertools.accumulate(TYPE_WEIGHTS[type_] for type_ in self.types))
+        self.opening = {account_id: round(self.rng.lognormvariate(6.5, 1.0), 2)
+                        for account_id in range(1, accounts + 1)}
+        self.balances = dict(self.opening)
+        self.sequences = dict.fromkeys(self.opening, 0)
+        self.currencies = dict(zip(range(1, accounts + 1), self.rng.choices(
+            list(CURRENCY_WEIGHTS), weights=list(CURRENCY_WEIGHTS.values()), k=accounts)))
+
+        # Bursts take up burst_start / (burst_start + burst_end) of all
+        # transactions. The quiet gap is set so the average gap spreads
+        # the run over the requested number of days.
+        mean_gap = days * 86400 / max(transactions, 1)
+        self.burst_share = burst_start / (burst_start + burst_end)
+        self.burst_gap = min(burst_gap, mean_gap / 10)
+        self.quiet_gap = (mean_gap - self.burst_share * self.burst_gap) / (1 - self.burst_share)
+        self.burst_start = burst_start
+        self.burst_end = burst_end
+        self.bursting = False
+        self.elapsed = 0.0
+
+    def _next_timestamp(self):
+        rng = self.rng
+        if self.bursting:
+            self.bursting = rng.random() >= self.burst_end
+        else:
+            self.bursting = rng.random() < self.burst_start
+        self.elapsed += rng.expovariate(1.0 / (self.burst_gap if self.bursting else self.quiet_gap))
+        return self.start + timedelta(seconds=self.elapsed)
+
+    def transactions(self, count, first_id=1):
+        """Yield rows in id order, timestamps increasing with the id."""
+        rng = self.rng
+        balances = self.balances
+        sequences = self.sequences
+        batch = 10000
+        for offset in range(0, count, batch):
+            size = min(batch, count - offset)
+            account_ids = [self.account_ids[rank] for rank in
+                           rng.choices(range(self.accounts), cum_weights=self.cum_weights, k=size)]
+            types = rng.choices(self.types, cum_weights=self.type_weights, k=size)
+            for i in range(size):
+                account_id = account_ids[i]
+                type_ = types[i]
+                amount = round(min(rng.lognormvariate(3.5, 1.2), 50000.0), 2)
+                balance = balances[account_id]
+                if BALANCE_EFFECT[type_] < 0 and amount > balance:
+                    type_ = 'deposit'
+                balance = round(balance + BALANCE_EFFECT[type_] * amount, 2)
+                balances[account_id] = balance
+                sequences[account_id] += 1
+                yield (first_id + offset + i, account_id, amount, type_, rng.choice(DESCRIPTIONS[type_]),
+                       balance, self._next_timestamp().isoformat(sep=' '), self.currencies[account_id],
+                       sequences[account_id])
+
+    def account_rows(self, users=None):
+        users = users or max(1, math.ceil(self.accounts / 1.5))
+        for account_id in range(1, self.accounts + 1):
+            yield account_id, self.rng.randint(1, users), self.balances[account_id], self.currencies[account_id]
+
+
+def _connect(path):
+    connection = sqlite3.connect(path)
+    # Losing a half-written seed only means running it again
+    connection.execute('PRAGMA journal_mode = OFF')
+    connection.execute('PRAGMA synchronous = OFF')
+    return connection
+
+
+def _batches(rows, size):
+    iterator = iter(rows)
+    while True:
+        batch = list(itertools.islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+def seed_transactions(path, generator, count, batch_size=50000):
+    db.metadata.create_all(create_engine(f'sqlite:///{path}'), tables=[Transaction.__table__])
+    connection = _connect(path)
+    try:
+        if connection.execute('SELECT EXISTS (SELECT 1 FROM transactions)').fetchone()[0]:
+            raise SystemExit(f'{path} already has transactions; seed into an empty database')
+        # Maintaining the index and the full-text index row by row costs
+        # more than building both once at the end
+        connection.execute('DROP INDEX IF EXISTS ix_transactions_account_id_id')
+        connection.execute('DROP INDEX IF EXISTS ix_transactions_type_timestamp')
+        connection.execute('DROP INDEX IF EXISTS ix_transactions_account_id_sequence')
+        connection.execute('DROP TRIGGER IF EXISTS transactions_fts_insert')
+        written = 0
+        for batch in _batches(generator.transactions(count), batch_size):
+            with connection:
+                connection.executemany(INSERT_TRANSACTIONS, batch)
+            written += len(batch)
+            logger.info('Wrote %d of %d transactions', written, count)
+        with connection:
+            connection.execute('CREATE INDEX ix_transactions_account_id_id ON transactions (account_id, id)')
+            connection.execute('CREATE INDEX ix_transactions_type_timestamp ON transactions (type, timestamp)')
+            connection.execute('CREATE UNIQUE INDEX ix_transactions_account_id_sequence '
+                               'ON transactions (account_id, sequence)')
+            connection.execute(search.CREATE_FTS_TRIGGERS[0])
+            connection.execute(search.REBUILD_FTS)
+            connection.execute('ANALYZE')
+        return written
+    finally:
+        connection.close()
+
+
+def seed_accounts(path, generator, batch_size=50000):
+    connection = _connect(path)
+    try:
+        connection.execute(ACCOUNT_SCHEMA)
+        written = 0
+        for batch in _batches(generator.account_rows(), batch_size):
+            with connection:
+                connection.executemany('INSERT INTO account (id, user_id, balance, currency) VALUES (?, ?, ?, ?)', batch)
+            written += len(batch)
+        return written
+    finally:
+        connection.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--transactions-db', required=True)
+    parser.add_argument('--accounts-db', help='also write the accounts, with balances matching the ledger')
+    parser.add_argument('--accounts', type=int, default=100000)
+    parser.add_argument('--transactions', type=int, default=1000000)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--zipf', type=float, default=1.1, help='Zipf exponent of account popularity')
+    parser.add_argument('--start', type=datetime.fromisoformat, default=datetime(2024, 1, 1))
+    parser.add_argument('--days', type=float, default=365)
+    parser.add_argument('--batch-size', type=int, default=50000)
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    generator = Generator(args.accounts, seed=args.seed, zipf_s=args.zipf, start=args.start,
+                          days=args.days, transactions=args.transactions)
+    started = time.perf_counter()
+    written = seed_transactions(args.transactions_db, generator, args.transactions, args.batch_size)
+    elapsed = time.perf_counter() - started
+    logger.info('Wrote %d transactions in %.1fs (%.0f rows/min)', written, elapsed, written / elapsed * 60)
+    if args.accounts_db:
+        logger.info('Wrote %d accounts', seed_accounts(args.accounts_db, generator, args.batch_size))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,57 @@
+"""add transactions full-text index
+
+Revision ID: 3c9a1e2f7d41
+Revises: b7fc4bfc0f5d
+Create Date: 2026-10-19 09:12:40.512233
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3c9a1e2f7d41'
+down_revision = 'b7fc4bfc0f5d'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+    op.execute("""
+    CREATE VIRTUAL TABLE IF NOT EXISTS transactions_fts USING fts5(
+        description,
+        content='transactions',
+        content_rowid='id',
+        tokenize='unicode61',
+        prefix='2 3'
+    )
+    """)
+    op.execute("""
+    CREATE TRIGGER IF NOT EXISTS transactions_fts_insert AFTER INSERT ON transactions BEGIN
+        INSERT INTO transactions_fts(rowid, description) VALUES (new.id, new.description);
+    END
+    """)
+    op.execute("""
+    CREATE TRIGGER IF NOT EXISTS transactions_fts_delete AFTER DELETE ON transactions BEGIN
+        INSERT INTO transactions_fts(transactions_fts, rowid, description) VALUES ('delete', old.id, old.description);
+    END
+    """)
+    op.execute("""
+    CREATE TRIGGER IF NOT EXISTS transactions_fts_update AFTER UPDATE OF description ON transactions BEGIN
+        INSERT INTO transactions_fts(transactions_fts, rowid, description) VALUES ('delete', old.id, old.description);
+        INSERT INTO transactions_fts(rowid, description) VALUES (new.id, new.description);
+    END
+    """)
+    # Index the rows that existed before the triggers
+    op.execute("INSERT INTO transactions_fts(transactions_fts) VALUES ('rebuild')")
+
+
+def downgrade():
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+    op.execute('DROP TRIGGER IF EXISTS transactions_fts_insert')
+    op.execute('DROP TRIGGER IF EXISTS transactions_fts_delete')
+    op.execute('DROP TRIGGER IF EXISTS transactions_fts_update')
+    op.execute('DROP TABLE IF EXISTS transactions_fts')
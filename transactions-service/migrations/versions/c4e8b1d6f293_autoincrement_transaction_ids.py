@@ -0,0 +1,69 @@
+"""never reuse transaction ids
+
+Revision ID: c4e8b1d6f293
+Revises: a1c7e3f5b820
+Create Date: 2026-10-20 10:04:37.281905
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c4e8b1d6f293'
+down_revision = 'a1c7e3f5b820'
+branch_labels = None
+depends_on = None
+
+FTS_TRIGGERS = [
+    """
+    CREATE TRIGGER IF NOT EXISTS transactions_fts_insert AFTER INSERT ON transactions BEGIN
+        INSERT INTO transactions_fts(rowid, description) VALUES (new.id, new.description);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS transactions_fts_delete AFTER DELETE ON transactions BEGIN
+        INSERT INTO transactions_fts(transactions_fts, rowid, description) VALUES ('delete', old.id, old.description);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS transactions_fts_update AFTER UPDATE OF description ON transactions BEGIN
+        INSERT INTO transactions_fts(transactions_fts, rowid, description) VALUES ('delete', old.id, old.description);
+        INSERT INTO transactions_fts(rowid, description) VALUES (new.id, new.description);
+    END
+    """,
+]
+
+
+def _rebuild(autoincrement):
+    # SQLite can't add AUTOINCREMENT in place; the table is copied into a
+    # new one, which drops the full-text triggers along with the old table
+    with op.batch_alter_table('transactions', recreate='always',
+                              table_kwargs={'sqlite_autoincrement': autoincrement}) as batch_op:
+        pass
+    for trigger in FTS_TRIGGERS:
+        op.execute(trigger)
+
+
+def upgrade():
+    # Other databases never reuse values from their sequences
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+    _rebuild(True)
+    # Continue after every id ever used, archived ones included
+    op.execute("""
+    INSERT INTO sqlite_sequence (name, seq)
+    SELECT 'transactions', 0 WHERE NOT EXISTS (SELECT 1 FROM sqlite_sequence WHERE name = 'transactions')
+    """)
+    op.execute("""
+    UPDATE sqlite_sequence
+    SET seq = MAX(seq, (SELECT COALESCE(MAX(id), 0) FROM transactions),
+                  (SELECT COALESCE(MAX(id), 0) FROM transactions_archive))
+    WHERE name = 'transactions'
+    """)
+
+
+def downgrade():
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+    _rebuild(False)
@@ -0,0 +1,72 @@
+"""number each account's transactions
+
+Revision ID: d8e1f4a6b357
+Revises: f2a9c7d3b614
+Create Date: 2026-10-21 09:12:44.508316
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd8e1f4a6b357'
+down_revision = 'f2a9c7d3b614'
+branch_labels = None
+depends_on = None
+
+FTS_TRIGGERS = [
+    """
+    CREATE TRIGGER IF NOT EXISTS transactions_fts_insert AFTER INSERT ON transactions BEGIN
+        INSERT INTO transactions_fts(rowid, description) VALUES (new.id, new.description);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS transactions_fts_delete AFTER DELETE ON transactions BEGIN
+        INSERT INTO transactions_fts(transactions_fts, rowid, description) VALUES ('delete', old.id, old.description);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS transactions_fts_update AFTER UPDATE OF description ON transactions BEGIN
+        INSERT INTO transactions_fts(transactions_fts, rowid, description) VALUES ('delete', old.id, old.description);
+        INSERT INTO transactions_fts(rowid, description) VALUES (new.id, new.description);
+    END
+    """,
+]
+
+
+def upgrade():
+    with op.batch_alter_table('transactions', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('sequence', sa.Integer(), nullable=True))
+
+    # Existing rows are numbered in the order they were written
+    op.execute("""
+    WITH numbered AS (
+        SELECT id, ROW_NUMBER() OVER (PARTITION BY account_id ORDER BY id) AS sequence
+        FROM transactions
+    )
+    UPDATE transactions
+    SET sequence = numbered.sequence
+    FROM numbered
+    WHERE numbered.id = transactions.id
+    """)
+
+    with op.batch_alter_table('transactions', schema=None) as batch_op:
+        batch_op.create_index('ix_transactions_account_id_sequence', ['account_id', 'sequence'], unique=True)
+
+
+def downgrade():
+    with op.batch_alter_table('transactions', schema=None) as batch_op:
+        batch_op.drop_index('ix_transactions_account_id_sequence')
+
+    if op.get_bind().dialect.name != 'sqlite':
+        with op.batch_alter_table('transactions', schema=None) as batch_op:
+            batch_op.drop_column('sequence')
+        return
+    # Dropping the column copies the table, which loses the full-text
+    # triggers along with the old one
+    with op.batch_alter_table('transactions', schema=None,
+                              table_kwargs={'sqlite_autoincrement': True}) as batch_op:
+        batch_op.drop_column('sequence')
+    for trigger in FTS_TRIGGERS:
+        op.execute(trigger)
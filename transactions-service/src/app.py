@@ -1,27 +1,108 @@
+import time
+
+_import_started = time.perf_counter()
+
 import os
 import sys
 
 # Add the current directory to sys.path
 current_dir = os.path.dirname(os.path.abspath(__file__))
-sys.path.insert(0, current_dir)
+if current_dir not in sys.path:
+    sys.path.insert(0, current_dir)
 
-from flask import Flask, jsonify, request, abort
-from sqlalchemy import desc
-from sqlalchemy.exc import DataError
-from flask_migrate import Migrate
+from flask import Blueprint, Flask, current_app, jsonify, request, abort
+from sqlalchemy import desc, func
+from sqlalchemy.exc import DataError, IntegrityError
+from datetime import datetime
 import logging
-from models import db, Transaction
+from config import get_config
+from models import BALANCE_EFFECT, db, Transaction
+from banking_common.scheduler import Scheduler, register_maintenance_jobs
+from banking_common.ratelimit import init_rate_limiting
+from search import search_transactions
+from compression import init_compression
+from conditional import collection_etag, not_modified, set_validators
+from banking_common.tracing import init_tracing
+from banking_common.profiling import init_profiling
+from banking_common.service_auth import authorize_service
+from banking_common.sharding import init_sharding, merge_sorted
+from velocity import init_velocity
+from banking_common.wire import MSGPACK_MIMETYPE, negotiate, render, table
+from balances import apply, init_balances
+from archive import archive_batch
+from fx import UnknownCurrency, init_fx, validate_currency
+
+_import_ms = round((time.perf_counter() - _import_started) * 1000, 1)
 
-app = Flask(__name__)
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///transactions.db'
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-db.init_app(app)
-migrate = Migrate(app, db)
 # Set up logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-@app.route('/transactions', methods=['POST'])
+bp = Blueprint('transactions', __name__)
+
+TRANSACTION_FIELDS = ('id', 'account_id', 'amount', 'type', 'description', 'balance_after', 'timestamp', 'currency')
+CONVERTED_FIELDS = ('converted_amount', 'converted_balance_after')
+
+def _serialize_transactions(transactions, mimetype, converted=None):
+    # MessagePack clients get the rows as arrays under one column header
+    if mimetype == MSGPACK_MIMETYPE:
+        rows = table(transactions, TRANSACTION_FIELDS)
+        if converted is not None:
+            rows['columns'].extend(CONVERTED_FIELDS)
+            for row, values in zip(rows['rows'], zip(*converted)):
+                row.extend(values)
+        return rows
+    rows = [
+        {
+            'id': t.id,
+            'account_id': t.account_id,
+            'amount': t.amount,
+            'type': t.type,
+            'description': t.description,
+            'balance_after': t.balance_after,
+            'timestamp': t.timestamp.isoformat(),
+            'currency': t.currency
+        } for t in transactions
+    ]
+    if converted is not None:
+        for row, (amount, balance_after) in zip(rows, zip(*converted)):
+            row['converted_amount'] = amount
+            row['converted_balance_after'] = balance_after
+    return rows
+
+def _rate_table(currency):
+    """The rate table to convert into ``currency`` with, or None when no conversion was asked for."""
+    if currency is None:
+        return None
+    try:
+        validate_currency(currency)
+    except ValueError as e:
+        abort(400, description=str(e))
+    rates = current_app.extensions['fx'].current()
+    if rates is None:
+        abort(503, description="Exchange rates are not available")
+    try:
+        rates.factors((), currency)
+    except UnknownCurrency as e:
+        abort(400, description=str(e))
+    return rates
+
+def _convert_transactions(transactions, rates, currency):
+    # Whole columns at once: one rate lookup per currency, not per row.
+    # Rows in a currency the rate table has dropped convert to None.
+    currencies = [t.currency for t in transactions]
+    return (
+        rates.convert([t.amount for t in transactions], currencies, currency, strict=False),
+        rates.convert([t.balance_after for t in transactions], currencies, currency, strict=False)
+    )
+
+def _session_for(key):
+    router = current_app.extensions.get('shard_router')
+    if router is None or not isinstance(key, int) or key <= 0:
+        return db.session
+    return router.session_for(key)
+
+@bp.route('/transactions', methods=['POST'])
 def create_transaction():
     data = request.json
     try:
@@ -31,25 +112,88 @@ def create_transaction():
             amount=data['amount'],
             type=data['type'],
             description=data.get('description', ''),
-            balance_after=data['balance_after']
+            currency=data.get('currency', current_app.config['DEFAULT_CURRENCY'])
         )
+        # A currency without a rate couldn't be converted in any report
+        rates = current_app.extensions['fx'].current()
+        if rates is not None and transaction.currency not in rates.rates:
+            return jsonify({'error': f'No exchange rate for {transaction.currency}'}), 400
+        # Velocity limits are checked and recorded in one step so concurrent
+        # debits can't slip past them together
+        tracker = current_app.extensions.get('velocity')
+        debited_at = None
+        if tracker is not None and tracker.applies_to(transaction.type):
+            debited_at = time.time()
+            debit = tracker.normalize(transaction.amount, transaction.currency, rates)
+            reason = tracker.try_record(transaction.account_id, debit, debited_at)
+            if reason is not None:
+                return jsonify({'error': f'Velocity limit exceeded: {reason}'}), 429
+        cache = current_app.extensions['balance_cache']
+        session = _session_for(transaction.account_id)
+        retries = current_app.config['BALANCE_WRITE_RETRIES']
+        # The account stays locked from reading its last balance until the
+        # new one is committed, so concurrent writes apply one after another
+        with cache.lock(transaction.account_id):
+            for attempt in range(retries + 1):
+                try:
+                    last = cache.get(session, transaction.account_id)
+                    if last is None:
+                        # The first transaction of an account opens it at the
+                        # balance the client reports, or at zero
+                        opening = data.get('balance_after')
+                        if opening is None:
+                            opening = apply(0, transaction.type, transaction.amount)
+                        elif isinstance(opening, bool) or not isinstance(opening, (int, float)):
+                            raise ValueError("Balance after must be a number")
+                        transaction.balance_after = float(opening)
+                        transaction.sequence = 1
+                    else:
+                        last_balance, last_sequence = last
+                        transaction.balance_after = apply(last_balance, transaction.type, transaction.amount)
+                        transaction.sequence = last_sequence + 1
+                        if 'balance_after' in data and data['balance_after'] != transaction.balance_after:
+                            logger.warning('Client balance_after %s for account %s differs from computed %s',
+                                           data['balance_after'], transaction.account_id, transaction.balance_after)
+                    router = current_app.extensions.get('shard_router')
+                    if router is not None:
+                        router.insert(transaction, transaction.account_id)
+                    else:
+                        db.session.add(transaction)
+                        db.session.commit()
+                    break
+                except IntegrityError:
+                    # Another process wrote to the account after this balance
+                    # was read; start again from the row it wrote
+                    db.session.rollback()
+                    cache.invalidate(transaction.account_id)
+                    if attempt < retries:
+                        continue
+                    if debited_at is not None:
+                        tracker.undo(transaction.account_id, debit, debited_at)
+                    raise
+                except Exception:
+                    cache.invalidate(transaction.account_id)
+                    if debited_at is not None:
+                        tracker.undo(transaction.account_id, debit, debited_at)
+                    raise
+            cache.set(transaction.account_id, transaction.balance_after, transaction.sequence)
         logging.info(f'Transaction created: {transaction.id}')
-        logging.info(f'Transaction balance after: {transaction.balance_after}')
-        db.session.add(transaction)
-        db.session.commit()
-        return jsonify({'id': transaction.id, 'account_id': transaction.account_id, 'amount': transaction.amount, 'type': transaction.type, 'description': transaction.description, 'balance_after': transaction.balance_after, 'timestamp': transaction.timestamp}), 201
+        return render({'id': transaction.id, 'account_id': transaction.account_id, 'amount': transaction.amount, 'type': transaction.type, 'description': transaction.description, 'balance_after': transaction.balance_after, 'timestamp': transaction.timestamp, 'currency': transaction.currency}, 201)
     except ValueError as e:
         db.session.rollback()
         return jsonify({'error': str(e)}), 400
     except DataError as e:
         db.session.rollback()
         return jsonify({'error': str(e)}), 400
+    except IntegrityError:
+        db.session.rollback()
+        return jsonify({'error': 'The account is being written to concurrently, try again'}), 409
     except Exception as e:
         db.session.rollback()
         logging.error(f'Unexpected error: {str(e)}')
         return jsonify({'error': 'An unexpected error occurred'}), 500
 
-@app.route('/transactions/<transaction_id>', methods=['GET'])
+@bp.route('/transactions/<transaction_id>', methods=['GET'])
 def get_transaction(transaction_id):
     try:
         # Convert to integer
@@ -60,21 +204,26 @@ def get_transaction(transaction_id):
     except ValueError:
         abort(400, description="Invalid transaction ID")
 
-    transaction = Transaction.query.get(transaction_id)
+    router = current_app.extensions.get('shard_router')
+    if router is not None:
+        transaction = router.session_for(transaction_id).get(Transaction, transaction_id)
+    else:
+        transaction = Transaction.query.get(transaction_id)
     if transaction is None:
         abort(404, description="Transaction not found")
 
-    return jsonify({
+    return render({
         'id': transaction.id,
         'account_id': transaction.account_id,
         'amount': transaction.amount,
         'type': transaction.type,
         'description': transaction.description,
         'balance_after': transaction.balance_after,
-        'timestamp': transaction.timestamp
+        'timestamp': transaction.timestamp,
+        'currency': transaction.currency
     })
 
-@app.route('/transactions', methods=['GET'])
+@bp.route('/transactions', methods=['GET'])
 def list_transactions():
     # Get query parameters
     page = request.args.get('page', type=int)
@@ -83,15 +232,28 @@ def list_transactions():
     transaction_type = request.args.get('type')
     sort_by = request.args.get('sort', 'timestamp')
     order = request.args.get('order', 'desc')
+    # Amounts are also reported converted into this currency when given
+    currency = request.args.get('currency')
+    rates = _rate_table(currency)
+
+    router = current_app.extensions.get('shard_router')
+    if router is not None:
+        return _list_sharded(router, page, per_page, account_id, transaction_type, sort_by, order, currency, rates)
 
     # Start with a base query
     query = Transaction.query
 
     # Apply filters
-    if account_id:
-        query = query.filter(Transaction.account_id == account_id)
-    if transaction_type:
-        query = query.filter(Transaction.type == transaction_type)
+    for condition in _list_filters(account_id, transaction_type):
+        query = query.filter(condition)
+
+    # Get total count along with the aggregates the ETag is built from,
+    # so an unchanged result set is answered without loading any rows
+    max_id, last_modified, total = query.with_entities(*_list_aggregates()).one()
+    etag = collection_etag(max_id, last_modified, total, request.args, _list_variant(rates))
+    cached = not_modified(etag, last_modified)
+    if cached is not None:
+        return cached
 
     # Apply sorting
     if hasattr(Transaction, sort_by):
@@ -101,58 +263,314 @@ def list_transactions():
         else:
             query = query.order_by(order_column)
 
-    # Get total count
-    total = query.count()
-
     # Apply pagination if both page and per_page are provided
     if page is not None and per_page is not None:
         paginated_transactions = query.paginate(page=page, per_page=per_page, error_out=False)
         transactions = paginated_transactions.items
+        pages = paginated_transactions.pages
     else:
         transactions = query.all()
+        pages = None
+
+    return _list_response(transactions, total, pages, page, per_page, etag, last_modified, currency, rates)
+
+def _list_variant(rates):
+    # New rates change converted amounts without changing any row
+    return negotiate() if rates is None else f'{negotiate()}|fx:{rates.version}'
+
+def _list_filters(account_id, transaction_type):
+    filters = []
+    if account_id:
+        filters.append(Transaction.account_id == account_id)
+    if transaction_type:
+        filters.append(Transaction.type == transaction_type)
+    return filters
+
+def _list_aggregates():
+    return func.max(Transaction.id), func.max(Transaction.timestamp), func.count(Transaction.id)
+
+def _list_sharded(router, page, per_page, account_id, transaction_type, sort_by, order, currency=None, rates=None):
+    filters = _list_filters(account_id, transaction_type)
+    # A single account lives on one shard, anything else fans out to all of them
+    shards = [router.shard_for(account_id)] if account_id else None
 
+    stats = router.fan_out(lambda session: session.query(*_list_aggregates()).filter(*filters).one(), shards)
+    max_id = max((s[0] for s in stats if s[0] is not None), default=None)
+    last_modified = max((s[1] for s in stats if s[1] is not None), default=None)
+    total = sum(s[2] for s in stats)
+    etag = collection_etag(max_id, last_modified, total, request.args, _list_variant(rates))
+    cached = not_modified(etag, last_modified)
+    if cached is not None:
+        return cached
+
+    if sort_by not in Transaction.__table__.columns:
+        sort_by = 'timestamp'
+    order_column = getattr(Transaction, sort_by)
+    reverse = order == 'desc'
+    paginated = page is not None and per_page is not None
+    if paginated:
+        # Out of range values fall back the way paginate(error_out=False) does
+        page = max(page, 1)
+        if per_page < 1:
+            per_page = 20
+        # Every shard has to supply enough rows to fill the page after merging
+        limit = page * per_page
+    else:
+        limit = None
+
+    def fetch(session):
+        query = session.query(Transaction).filter(*filters)
+        # NULLs are placed explicitly so every shard orders them the way the merge key does
+        query = query.order_by(order_column.desc().nulls_last() if reverse else order_column.asc().nulls_first(),
+                               Transaction.id)
+        return query.limit(limit).all()
+
+    def merge_key(transaction):
+        value = getattr(transaction, sort_by)
+        # None doesn't compare with other values, so it gets a rank of its own
+        return (value is not None, value)
+
+    merged = merge_sorted(router.fan_out(fetch, shards), key=merge_key, reverse=reverse)
+    transactions = list(merged)
+    pages = None
+    if paginated:
+        transactions = transactions[(page - 1) * per_page:page * per_page]
+        pages = (total + per_page - 1) // per_page
+    return _list_response(transactions, total, pages, page, per_page, etag, last_modified, currency, rates)
+
+def _list_response(transactions, total, pages, page, per_page, etag, last_modified, currency=None, rates=None):
     # Prepare the response
+    mimetype = negotiate()
+    converted = None if rates is None else _convert_transactions(transactions, rates, currency)
     response = {
-        'transactions': [
-            {
-                'id': t.id,
-                'account_id': t.account_id,
-                'amount': t.amount,
-                'type': t.type,
-                'description': t.description,
-                'balance_after': t.balance_after,
-                'timestamp': t.timestamp.isoformat()
-            } for t in transactions
-        ],
+        'transactions': _serialize_transactions(transactions, mimetype, converted),
         'total': total
     }
+    if rates is not None:
+        response['currency'] = currency
+        response['fx_version'] = rates.version
 
     # Add pagination info if pagination was applied
-    if page is not None and per_page is not None:
+    if pages is not None:
         response['pagination'] = {
             'total': total,
-            'pages': paginated_transactions.pages,
+            'pages': pages,
+            'page': page,
+            'per_page': per_page
+        }
+
+    return set_validators(render(response, mimetype=mimetype), etag, last_modified)
+
+@bp.route('/transactions/summary', methods=['GET'])
+def summary():
+    account_id = request.args.get('account_id', type=int)
+    currency = request.args.get('currency')
+    rates = _rate_table(currency)
+    filters = _list_filters(account_id, None)
+
+    # The database sums each (currency, type) group, so only a handful of
+    # totals are converted however many rows they cover
+    def group_totals(session):
+        return session.query(
+            Transaction.currency, Transaction.type, func.sum(Transaction.amount), func.count(Transaction.id)
+        ).filter(*filters).group_by(Transaction.currency, Transaction.type).all()
+
+    router = current_app.extensions.get('shard_router')
+    if router is not None:
+        shards = [router.shard_for(account_id)] if account_id else None
+        groups = [group for result in router.fan_out(group_totals, shards) for group in result]
+    else:
+        groups = group_totals(db.session)
+
+    by_currency = {}
+    for code, type_, amount, count in groups:
+        entry = by_currency.setdefault(code, dict.fromkeys(BALANCE_EFFECT, 0.0))
+        entry[type_] = round(entry[type_] + amount, 2)
+    response = {
+        'account_id': account_id,
+        'count': sum(group[3] for group in groups),
+        'by_currency': by_currency
+    }
+    if rates is not None:
+        converted = rates.convert([group[2] for group in groups], [group[0] for group in groups], currency,
+                                  strict=False)
+        totals = dict.fromkeys(BALANCE_EFFECT, 0.0)
+        unconverted = set()
+        for group, amount in zip(groups, converted):
+            if amount is None:
+                # Left out of the totals and named, rather than failing the whole report
+                unconverted.add(group[0])
+            else:
+                totals[group[1]] += amount
+        response['currency'] = currency
+        response['unconverted'] = sorted(unconverted)
+        response['fx_version'] = rates.version
+        response['totals'] = {type_: round(amount, 2) for type_, amount in totals.items()}
+        response['net'] = round(sum(BALANCE_EFFECT[type_] * amount for type_, amount in totals.items()), 2)
+    return render(response)
+
+@bp.route('/transactions/balance', methods=['GET'])
+def get_balance():
+    account_id = request.args.get('account_id', type=int)
+    at = request.args.get('at')
+    if account_id is None or account_id <= 0:
+        abort(400, description="account_id is required")
+
+    # balance_after is stored on every row, so the balance at any point is
+    # the newest row up to it, read through the (account_id, id) index
+    query = _session_for(account_id).query(Transaction).filter(Transaction.account_id == account_id)
+    if at is not None:
+        try:
+            query = query.filter(Transaction.timestamp <= datetime.fromisoformat(at))
+        except ValueError:
+            abort(400, description="Invalid timestamp")
+    transaction = query.order_by(desc(Transaction.id)).first()
+    if transaction is None:
+        abort(404, description="No transactions for this account")
+
+    return render({
+        'account_id': account_id,
+        'balance': transaction.balance_after,
+        'transaction_id': transaction.id,
+        'timestamp': transaction.timestamp
+    })
+
+@bp.route('/transactions/search', methods=['GET'])
+def search():
+    q = request.args.get('q', '')
+    account_id = request.args.get('account_id', type=int)
+    page = request.args.get('page', 1, type=int)
+    per_page = request.args.get('per_page', 20, type=int)
+
+    if not q.strip():
+        abort(400, description="Search query is required")
+    if account_id is None:
+        abort(400, description="account_id is required")
+    if page < 1 or per_page < 1 or per_page > 100:
+        abort(400, description="Invalid pagination parameters")
+
+    transactions, total = search_transactions(_session_for(account_id), q, account_id, per_page, (page - 1) * per_page)
+
+    mimetype = negotiate()
+    return render({
+        'transactions': _serialize_transactions(transactions, mimetype),
+        'total': total,
+        'pagination': {
+            'total': total,
+            'pages': (total + per_page - 1) // per_page,
             'page': page,
             'per_page': per_page
         }
+    }, mimetype=mimetype)
+
+@bp.route('/transactions/archive', methods=['POST'])
+def archive_transactions():
+    # Called by accounts-service, batch after batch, while it closes an account
+    denied = authorize_service()
+    if denied is not None:
+        return denied
+    data = request.get_json(silent=True) or {}
+    account_id = data.get('account_id')
+    limit = data.get('limit', 1000)
+    if not isinstance(account_id, int) or account_id <= 0:
+        abort(400, description="account_id is required")
+    if not isinstance(limit, int) or not 0 < limit <= current_app.config['ARCHIVE_MAX_BATCH']:
+        abort(400, description="Invalid batch size")
+    # accounts-service owns the account; it reports the state it has the account in
+    if data.get('account_status') != 'closing':
+        return jsonify({'error': 'Only transactions of closing accounts are archived'}), 409
+
+    cache = current_app.extensions['balance_cache']
+    with cache.lock(account_id):
+        try:
+            archived, remaining = archive_batch(_session_for(account_id), account_id, limit)
+        finally:
+            cache.invalidate(account_id)
+    return jsonify({'account_id': account_id, 'archived': archived, 'remaining': remaining}), 200
+
+@bp.route('/maintenance/jobs', methods=['GET'])
+def list_jobs():
+    return jsonify({'jobs': current_app.extensions['scheduler'].metrics()}), 200
+
+@bp.route('/maintenance/velocity', methods=['GET'])
+def velocity_metrics():
+    tracker = current_app.extensions.get('velocity')
+    if tracker is None:
+        abort(404, description="Velocity checks are disabled")
+    return jsonify(tracker.metrics()), 200
 
-    return jsonify(response), 200
+@bp.route('/health', methods=['GET'])
+def health():
+    return jsonify({
+        'status': 'ok',
+        'import_ms': current_app.config['IMPORT_MS'],
+        'boot_ms': current_app.config['BOOT_MS']
+    }), 200
 
-@app.errorhandler(400)
+@bp.app_errorhandler(400)
 def bad_request(e):
     return jsonify(error=str(e.description)), 400
 
-@app.errorhandler(404)
+@bp.app_errorhandler(404)
 def not_found(e):
     return jsonify(error=str(e.description)), 404
+
+@bp.app_errorhandler(503)
+def service_unavailable(e):
+    return jsonify(error=str(e.description)), 503
     
 
 
-def init_db():
+def init_db(app):
     with app.app_context():
         db.create_all()
 
+def _reloader_watcher():
+    # `python app.py` runs under the debug reloader: this first process only
+    # watches files, and the child it starts with WERKZEUG_RUN_MAIN set serves
+    return __name__ == '__main__' and os.environ.get('WERKZEUG_RUN_MAIN') != 'true'
+
+def create_app(config_name=None):
+    boot_started = time.perf_counter()
+    app = Flask(__name__)
+    app.config.from_object(get_config(config_name))
+
+    # Engines connect lazily; the only queries at boot are create_all when
+    # CREATE_SCHEMA is set and the velocity rebuild further down
+    db.init_app(app)
+    init_sharding(app, db.metadata)
+    if app.config['MIGRATIONS_ENABLED']:
+        from flask_migrate import Migrate
+        Migrate(app, db)
+    init_compression(app)
+
+    init_tracing(app)
+    init_profiling(app)
+
+    scheduler = Scheduler(max_workers=app.config['SCHEDULER_MAX_WORKERS'])
+    register_maintenance_jobs(scheduler, app, db)
+    init_rate_limiting(app, scheduler)
+    app.extensions['scheduler'] = scheduler
+
+    app.register_blueprint(bp)
+
+    if app.config['CREATE_SCHEMA']:
+        init_db(app)
+
+    init_fx(app)
+    init_velocity(app, db, scheduler)
+    init_balances(app)
+
+    # Jobs run in every serving process, whatever server started it
+    if app.config['SCHEDULER_ENABLED'] and not _reloader_watcher():
+        scheduler.start()
+
+    app.config['IMPORT_MS'] = _import_ms
+    app.config['BOOT_MS'] = round((time.perf_counter() - boot_started) * 1000, 1)
+    logger.info('App created in %.1f ms (imports took %.1f ms)', app.config['BOOT_MS'], app.config['IMPORT_MS'])
+    return app
+
+app = create_app()
+
 if __name__ == '__main__':
-    with app.app_context():
-        init_db()
     app.run(debug=True, host='0.0.0.0', port=5001)
@@ -0,0 +1,31 @@
+from sqlalchemy import delete, func, insert, select
+
+from models import ArchivedTransaction, Transaction
+
+ARCHIVED_COLUMNS = ('id', 'account_id', 'amount', 'type', 'description', 'balance_after', 'timestamp', 'currency')
+
+
+def archive_batch(session, account_id, limit):
+    """Move up to ``limit`` of an account's oldest transactions into the archive.
+
+    Copy and delete commit together, so an interrupted purge can simply be
+    resumed. Returns ``(archived, remaining)``.
+    """
+    ids = [row[0] for row in session.execute(
+        select(Transaction.id).where(Transaction.account_id == account_id).order_by(Transaction.id).limit(limit)
+    )]
+    if ids:
+        try:
+            session.execute(insert(ArchivedTransaction).from_select(
+                ARCHIVED_COLUMNS,
+                select(*(getattr(Transaction, column) for column in ARCHIVED_COLUMNS)).where(Transaction.id.in_(ids))
+            ))
+            session.execute(delete(Transaction).where(Transaction.id.in_(ids)))
+            session.commit()
+        except Exception:
+            session.rollback()
+            raise
+    remaining = session.execute(
+        select(func.count(Transaction.id)).where(Transaction.account_id == account_id)
+    ).scalar()
+    return len(ids), remaining
@@ -0,0 +1,165 @@
+"""Server-side running balances.
+
+``BalanceCache`` keeps the last ``balance_after`` and ``sequence`` of the
+most recently used accounts in memory so a new transaction's balance is
+derived without reading history; least recently used accounts are
+dropped past ``maxsize``. Each account maps to one of a fixed set of
+locks, held from reading the cached balance until the insert commits,
+so concurrent writes to one account in a process are applied one after
+another while most other accounts proceed in parallel.
+
+Across processes the database keeps the chain intact: every row takes
+the next ``sequence`` of its account and ``(account_id, sequence)`` is
+unique. A balance cached before another process wrote to the account
+fails to insert, and the write is recomputed from the latest row.
+
+Existing rows can be backfilled in bulk:
+    python balances.py --database transactions.db [--batch-accounts 10000]
+"""
+import argparse
+import logging
+import sqlite3
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+from sqlalchemy import event
+
+from models import BALANCE_EFFECT, Transaction
+
+logger = logging.getLogger(__name__)
+
+
+def apply(balance, type_, amount):
+    return round(balance + BALANCE_EFFECT[type_] * amount, 2)
+
+
+def latest(session, account_id):
+    """``(balance_after, sequence)`` of an account's newest transaction, or None if it has none."""
+    row = session.query(Transaction.balance_after, Transaction.sequence).filter(
+        Transaction.account_id == account_id
+    ).order_by(Transaction.id.desc()).limit(1).first()
+    if row is None:
+        return None
+    # Rows written before sequences were kept have none
+    return row.balance_after, row.sequence or 0
+
+
+class BalanceCache:
+    def __init__(self, enabled=True, maxsize=100000, lock_stripes=1024):
+        self.enabled = enabled
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._balances = OrderedDict()
+        # A fixed set of locks shared by all accounts, so memory doesn't
+        # grow with every account ever written
+        self._locks = [threading.Lock() for _ in range(lock_stripes)]
+        self._guard = threading.Lock()
+
+    def __len__(self):
+        return len(self._balances)
+
+    def lock(self, account_id):
+        return self._locks[hash(account_id) % len(self._locks)]
+
+    def get(self, session, account_id):
+        """Last known ``(balance, sequence)`` of an account; call with the account's lock held."""
+        if self.enabled:
+            with self._guard:
+                if account_id in self._balances:
+                    self.hits += 1
+                    self._balances.move_to_end(account_id)
+                    return self._balances[account_id]
+        self.misses += 1
+        last = latest(session, account_id)
+        if last is not None:
+            self.set(account_id, *last)
+        return last
+
+    def set(self, account_id, balance, sequence):
+        if not self.enabled:
+            return
+        with self._guard:
+            self._balances[account_id] = (balance, sequence)
+            self._balances.move_to_end(account_id)
+            while len(self._balances) > self.maxsize:
+                self._balances.popitem(last=False)
+
+    def invalidate(self, account_id=None):
+        with self._guard:
+            if account_id is None:
+                self._balances.clear()
+            else:
+                self._balances.pop(account_id, None)
+
+
+def init_balances(app):
+    cache = BalanceCache(enabled=app.config['BALANCE_CACHE_ENABLED'], maxsize=app.config['BALANCE_CACHE_SIZE'])
+    app.extensions['balance_cache'] = cache
+    # Cached balances describe rows that no longer exist once the table is dropped
+    event.listen(Transaction.__table__, 'after_drop', lambda *args, **kwargs: cache.invalidate())
+    return cache
+
+
+# Recomputes balance_after for a range of accounts in one statement. The
+# opening balance of each account is taken from its first row, which is
+# the balance the client seeded it with.
+BACKFILL_SQL = """
+WITH ordered AS (
+    SELECT
+        id,
+        FIRST_VALUE(balance_after - {effect}) OVER (PARTITION BY account_id ORDER BY id)
+            + SUM({effect}) OVER (PARTITION BY account_id ORDER BY id) AS computed
+    FROM transactions
+    WHERE account_id BETWEEN :low AND :high
+)
+UPDATE transactions
+SET balance_after = ROUND(ordered.computed, 2)
+FROM ordered
+WHERE ordered.id = transactions.id AND transactions.balance_after != ROUND(ordered.computed, 2)
+"""
+
+
+def _effect_sql():
+    cases = ' '.join(f"WHEN '{type_}' THEN {sign} * amount" for type_, sign in BALANCE_EFFECT.items())
+    return f'(CASE type {cases} END)'
+
+
+def backfill(connection, batch_accounts=10000):
+    """Rewrite ``balance_after`` from the running sum, one account range per transaction.
+
+    Returns the number of rows that changed.
+    """
+    low, high = connection.execute('SELECT MIN(account_id), MAX(account_id) FROM transactions').fetchone()
+    if low is None:
+        return 0
+    statement = BACKFILL_SQL.format(effect=_effect_sql())
+    # rowcount isn't reported for statements starting with WITH
+    changes = connection.total_changes
+    for start in range(low, high + 1, batch_accounts):
+        with connection:
+            connection.execute(statement, {'low': start, 'high': start + batch_accounts - 1})
+    return connection.total_changes - changes
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Backfill transactions.balance_after from the running sum')
+    parser.add_argument('--database', required=True)
+    parser.add_argument('--batch-accounts', type=int, default=10000)
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    started = time.perf_counter()
+    connection = sqlite3.connect(args.database)
+    try:
+        updated = backfill(connection, args.batch_accounts)
+    finally:
+        connection.close()
+    logger.info('Updated %d rows in %.1fs', updated, time.perf_counter() - started)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
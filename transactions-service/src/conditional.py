@@ -0,0 +1,37 @@
+import hashlib
+
+from flask import current_app, request
+
+
+def collection_etag(max_id, max_timestamp, total, args, variant=''):
+    """Build a weak ETag for a list response from cheap aggregates.
+
+    Transactions are append-only, so the highest id, the newest timestamp
+    and the row count change whenever the result set does. The query
+    string and ``variant`` (the negotiated format) are folded in because
+    each page, sort order and encoding is its own representation.
+    """
+    key = '|'.join([
+        str(max_id),
+        max_timestamp.isoformat() if max_timestamp else '',
+        str(total),
+        '&'.join(f'{k}={v}' for k, v in sorted(args.items(multi=True))),
+        variant
+    ])
+    return hashlib.sha1(key.encode('utf-8')).hexdigest()
+
+
+def not_modified(etag, last_modified=None):
+    """Return a 304 response if the client already has this representation."""
+    if not request.if_none_match.contains_weak(etag):
+        return None
+    response = current_app.response_class(status=304)
+    set_validators(response, etag, last_modified)
+    return response
+
+
+def set_validators(response, etag, last_modified=None):
+    response.set_etag(etag, weak=True)
+    if last_modified is not None:
+        response.last_modified = last_modified
+    return response
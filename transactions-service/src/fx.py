@@ -0,0 +1,117 @@
+"""Exchange rates for reporting amounts in another currency.
+
+Rates come from a local JSON file that quotes every currency against
+one base currency:
+    {"base": "USD", "rates": {"USD": 1.0, "EUR": 0.92, "GBP": 0.79}}
+
+``FxCache`` keeps the parsed table in memory and re-reads the file when
+it changes, checking at most every ``check_interval`` seconds. Each load
+is an immutable ``RateTable`` with a version derived from the file
+contents. A request converts everything against the one table it
+fetched, and the version goes out with the response and into its ETag.
+"""
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+_currency_pattern = re.compile(r'^[A-Z]{3}$')
+
+
+class UnknownCurrency(ValueError):
+    pass
+
+
+def validate_currency(code):
+    if not isinstance(code, str) or not _currency_pattern.match(code):
+        raise ValueError("Currency must be a three letter ISO 4217 code")
+    return code
+
+
+class RateTable:
+    __slots__ = ('base', 'rates', 'version', 'loaded_at')
+
+    def __init__(self, base, rates, version, loaded_at=None):
+        self.base = validate_currency(base)
+        self.rates = {validate_currency(code): float(rate) for code, rate in rates.items()}
+        self.rates.setdefault(self.base, 1.0)
+        if any(rate <= 0 for rate in self.rates.values()):
+            raise ValueError("Exchange rates must be positive")
+        self.version = version
+        self.loaded_at = loaded_at or time.time()
+
+    @classmethod
+    def from_json(cls, content):
+        data = json.loads(content)
+        return cls(data['base'], data['rates'], hashlib.sha1(content).hexdigest()[:12])
+
+    def factors(self, sources, target, strict=True):
+        """Multiplier from each of ``sources`` into ``target``, one lookup per currency.
+
+        A source without a rate raises ``UnknownCurrency``, or maps to None
+        when not ``strict``.
+        """
+        if target not in self.rates:
+            raise UnknownCurrency(f"No exchange rate for {target}")
+        missing = {code for code in sources if code not in self.rates}
+        if missing and strict:
+            raise UnknownCurrency(f"No exchange rate for {', '.join(sorted(missing))}")
+        return {code: None if code in missing else self.rates[target] / self.rates[code] for code in sources}
+
+    def convert(self, amounts, currencies, target, strict=True):
+        """Convert parallel columns of amounts and currencies in one pass."""
+        factors = self.factors(set(currencies), target, strict)
+        return [None if factors[code] is None else round(amount * factors[code], 2)
+                for amount, code in zip(amounts, currencies)]
+
+
+class FxCache:
+    def __init__(self, path, check_interval=60):
+        self.path = path
+        self.check_interval = check_interval
+        self.loads = 0
+        self._table = None
+        self._stat = None
+        self._checked_at = None
+        self._lock = threading.Lock()
+
+    def current(self):
+        """The latest rate table, or None if no rates file could be read."""
+        now = time.monotonic()
+        if self._checked_at is None or now - self._checked_at >= self.check_interval:
+            with self._lock:
+                if self._checked_at is None or now - self._checked_at >= self.check_interval:
+                    self._refresh()
+                    self._checked_at = now
+        return self._table
+
+    def _refresh(self):
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return
+        signature = (stat.st_mtime_ns, stat.st_size)
+        if signature == self._stat:
+            return
+        try:
+            with open(self.path, 'rb') as f:
+                table = RateTable.from_json(f.read())
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            # Keep serving the last good table rather than failing reports
+            logger.warning(f'Could not load exchange rates from {self.path}: {str(e)}')
+            return
+        self._table = table
+        self._stat = signature
+        self.loads += 1
+        logger.info('Loaded %d exchange rates, version %s', len(table.rates), table.version)
+
+
+def init_fx(app):
+    cache = FxCache(app.config['FX_RATES_FILE'], check_interval=app.config['FX_CHECK_INTERVAL'])
+    app.extensions['fx'] = cache
+    return cache
@@ -10,8 +10,23 @@ class Base(DeclarativeBase):
 
 db = SQLAlchemy(model_class=Base)
 
+# How each transaction type moves the balance of the account it is
+# recorded against. Transfers are recorded on the sending account.
+BALANCE_EFFECT = {'deposit': 1, 'withdrawal': -1, 'transfer': -1}
+
 class Transaction(db.Model):
     __tablename__ = 'transactions'
+    __table_args__ = (
+        db.Index('ix_transactions_account_id_id', 'account_id', 'id'),
+        # The velocity windows are replayed from the last hour of debits at boot
+        db.Index('ix_transactions_type_timestamp', 'type', 'timestamp'),
+        # Each write claims the next position in its account's history, so a
+        # balance computed from a stale one fails to insert in every process
+        db.Index('ix_transactions_account_id_sequence', 'account_id', 'sequence', unique=True),
+        # Ids are never handed out twice, even after the newest rows are
+        # archived; the archive keeps them as its primary key
+        {'sqlite_autoincrement': True},
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     account_id = db.Column(db.Integer, nullable=False)
@@ -20,6 +35,8 @@ class Transaction(db.Model):
     description = db.Column(db.String(200))
     balance_after = db.Column(db.Float, nullable=False)
     timestamp = db.Column(db.DateTime, default=datetime.utcnow)
+    currency = db.Column(db.String(3), nullable=False, default='USD', server_default='USD')
+    sequence = db.Column(db.Integer)
 
     @validates('account_id')
     def validate_account_id(self, key, value):
@@ -39,6 +56,12 @@ class Transaction(db.Model):
         if value not in ('deposit', 'withdrawal', 'transfer'):
             raise ValueError(f"Invalid transaction type: {value}")
         return value
+
+    @validates('currency')
+    def validate_currency(self, key, value):
+        if not isinstance(value, str) or len(value) != 3 or not value.isalpha() or not value.isupper():
+            raise ValueError("Currency must be a three letter ISO 4217 code")
+        return value
     
     @validates('amount')
     def validate_amount(self, key, value):
@@ -55,4 +78,25 @@ class Transaction(db.Model):
 
 
     def __repr__(self):
-        return f'<Transaction {self.id}>'
\ No newline at end of file
+        return f'<Transaction {self.id}>'
+
+
+class ArchivedTransaction(db.Model):
+    """Transactions of closed accounts, moved out of the live table."""
+    __tablename__ = 'transactions_archive'
+    __table_args__ = (
+        db.Index('ix_transactions_archive_account_id', 'account_id'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    account_id = db.Column(db.Integer, nullable=False)
+    amount = db.Column(db.Float, nullable=False)
+    type = db.Column(Enum('deposit', 'withdrawal', 'transfer', name='transaction_type'), nullable=False)
+    description = db.Column(db.String(200))
+    balance_after = db.Column(db.Float, nullable=False)
+    timestamp = db.Column(db.DateTime)
+    currency = db.Column(db.String(3), nullable=False, default='USD', server_default='USD')
+    archived_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<ArchivedTransaction {self.id}>'
\ No newline at end of file
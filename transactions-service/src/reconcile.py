@@ -0,0 +1,199 @@
+"""Reconcile account balances against the transaction ledger.
+
+Usage:
+    python reconcile.py --accounts-db accounts.db --transactions-db transactions.db [--workers N] [--rebuild]
+
+Both databases are streamed in account-id order and the id range is
+split into shards that are checked in parallel worker processes. For
+every account three things are compared:
+
+* ``Account.balance`` against the ``balance_after`` of its latest transaction
+* every ``balance_after`` against the running sum of the opening balance
+  plus deposits minus withdrawals and transfers, i.e. the ledger has no
+  gaps; the first row that breaks it is reported
+* transactions must belong to an account that exists
+
+With ``--rebuild`` mismatched account balances are overwritten with the
+balance derived from the ledger.
+"""
+import argparse
+import json
+import logging
+import sqlite3
+import sys
+import time
+from multiprocessing import Pool
+
+from models import BALANCE_EFFECT
+
+logger = logging.getLogger(__name__)
+
+TOLERANCE = 0.005
+
+ACCOUNTS_QUERY = 'SELECT id, balance FROM account WHERE id BETWEEN ? AND ? ORDER BY id'
+
+TRANSACTIONS_QUERY = """
+SELECT id, account_id, type, amount, balance_after
+FROM transactions
+WHERE account_id BETWEEN ? AND ?
+ORDER BY account_id, id
+"""
+
+
+def _connect_readonly(path):
+    connection = sqlite3.connect(f'file:{path}?mode=ro', uri=True)
+    connection.execute('PRAGMA query_only = ON')
+    return connection
+
+
+def _ledgers(rows):
+    """Fold a stream of transaction rows into one summary per account."""
+    current = None
+    for id_, account_id, type_, amount, balance_after in rows:
+        delta = BALANCE_EFFECT[type_] * amount
+        if current is None or current['account_id'] != account_id:
+            if current is not None:
+                yield current
+            current = {
+                'account_id': account_id,
+                'count': 0,
+                'opening': balance_after - delta,
+                'net': 0.0,
+                'first_drift': None
+            }
+        current['count'] += 1
+        current['net'] += delta
+        # A wrong row is reported even when a later one happens to be right again
+        running = current['opening'] + current['net']
+        if current['first_drift'] is None and abs(balance_after - running) > TOLERANCE:
+            current['first_drift'] = {'transaction_id': id_, 'actual': balance_after, 'expected': running}
+    if current is not None:
+        yield current
+
+
+def reconcile_range(args):
+    """Check one shard of account ids. Runs in a worker process."""
+    accounts_db, transactions_db, low, high = args
+    accounts = _connect_readonly(accounts_db)
+    transactions = _connect_readonly(transactions_db)
+    try:
+        account_rows = accounts.execute(ACCOUNTS_QUERY, (low, high))
+        ledgers = _ledgers(transactions.execute(TRANSACTIONS_QUERY, (low, high)))
+
+        mismatches = []
+        checked = 0
+        account = next(account_rows, None)
+        ledger = next(ledgers, None)
+        # Merge join of the two sorted streams
+        while account is not None or ledger is not None:
+            if ledger is None or (account is not None and account[0] < ledger['account_id']):
+                # No transactions recorded, nothing to compare against
+                checked += 1
+                account = next(account_rows, None)
+                continue
+
+            expected = ledger['opening'] + ledger['net']
+            if account is None or ledger['account_id'] < account[0]:
+                mismatches.append({
+                    'account_id': ledger['account_id'],
+                    'kind': 'missing_account',
+                    'transactions': ledger['count'],
+                    'expected': expected
+                })
+                ledger = next(ledgers, None)
+                continue
+
+            checked += 1
+            account_id, balance = account
+            if ledger['first_drift'] is not None:
+                mismatches.append({'account_id': account_id, 'kind': 'ledger_drift', **ledger['first_drift']})
+            if abs((balance or 0.0) - expected) > TOLERANCE:
+                mismatches.append({
+                    'account_id': account_id,
+                    'kind': 'balance_mismatch',
+                    'actual': balance,
+                    'expected': expected
+                })
+            account = next(account_rows, None)
+            ledger = next(ledgers, None)
+        return checked, mismatches
+    finally:
+        accounts.close()
+        transactions.close()
+
+
+def _shards(accounts_db, transactions_db, count):
+    low, high = None, None
+    for path, query in ((accounts_db, 'SELECT MIN(id), MAX(id) FROM account'),
+                        (transactions_db, 'SELECT MIN(account_id), MAX(account_id) FROM transactions')):
+        connection = _connect_readonly(path)
+        try:
+            row_low, row_high = connection.execute(query).fetchone()
+        finally:
+            connection.close()
+        if row_low is not None:
+            low = row_low if low is None else min(low, row_low)
+            high = row_high if high is None else max(high, row_high)
+    if low is None:
+        return []
+    size = max(1, (high - low + 1 + count - 1) // count)
+    return [(start, min(start + size - 1, high)) for start in range(low, high + 1, size)]
+
+
+def reconcile(accounts_db, transactions_db, workers=4):
+    started = time.perf_counter()
+    tasks = [(accounts_db, transactions_db, low, high)
+             for low, high in _shards(accounts_db, transactions_db, workers * 4)]
+
+    checked = 0
+    mismatches = []
+    if workers > 1 and len(tasks) > 1:
+        with Pool(workers) as pool:
+            results = pool.map(reconcile_range, tasks)
+    else:
+        results = map(reconcile_range, tasks)
+    for shard_checked, shard_mismatches in results:
+        checked += shard_checked
+        mismatches.extend(shard_mismatches)
+
+    return {
+        'accounts_checked': checked,
+        'mismatches': mismatches,
+        'elapsed': round(time.perf_counter() - started, 3)
+    }
+
+
+def rebuild_balances(accounts_db, mismatches, batch_size=1000):
+    """Overwrite mismatched account balances with the ledger balance."""
+    updates = [(m['expected'], m['account_id']) for m in mismatches if m['kind'] == 'balance_mismatch']
+    connection = sqlite3.connect(accounts_db)
+    try:
+        for i in range(0, len(updates), batch_size):
+            with connection:
+                connection.executemany('UPDATE account SET balance = ? WHERE id = ?', updates[i:i + batch_size])
+    finally:
+        connection.close()
+    return len(updates)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Reconcile account balances against the transaction ledger')
+    parser.add_argument('--accounts-db', required=True)
+    parser.add_argument('--transactions-db', required=True)
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--rebuild', action='store_true', help='rewrite mismatched balances from the ledger')
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    report = reconcile(args.accounts_db, args.transactions_db, args.workers)
+    if args.rebuild:
+        report['rebuilt'] = rebuild_balances(args.accounts_db, report['mismatches'])
+    logger.info('Checked %d accounts in %.1fs, %d mismatches',
+                report['accounts_checked'], report['elapsed'], len(report['mismatches']))
+    json.dump(report, sys.stdout, indent=2)
+    sys.stdout.write('\n')
+    return 1 if report['mismatches'] and not args.rebuild else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,103 @@
+import re
+
+from sqlalchemy import DDL, event, text
+
+from models import Transaction
+
+# External-content FTS5 table over transactions.description. The prefix
+# option keeps 2 and 3 character prefix indexes so "re*" style queries
+# don't have to scan the whole term list.
+CREATE_FTS_TABLE = """
+CREATE VIRTUAL TABLE IF NOT EXISTS transactions_fts USING fts5(
+    description,
+    content='transactions',
+    content_rowid='id',
+    tokenize='unicode61',
+    prefix='2 3'
+)
+"""
+
+# Triggers keep the index in sync with every write to transactions
+CREATE_FTS_TRIGGERS = [
+    """
+    CREATE TRIGGER IF NOT EXISTS transactions_fts_insert AFTER INSERT ON transactions BEGIN
+        INSERT INTO transactions_fts(rowid, description) VALUES (new.id, new.description);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS transactions_fts_delete AFTER DELETE ON transactions BEGIN
+        INSERT INTO transactions_fts(transactions_fts, rowid, description) VALUES ('delete', old.id, old.description);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS transactions_fts_update AFTER UPDATE OF description ON transactions BEGIN
+        INSERT INTO transactions_fts(transactions_fts, rowid, description) VALUES ('delete', old.id, old.description);
+        INSERT INTO transactions_fts(rowid, description) VALUES (new.id, new.description);
+    END
+    """
+]
+
+DROP_FTS_TABLE = "DROP TABLE IF EXISTS transactions_fts"
+
+REBUILD_FTS = "INSERT INTO transactions_fts(transactions_fts) VALUES ('rebuild')"
+
+SEARCH_QUERY = """
+SELECT transactions.id, bm25(transactions_fts) AS rank
+FROM transactions_fts
+JOIN transactions ON transactions.id = transactions_fts.rowid
+WHERE transactions_fts MATCH :query AND transactions.account_id = :account_id
+ORDER BY rank
+LIMIT :limit OFFSET :offset
+"""
+
+COUNT_QUERY = """
+SELECT COUNT(*)
+FROM transactions_fts
+JOIN transactions ON transactions.id = transactions_fts.rowid
+WHERE transactions_fts MATCH :query AND transactions.account_id = :account_id
+"""
+
+_term_pattern = re.compile(r'\w+', re.UNICODE)
+
+
+def build_match_query(q):
+    """Turn free-form user input into an FTS5 prefix query.
+
+    Every word is quoted so user input can never be parsed as FTS5
+    syntax, and the last word gets a prefix wildcard for search-as-you-type.
+    """
+    terms = _term_pattern.findall(q or '')
+    if not terms:
+        return None
+    quoted = [f'"{term}"' for term in terms]
+    quoted[-1] += '*'
+    return ' '.join(quoted)
+
+
+def search_transactions(session, q, account_id, limit, offset):
+    """Return ``(transactions, total)`` ranked best match first."""
+    match = build_match_query(q)
+    if match is None:
+        return [], 0
+
+    if session.get_bind().dialect.name != 'sqlite':
+        query = session.query(Transaction).filter(
+            Transaction.account_id == account_id,
+            Transaction.description.ilike(f'%{q}%')
+        )
+        total = query.count()
+        transactions = query.order_by(Transaction.timestamp.desc()).limit(limit).offset(offset).all()
+        return transactions, total
+
+    params = {'query': match, 'account_id': account_id}
+    total = session.execute(text(COUNT_QUERY), params).scalar()
+    rows = session.execute(text(SEARCH_QUERY), dict(params, limit=limit, offset=offset)).all()
+    ids = [row.id for row in rows]
+    by_id = {t.id: t for t in session.query(Transaction).filter(Transaction.id.in_(ids))} if ids else {}
+    return [by_id[i] for i in ids], total
+
+
+event.listen(Transaction.__table__, 'after_create', DDL(CREATE_FTS_TABLE).execute_if(dialect='sqlite'))
+for trigger in CREATE_FTS_TRIGGERS:
+    event.listen(Transaction.__table__, 'after_create', DDL(trigger).execute_if(dialect='sqlite'))
+event.listen(Transaction.__table__, 'before_drop', DDL(DROP_FTS_TABLE).execute_if(dialect='sqlite'))
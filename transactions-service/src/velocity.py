@@ -0,0 +1,202 @@
+import logging
+import threading
+import time
+from datetime import datetime, timezone
+
+from models import Transaction
+
+logger = logging.getLogger(__name__)
+
+
+class SlidingWindow:
+    """Count and total of one account's debits over the last ``window`` seconds.
+
+    The window is a ring of fixed-width time buckets with running totals,
+    so recording a debit or checking the limits costs O(1) amortised:
+    advancing the ring clears at most one slot per bucket that elapsed.
+    """
+
+    __slots__ = ('width', 'counts', 'sums', 'head', 'count', 'total')
+
+    def __init__(self, buckets, width):
+        self.width = width
+        self.counts = [0] * buckets
+        self.sums = [0.0] * buckets
+        self.head = None
+        self.count = 0
+        self.total = 0.0
+
+    def advance(self, now):
+        bucket = int(now // self.width)
+        if self.head is None or bucket - self.head >= len(self.counts):
+            self.counts = [0] * len(self.counts)
+            self.sums = [0.0] * len(self.sums)
+            self.count = 0
+            self.total = 0.0
+        elif bucket > self.head:
+            for b in range(self.head + 1, bucket + 1):
+                slot = b % len(self.counts)
+                self.count -= self.counts[slot]
+                self.total -= self.sums[slot]
+                self.counts[slot] = 0
+                self.sums[slot] = 0.0
+        if self.head is None or bucket > self.head:
+            self.head = bucket
+        return bucket
+
+    def add(self, amount, now, count=1):
+        bucket = self.advance(now)
+        if bucket <= self.head - len(self.counts):
+            return
+        slot = bucket % len(self.counts)
+        self.counts[slot] += count
+        self.sums[slot] += amount
+        self.count += count
+        self.total += amount
+
+
+class VelocityTracker:
+    """Per-account sliding-window limits on withdrawals and transfers.
+
+    ``max_amount`` is in ``currency``; callers record debits converted
+    into it with ``normalize``, so accounts in any currency share a limit.
+    """
+
+    def __init__(self, window=3600, buckets=60, max_count=None, max_amount=None,
+                 types=('withdrawal', 'transfer'), currency='USD'):
+        self.window = window
+        self.buckets = buckets
+        self.width = window / buckets
+        self.max_count = max_count
+        self.max_amount = max_amount
+        self.currency = currency
+        self.types = tuple(types)
+        self.rejected_count = 0
+        self.rejected_amount = 0
+        self.accepted = 0
+        self._windows = {}
+        self._lock = threading.Lock()
+
+    def applies_to(self, type_):
+        return type_ in self.types
+
+    def normalize(self, amount, currency, rates):
+        """``amount`` in the currency of the limits, converted with ``rates``.
+
+        Amounts are taken as they are without rates for both currencies.
+        """
+        if rates is None or currency == self.currency or self.currency not in rates.rates:
+            return amount
+        factor = rates.factors({currency}, self.currency, strict=False)[currency]
+        return amount if factor is None else amount * factor
+
+    def _window(self, account_id):
+        window = self._windows.get(account_id)
+        if window is None:
+            window = self._windows[account_id] = SlidingWindow(self.buckets, self.width)
+        return window
+
+    def try_record(self, account_id, amount, now=None):
+        """Record a debit if it stays within the limits.
+
+        Returns ``None`` when accepted, otherwise the reason it was rejected.
+        """
+        now = time.time() if now is None else now
+        with self._lock:
+            window = self._window(account_id)
+            window.advance(now)
+            if self.max_count is not None and window.count + 1 > self.max_count:
+                self.rejected_count += 1
+                return f"More than {self.max_count} debits in {self.window} seconds"
+            if self.max_amount is not None and window.total + amount > self.max_amount:
+                self.rejected_amount += 1
+                return f"Debits would exceed {self.max_amount} {self.currency} in {self.window} seconds"
+            window.add(amount, now)
+            self.accepted += 1
+            return None
+
+    def undo(self, account_id, amount, now):
+        """Take back a debit recorded by ``try_record`` whose write failed."""
+        with self._lock:
+            window = self._windows.get(account_id)
+            if window is not None:
+                window.add(-amount, now, count=-1)
+                self.accepted -= 1
+
+    def record(self, account_id, amount, now):
+        with self._lock:
+            self._window(account_id).add(amount, now)
+
+    def prune(self, now=None):
+        """Drop windows of accounts that had no debits for a whole window."""
+        now = time.time() if now is None else now
+        with self._lock:
+            stale = [account_id for account_id, window in self._windows.items()
+                     if int(now // self.width) - window.head >= self.buckets]
+            for account_id in stale:
+                del self._windows[account_id]
+        return len(stale)
+
+    def clear(self):
+        with self._lock:
+            self._windows.clear()
+
+    def rebuild(self, session, now=None, rates=None):
+        """Replay the last window of debits from the database, converted with ``rates``."""
+        now = time.time() if now is None else now
+        since = datetime.fromtimestamp(now - self.window, tz=timezone.utc).replace(tzinfo=None)
+        rows = session.query(Transaction.account_id, Transaction.amount, Transaction.currency,
+                             Transaction.timestamp).filter(
+            Transaction.type.in_(self.types),
+            Transaction.timestamp >= since
+        ).order_by(Transaction.timestamp)
+        replayed = 0
+        for account_id, amount, currency, timestamp in rows.yield_per(10000):
+            self.record(account_id, self.normalize(amount, currency, rates),
+                        timestamp.replace(tzinfo=timezone.utc).timestamp())
+            replayed += 1
+        return replayed
+
+    def metrics(self):
+        with self._lock:
+            return {
+                'accounts_tracked': len(self._windows),
+                'accepted': self.accepted,
+                'rejected_count': self.rejected_count,
+                'rejected_amount': self.rejected_amount,
+                'window': self.window,
+                'max_count': self.max_count,
+                'max_amount': self.max_amount,
+                'currency': self.currency
+            }
+
+
+def init_velocity(app, db, scheduler):
+    if not app.config['VELOCITY_ENABLED']:
+        return None
+    tracker = VelocityTracker(
+        window=app.config['VELOCITY_WINDOW'],
+        buckets=app.config['VELOCITY_BUCKETS'],
+        max_count=app.config['VELOCITY_MAX_COUNT'],
+        max_amount=app.config['VELOCITY_MAX_AMOUNT'],
+        currency=app.config['VELOCITY_CURRENCY']
+    )
+    app.extensions['velocity'] = tracker
+    scheduler.add_job('velocity_prune', tracker.prune, interval=tracker.window, jitter=60)
+
+    started = time.perf_counter()
+    fx = app.extensions.get('fx')
+    rates = fx.current() if fx is not None else None
+    with app.app_context():
+        router = app.extensions.get('shard_router')
+        try:
+            if router is not None:
+                replayed = sum(router.fan_out(lambda session: tracker.rebuild(session, rates=rates)))
+            else:
+                replayed = tracker.rebuild(db.session, rates=rates)
+        except Exception as e:
+            replayed = 0
+            logger.warning(f'Could not rebuild velocity windows: {str(e)}')
+    logger.info('Rebuilt velocity windows from %d transactions in %.1f ms',
+                replayed, (time.perf_counter() - started) * 1000)
+    return tracker
@@ -0,0 +1,78 @@
+"""Shared test fixtures.
+
+The schema is built once per test session into an in-memory database and
+every test runs inside a transaction that is rolled back when it ends.
+Commits made by the code under test only release a SAVEPOINT, so tests
+never see each other's rows and nothing is rebuilt between them.
+
+Tests also run in parallel with pytest-xdist. Each worker then builds the
+schema once into its own database file:
+    python -m pytest -q -n auto
+"""
+import os
+import sys
+import pytest
+from sqlalchemy import event
+from sqlalchemy.orm import scoped_session, sessionmaker
+
+
+# Add the src directory to sys.path
+src_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src'))
+sys.path.insert(0, src_dir)
+
+# app.py builds an app on import; keep it off the development database file
+os.environ.setdefault('APP_ENV', 'testing')
+
+import config
+from app import create_app
+from models import db
+
+
+def _database_uri(tmp_path_factory):
+    worker = os.environ.get('PYTEST_XDIST_WORKER')
+    if worker is None:
+        return 'sqlite://'
+    return f"sqlite:///{tmp_path_factory.getbasetemp() / f'transactions-{worker}.db'}"
+
+
+@pytest.fixture(scope='session')
+def schema_app(tmp_path_factory):
+    """An app whose database has the schema but no rows, shared by the session."""
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setattr(config.TestingConfig, 'SQLALCHEMY_DATABASE_URI', _database_uri(tmp_path_factory))
+        # pysqlite defers BEGIN on its own, which breaks SAVEPOINT; leave
+        # transaction control to SQLAlchemy instead
+        mp.setattr(config.TestingConfig, 'SQLALCHEMY_ENGINE_OPTIONS',
+                   {'connect_args': {'isolation_level': None}}, raising=False)
+        app = create_app('testing')
+    with app.app_context():
+        event.listen(db.engine, 'begin', lambda connection: connection.exec_driver_sql('BEGIN'))
+    yield app
+    with app.app_context():
+        db.engine.dispose()
+
+
+@pytest.fixture
+def app(schema_app):
+    """The shared app with everything a test writes rolled back afterwards."""
+    with schema_app.app_context():
+        connection = db.engine.connect()
+    transaction = connection.begin()
+    session = db.session
+    db.session = scoped_session(sessionmaker(bind=connection, join_transaction_mode='create_savepoint'))
+    try:
+        yield schema_app
+    finally:
+        db.session.remove()
+        db.session = session
+        transaction.rollback()
+        connection.close()
+        # In-process state derived from the rows that were just rolled back
+        schema_app.extensions['balance_cache'].invalidate()
+        if 'velocity' in schema_app.extensions:
+            schema_app.extensions['velocity'].clear()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
@@ -1,28 +1,17 @@
 import os
 import sys
+import sqlite3
 import pytest
 from flask import json
-from datetime import datetime
 
 
 # Add the src directory to sys.path
 src_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src'))
 sys.path.insert(0, src_dir)
 
-from app import app
-from models import db,Transaction
-
-@pytest.fixture
-def client():
-    app.config['TESTING'] = True
-    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
-    
-    with app.test_client() as client:
-        with app.app_context():
-            db.create_all()
-            yield client
-            db.session.remove()
-            db.drop_all()
+import config
+from app import create_app
+from models import Transaction
 
 def test_create_transaction(client):
     # Test data
@@ -94,7 +83,7 @@ def test_create_transaction_with_invalid_account_id(client, invalid_account_id,
     assert 'error' in data
     assert expected_error_content.lower() in data['error'].lower()
     # Verify that no transaction was created in the database
-    with app.app_context():
+    with client.application.app_context():
         transactions = Transaction.query.all()
         assert len(transactions) == 0
 
@@ -283,3 +272,55 @@ def test_sorting(client):
     assert 'transactions' in data
     amounts = [t['amount'] for t in data['transactions']]
     assert amounts == sorted(amounts)
+
+def test_list_transactions_etag(client):
+    create_test_transactions(client)
+
+    response = client.get('/transactions?account_id=1')
+    assert response.status_code == 200
+    etag = response.headers['ETag']
+    assert etag.startswith('W/')
+    assert 'Last-Modified' in response.headers
+
+    # Unchanged result set is answered with an empty 304
+    response = client.get('/transactions?account_id=1', headers={'If-None-Match': etag})
+    assert response.status_code == 304
+    assert response.data == b''
+    assert response.headers['ETag'] == etag
+
+    # A different page of the same data is a different representation
+    response = client.get('/transactions?account_id=1&page=1&per_page=1', headers={'If-None-Match': etag})
+    assert response.status_code == 200
+
+    # A new transaction invalidates the ETag
+    client.post(
+        '/transactions',
+        data=json.dumps({
+            'account_id': 1,
+            'amount': 20.00,
+            'type': 'deposit',
+            'balance_after': 520.00
+        }),
+        content_type='application/json'
+    )
+    response = client.get('/transactions?account_id=1', headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert response.headers['ETag'] != etag
+
+def test_health(client):
+    response = client.get('/health')
+    assert response.status_code == 200
+    data = response.get_json()
+    assert data['status'] == 'ok'
+    assert data['boot_ms'] >= 0
+    assert data['import_ms'] >= 0
+
+def test_production_app_leaves_the_schema_to_migrations(tmp_path, monkeypatch):
+    database = tmp_path / 'transactions.db'
+    monkeypatch.setattr(config.ProductionConfig, 'SQLALCHEMY_DATABASE_URI', f'sqlite:///{database}')
+    monkeypatch.setattr(config.ProductionConfig, 'SCHEDULER_ENABLED', False)
+    app = create_app('production')
+
+    assert app.test_client().get('/health').status_code == 200
+    with sqlite3.connect(database) as connection:
+        assert connection.execute("SELECT name FROM sqlite_master WHERE type = 'table'").fetchall() == []
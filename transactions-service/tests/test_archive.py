@@ -0,0 +1,110 @@
+import os
+import sys
+import pytest
+from flask import json
+
+
+# Add the src directory to sys.path
+src_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src'))
+sys.path.insert(0, src_dir)
+
+import config
+from archive import archive_batch
+from models import db, ArchivedTransaction, Transaction
+
+SERVICE_HEADERS = {'Authorization': f'Bearer {config.TestingConfig.SERVICE_TOKEN}'}
+
+def add_transactions(account_id, count):
+    db.session.add_all([
+        Transaction(account_id=account_id, amount=1.0, type='deposit', balance_after=float(i + 1))
+        for i in range(count)
+    ])
+    db.session.commit()
+
+def archive(client, account_id, limit=1000, headers=SERVICE_HEADERS, **extra):
+    payload = dict({'account_id': account_id, 'limit': limit, 'account_status': 'closing'}, **extra)
+    return client.post('/transactions/archive', data=json.dumps(payload), content_type='application/json',
+                       headers=headers)
+
+def test_archive_batch_moves_oldest_rows(app):
+    with app.app_context():
+        add_transactions(1, 5)
+        add_transactions(2, 2)
+
+        assert archive_batch(db.session, 1, 3) == (3, 2)
+        archived = ArchivedTransaction.query.order_by(ArchivedTransaction.id).all()
+        assert [t.balance_after for t in archived] == [1.0, 2.0, 3.0]
+        assert all(t.archived_at is not None for t in archived)
+
+        assert archive_batch(db.session, 1, 3) == (2, 0)
+        assert archive_batch(db.session, 1, 3) == (0, 0)
+        # Other accounts are untouched
+        assert Transaction.query.count() == 2
+
+def test_archive_endpoint(app, client):
+    with app.app_context():
+        add_transactions(1, 3)
+
+    response = archive(client, 1, limit=2)
+    assert response.status_code == 200
+    assert response.get_json() == {'account_id': 1, 'archived': 2, 'remaining': 1}
+
+    response = archive(client, 1, limit=2)
+    assert response.get_json()['remaining'] == 0
+
+    # Balances start over from what the client reports once the history is gone
+    response = client.post('/transactions', data=json.dumps({
+        'account_id': 1, 'amount': 5.0, 'type': 'deposit', 'balance_after': 5.0
+    }), content_type='application/json')
+    assert response.get_json()['balance_after'] == 5.0
+
+def test_archived_ids_are_not_reused(app, client):
+    with app.app_context():
+        add_transactions(1, 1)
+        add_transactions(2, 2)
+
+    assert archive(client, 2).get_json()['archived'] == 2
+    # The newest ids are gone from the live table, yet never handed out again
+    response = client.post('/transactions', data=json.dumps({
+        'account_id': 2, 'amount': 5.0, 'type': 'deposit'
+    }), content_type='application/json')
+    assert response.get_json()['id'] == 4
+
+    response = archive(client, 2)
+    assert response.status_code == 200
+    assert response.get_json() == {'account_id': 2, 'archived': 1, 'remaining': 0}
+    with app.app_context():
+        assert sorted(t.id for t in ArchivedTransaction.query) == [2, 3, 4]
+
+@pytest.mark.parametrize("payload", [
+    {},
+    {'account_id': 0},
+    {'account_id': 1, 'limit': 0},
+    {'account_id': 1, 'limit': 100000},
+    {'account_id': 1, 'limit': 'all'},
+])
+def test_archive_endpoint_rejects_invalid_input(client, payload):
+    response = client.post('/transactions/archive', data=json.dumps(dict(payload, account_status='closing')),
+                           content_type='application/json', headers=SERVICE_HEADERS)
+    assert response.status_code == 400
+
+@pytest.mark.parametrize("headers", [{}, {'Authorization': 'Bearer wrong'}, {'Authorization': 'Basic x'}])
+def test_archive_endpoint_requires_the_service_token(app, client, headers):
+    with app.app_context():
+        add_transactions(1, 1)
+    assert archive(client, 1, headers=headers).status_code == 401
+    with app.app_context():
+        assert Transaction.query.count() == 1
+
+def test_archive_endpoint_is_disabled_without_a_token(app, client, monkeypatch):
+    monkeypatch.setitem(app.config, 'SERVICE_TOKEN', None)
+    assert archive(client, 1).status_code == 404
+
+@pytest.mark.parametrize("status", [None, 'open'])
+def test_archive_endpoint_only_moves_closing_accounts(app, client, status):
+    with app.app_context():
+        add_transactions(1, 1)
+    response = archive(client, 1, account_status=status)
+    assert response.status_code == 409
+    with app.app_context():
+        assert Transaction.query.count() == 1
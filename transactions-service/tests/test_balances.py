@@ -0,0 +1,178 @@
+import os
+import sqlite3
+import sys
+import threading
+import pytest
+from flask import json
+
+
+# Add the src directory to sys.path
+src_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src'))
+sys.path.insert(0, src_dir)
+
+import config
+from app import create_app
+from balances import BalanceCache, backfill
+from models import db, Transaction
+
+@pytest.fixture
+def threaded_app(tmp_path, monkeypatch):
+    # Requests on several threads need connections of their own, which an
+    # in-memory database can't give them
+    monkeypatch.setattr(config.TestingConfig, 'SQLALCHEMY_DATABASE_URI', f"sqlite:///{tmp_path / 'transactions.db'}")
+    monkeypatch.setattr(config.TestingConfig, 'VELOCITY_ENABLED', False)
+    app = create_app('testing')
+    yield app
+    with app.app_context():
+        db.session.remove()
+        db.drop_all()
+
+def post_transaction(client, type_, amount, account_id=1, **extra):
+    return client.post(
+        '/transactions',
+        data=json.dumps(dict(account_id=account_id, amount=amount, type=type_, **extra)),
+        content_type='application/json'
+    )
+
+def test_first_transaction_opens_at_client_balance(app):
+    client = app.test_client()
+    response = post_transaction(client, 'deposit', 100.0, balance_after=500.0)
+    assert response.status_code == 201
+    assert response.get_json()['balance_after'] == 500.0
+
+    # Without a reported balance a new account starts from zero
+    response = post_transaction(client, 'deposit', 100.0, account_id=2)
+    assert response.get_json()['balance_after'] == 100.0
+
+def test_balance_is_computed_from_previous_row(app):
+    client = app.test_client()
+    post_transaction(client, 'deposit', 100.0, balance_after=500.0)
+    assert post_transaction(client, 'withdrawal', 50.0).get_json()['balance_after'] == 450.0
+    assert post_transaction(client, 'transfer', 25.5).get_json()['balance_after'] == 424.5
+
+    # A client value that disagrees with the ledger is not trusted
+    response = post_transaction(client, 'deposit', 10.0, balance_after=9999.0)
+    assert response.get_json()['balance_after'] == 434.5
+
+def test_cache_miss_reads_latest_row(app):
+    with app.app_context():
+        db.session.add_all([
+            Transaction(account_id=1, amount=10.0, type='deposit', balance_after=110.0, sequence=1),
+            Transaction(account_id=1, amount=30.0, type='withdrawal', balance_after=80.0, sequence=2),
+        ])
+        db.session.commit()
+        cache = BalanceCache()
+        assert cache.get(db.session, 1) == (80.0, 2)
+        assert cache.get(db.session, 1) == (80.0, 2)
+        assert cache.get(db.session, 2) is None
+        assert (cache.hits, cache.misses) == (1, 2)
+
+@pytest.mark.parametrize("balance_after, expected_status", [(None, 201), ('lots', 400), (True, 400)])
+def test_first_transaction_validates_client_balance(app, balance_after, expected_status):
+    response = post_transaction(app.test_client(), 'deposit', 100.0, balance_after=balance_after)
+    assert response.status_code == expected_status
+    if expected_status == 201:
+        # null counts as not reported
+        assert response.get_json()['balance_after'] == 100.0
+
+def test_cache_is_bounded():
+    cache = BalanceCache(maxsize=2, lock_stripes=4)
+    cache.set(1, 10.0, 1)
+    cache.set(2, 20.0, 1)
+    assert cache.get(None, 1) == (10.0, 1)
+    cache.set(3, 30.0, 1)
+    # Account 2 was used least recently
+    assert len(cache) == 2
+    assert 2 not in cache._balances
+    assert cache.lock(1) is cache.lock(5)
+    assert len({cache.lock(account_id) for account_id in range(1000)}) == 4
+
+def test_concurrent_writes_chain_balances(threaded_app):
+    client = threaded_app.test_client()
+    post_transaction(client, 'deposit', 1000.0, balance_after=1000.0)
+
+    def worker():
+        for _ in range(10):
+            assert post_transaction(client, 'withdrawal', 1.0).status_code == 201
+
+    threads = [threading.Thread(target=worker) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    with threaded_app.app_context():
+        balances = [t.balance_after for t in Transaction.query.order_by(Transaction.id)]
+    assert balances == [1000.0 - i for i in range(41)]
+
+@pytest.fixture
+def two_processes(tmp_path, monkeypatch):
+    # Two apps on one database file, each with a balance cache of its own
+    monkeypatch.setattr(config.TestingConfig, 'SQLALCHEMY_DATABASE_URI', f"sqlite:///{tmp_path / 'transactions.db'}")
+    monkeypatch.setattr(config.TestingConfig, 'VELOCITY_ENABLED', False)
+    apps = create_app('testing'), create_app('testing')
+    yield apps
+    with apps[0].app_context():
+        db.session.remove()
+        db.drop_all()
+
+def test_stale_cached_balance_is_recomputed(two_processes):
+    first, second = (app.test_client() for app in two_processes)
+    assert post_transaction(first, 'deposit', 100.0, balance_after=100.0).get_json()['balance_after'] == 100.0
+    assert post_transaction(second, 'withdrawal', 30.0).get_json()['balance_after'] == 70.0
+
+    # The first app still has 100.0 cached; its insert conflicts and is redone
+    response = post_transaction(first, 'withdrawal', 20.0)
+    assert response.status_code == 201
+    assert response.get_json()['balance_after'] == 50.0
+
+    with two_processes[0].app_context():
+        rows = [(t.sequence, t.balance_after) for t in Transaction.query.order_by(Transaction.id)]
+    assert rows == [(1, 100.0), (2, 70.0), (3, 50.0)]
+
+def test_conflict_without_retries_left_is_reported(two_processes, monkeypatch):
+    first, second = (app.test_client() for app in two_processes)
+    post_transaction(first, 'deposit', 100.0, balance_after=100.0)
+    post_transaction(second, 'withdrawal', 30.0)
+
+    monkeypatch.setitem(two_processes[0].config, 'BALANCE_WRITE_RETRIES', 0)
+    assert post_transaction(first, 'withdrawal', 20.0).status_code == 409
+    # The stale entry was dropped, so the next attempt reads the latest row
+    assert post_transaction(first, 'withdrawal', 20.0).get_json()['balance_after'] == 50.0
+
+def test_balance_endpoint(app):
+    client = app.test_client()
+    assert client.get('/transactions/balance?account_id=1').status_code == 404
+    assert client.get('/transactions/balance').status_code == 400
+
+    post_transaction(client, 'deposit', 100.0, balance_after=100.0)
+    post_transaction(client, 'deposit', 50.0)
+    data = client.get('/transactions/balance?account_id=1').get_json()
+    assert data['balance'] == 150.0
+
+    response = client.get('/transactions/balance?account_id=1&at=2000-01-01T00:00:00')
+    assert response.status_code == 404
+    assert client.get('/transactions/balance?account_id=1&at=yesterday').status_code == 400
+
+def test_backfill_recomputes_running_balance(tmp_path):
+    path = str(tmp_path / 'transactions.db')
+    connection = sqlite3.connect(path)
+    connection.execute('CREATE TABLE transactions (id INTEGER PRIMARY KEY, account_id INTEGER, '
+                       'amount FLOAT, type TEXT, balance_after FLOAT)')
+    connection.executemany('INSERT INTO transactions VALUES (?, ?, ?, ?, ?)', [
+        (1, 1, 100.0, 'deposit', 500.0),
+        (2, 2, 20.0, 'withdrawal', 0.0),
+        (3, 1, 50.0, 'withdrawal', 0.0),
+        (4, 1, 25.0, 'transfer', 999.0),
+        (5, 2, 5.0, 'deposit', 0.0),
+        (6, 3, 10.0, 'deposit', 10.0),
+    ])
+    connection.commit()
+
+    assert backfill(connection, batch_accounts=1) == 3
+    rows = connection.execute('SELECT id, balance_after FROM transactions ORDER BY id').fetchall()
+    assert rows == [(1, 500.0), (2, 0.0), (3, 450.0), (4, 425.0), (5, 5.0), (6, 10.0)]
+
+    # Nothing changes on a second run
+    assert backfill(connection) == 0
+    connection.close()
@@ -0,0 +1,52 @@
+import gzip
+import os
+import sys
+import pytest
+from flask import Flask, jsonify
+
+
+# Add the src directory to sys.path
+src_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src'))
+sys.path.insert(0, src_dir)
+
+from compression import init_compression
+
+@pytest.fixture
+def client():
+    app = Flask(__name__)
+    app.config['COMPRESS_MIN_SIZE'] = 100
+    init_compression(app)
+
+    @app.route('/small')
+    def small():
+        return jsonify({'ok': True})
+
+    @app.route('/large')
+    def large():
+        return jsonify({'items': ['x' * 10] * 100})
+
+    return app.test_client()
+
+def test_large_response_is_gzipped(client):
+    response = client.get('/large', headers={'Accept-Encoding': 'gzip'})
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert 'Accept-Encoding' in response.headers['Vary']
+    data = gzip.decompress(response.data)
+    assert data.startswith(b'{')
+    assert int(response.headers['Content-Length']) == len(response.data)
+
+def test_small_response_is_not_compressed(client):
+    response = client.get('/small', headers={'Accept-Encoding': 'gzip'})
+    assert 'Content-Encoding' not in response.headers
+    assert response.get_json() == {'ok': True}
+
+@pytest.mark.parametrize("accept_encoding", [
+    None,
+    'identity',
+    'gzip;q=0',
+])
+def test_response_not_compressed_when_not_accepted(client, accept_encoding):
+    headers = {'Accept-Encoding': accept_encoding} if accept_encoding else {}
+    response = client.get('/large', headers=headers)
+    assert 'Content-Encoding' not in response.headers
+    assert len(response.get_json()['items']) == 100
@@ -0,0 +1,143 @@
+import os
+import sys
+import pytest
+from flask import json
+
+
+# Add the src directory to sys.path
+src_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src'))
+sys.path.insert(0, src_dir)
+
+from fx import FxCache, RateTable, UnknownCurrency
+
+RATES = {'base': 'USD', 'rates': {'EUR': 0.5, 'GBP': 0.25}}
+
+def write_rates(path, rates):
+    path.write_text(json.dumps(rates))
+    return str(path)
+
+@pytest.fixture
+def rates_file(app, tmp_path, monkeypatch):
+    path = tmp_path / 'rates.json'
+    monkeypatch.setitem(app.extensions, 'fx', FxCache(write_rates(path, RATES), check_interval=0))
+    return path
+
+def post_transaction(client, account_id, amount, currency, type_='deposit'):
+    response = client.post('/transactions', data=json.dumps({
+        'account_id': account_id, 'amount': amount, 'type': type_, 'currency': currency
+    }), content_type='application/json')
+    assert response.status_code == 201
+    return response.get_json()
+
+def test_convert_columns():
+    table = RateTable('USD', {'EUR': 0.5, 'GBP': 0.25}, version='v1')
+    assert table.convert([10.0, 10.0, 10.0], ['USD', 'EUR', 'GBP'], 'EUR') == [5.0, 10.0, 20.0]
+    assert table.factors({'GBP'}, 'USD') == {'GBP': 4.0}
+    with pytest.raises(UnknownCurrency):
+        table.convert([1.0], ['JPY'], 'USD')
+    assert table.convert([1.0, 1.0], ['JPY', 'EUR'], 'USD', strict=False) == [None, 2.0]
+
+def test_cache_reloads_changed_file(tmp_path):
+    path = write_rates(tmp_path / 'rates.json', RATES)
+    cache = FxCache(path, check_interval=0)
+    first = cache.current()
+    assert cache.current() is first
+
+    write_rates(tmp_path / 'rates.json', {'base': 'USD', 'rates': {'EUR': 0.8}})
+    second = cache.current()
+    assert second.version != first.version
+    assert second.rates['EUR'] == 0.8
+    # Earlier snapshots are never modified
+    assert first.rates['EUR'] == 0.5
+
+    # A broken file leaves the last good table in place
+    (tmp_path / 'rates.json').write_text('{not json')
+    assert cache.current() is second
+    assert FxCache(str(tmp_path / 'missing.json')).current() is None
+
+def test_create_transaction_currency(client):
+    assert post_transaction(client, 1, 10.0, 'EUR')['currency'] == 'EUR'
+    response = client.post('/transactions', data=json.dumps({
+        'account_id': 1, 'amount': 10.0, 'type': 'deposit', 'currency': 'euro'
+    }), content_type='application/json')
+    assert response.status_code == 400
+    # Transactions without a currency use the default one
+    response = client.post('/transactions', data=json.dumps({
+        'account_id': 2, 'amount': 10.0, 'type': 'deposit'
+    }), content_type='application/json')
+    assert response.get_json()['currency'] == 'USD'
+
+def test_create_transaction_rejects_currency_without_rate(client, rates_file):
+    response = client.post('/transactions', data=json.dumps({
+        'account_id': 1, 'amount': 10.0, 'type': 'deposit', 'currency': 'ZZZ'
+    }), content_type='application/json')
+    assert response.status_code == 400
+    assert 'ZZZ' in response.get_json()['error']
+
+def test_rows_without_a_rate_do_not_break_reports(client, rates_file):
+    post_transaction(client, 1, 100.0, 'USD')
+    post_transaction(client, 2, 10.0, 'GBP')
+    # The rate table no longer quotes a currency that rows already use
+    write_rates(rates_file, {'base': 'USD', 'rates': {'EUR': 0.5}})
+
+    response = client.get('/transactions?currency=EUR&sort=id&order=asc')
+    assert response.status_code == 200
+    assert [t['converted_amount'] for t in response.get_json()['transactions']] == [50.0, None]
+
+    response = client.get('/transactions/summary?currency=EUR')
+    assert response.status_code == 200
+    data = response.get_json()
+    assert data['unconverted'] == ['GBP']
+    assert data['totals']['deposit'] == 50.0
+
+def test_list_converts_amounts(client, rates_file):
+    post_transaction(client, 1, 100.0, 'USD')
+    post_transaction(client, 2, 100.0, 'GBP')
+
+    data = client.get('/transactions?currency=EUR&sort=id&order=asc').get_json()
+    assert data['currency'] == 'EUR'
+    assert data['fx_version']
+    assert [t['converted_amount'] for t in data['transactions']] == [50.0, 200.0]
+    assert [t['converted_balance_after'] for t in data['transactions']] == [50.0, 200.0]
+
+    # Without a currency nothing is converted
+    data = client.get('/transactions').get_json()
+    assert 'converted_amount' not in data['transactions'][0]
+
+def test_list_etag_follows_rate_version(client, rates_file):
+    post_transaction(client, 1, 100.0, 'USD')
+    etag = client.get('/transactions?currency=EUR').headers['ETag']
+    assert client.get('/transactions?currency=EUR', headers={'If-None-Match': etag}).status_code == 304
+
+    write_rates(rates_file, {'base': 'USD', 'rates': {'EUR': 0.9}})
+    response = client.get('/transactions?currency=EUR', headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert response.get_json()['transactions'][0]['converted_amount'] == 90.0
+
+@pytest.mark.parametrize("currency, expected_status", [('eur', 400), ('JPY', 400)])
+def test_invalid_target_currency(client, rates_file, currency, expected_status):
+    assert client.get(f'/transactions?currency={currency}').status_code == expected_status
+    assert client.get(f'/transactions/summary?currency={currency}').status_code == expected_status
+
+def test_conversion_without_rates(app, client, tmp_path, monkeypatch):
+    monkeypatch.setitem(app.extensions, 'fx', FxCache(str(tmp_path / 'missing.json')))
+    assert client.get('/transactions?currency=EUR').status_code == 503
+
+def test_summary(client, rates_file):
+    post_transaction(client, 1, 100.0, 'USD')
+    post_transaction(client, 1, 40.0, 'USD', type_='withdrawal')
+    post_transaction(client, 2, 10.0, 'GBP')
+    post_transaction(client, 3, 999.0, 'USD')
+
+    data = client.get('/transactions/summary?account_id=1').get_json()
+    assert data['count'] == 2
+    assert data['by_currency'] == {'USD': {'deposit': 100.0, 'withdrawal': 40.0, 'transfer': 0.0}}
+    assert 'totals' not in data
+
+    data = client.get('/transactions/summary?currency=EUR').get_json()
+    assert data['count'] == 4
+    assert data['by_currency']['GBP'] == {'deposit': 10.0, 'withdrawal': 0.0, 'transfer': 0.0}
+    assert data['currency'] == 'EUR'
+    assert data['totals'] == {'deposit': 569.5, 'withdrawal': 20.0, 'transfer': 0.0}
+    assert data['unconverted'] == []
+    assert data['net'] == 549.5
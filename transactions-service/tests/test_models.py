@@ -6,21 +6,16 @@ from sqlalchemy.exc import DataError, IntegrityError
 from datetime import datetime
 
 
-# Add the parent directory to sys.path
-sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+# Add the src directory to sys.path
+src_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src'))
+sys.path.insert(0, src_dir)
 
-from src.app import app, db
-from src.models import Transaction
+from models import db, Transaction
 
 @pytest.fixture
-def test_app():
-    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
-    app.config['TESTING'] = True
+def test_app(app):
     with app.app_context():
-        db.create_all()
         yield app
-        db.session.remove()
-        db.drop_all()
 
 def test_create_transaction(test_app):
     transaction = Transaction(
@@ -0,0 +1,92 @@
+import os
+import sys
+import threading
+import time
+from collections import Counter
+import pytest
+
+
+# Add the src directory to sys.path
+src_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src'))
+sys.path.insert(0, src_dir)
+
+from banking_common.profiling import RequestProfiler, StackSampler, collapse, format_collapsed
+
+def busy_loop(stop):
+    while not stop.is_set():
+        sum(range(1000))
+
+@pytest.fixture
+def busy_thread():
+    stop = threading.Event()
+    thread = threading.Thread(target=busy_loop, args=(stop,))
+    thread.start()
+    yield thread
+    stop.set()
+    thread.join()
+
+@pytest.fixture
+def token(app, monkeypatch):
+    monkeypatch.setitem(app.config, 'PROFILER_TOKEN', 'secret')
+    return 'secret'
+
+def test_collapse_lists_frames_from_the_root():
+    def inner():
+        return collapse(sys._getframe())
+    stack = inner()
+    assert stack.endswith('test_profiling.py:test_collapse_lists_frames_from_the_root;test_profiling.py:inner')
+
+def test_sampler_counts_stacks(busy_thread):
+    sampler = StackSampler(interval=0.001)
+    counts = sampler.run_for(0.1)
+    assert any(stack.endswith('test_profiling.py:busy_loop') for stack in counts)
+    lines = format_collapsed(counts).splitlines()
+    assert all(line.rsplit(' ', 1)[1].isdigit() for line in lines)
+
+def test_profile_endpoint_requires_token(client, monkeypatch, app):
+    # Without a configured token the endpoint doesn't exist
+    assert client.get('/admin/profile?seconds=0.1').status_code == 404
+    monkeypatch.setitem(app.config, 'PROFILER_TOKEN', 'secret')
+    response = client.get('/admin/profile?seconds=0.1', headers={'Authorization': 'Bearer wrong'})
+    assert response.status_code == 401
+
+def test_profile_endpoint_returns_collapsed_stacks(client, token, busy_thread):
+    response = client.get('/admin/profile?seconds=0.2&interval=0.002', headers={'Authorization': f'Bearer {token}'})
+    assert response.status_code == 200
+    assert response.mimetype == 'text/plain'
+    assert int(response.headers['X-Profile-Samples']) > 0
+    assert 'test_profiling.py:busy_loop ' in response.get_data(as_text=True)
+
+@pytest.mark.parametrize("query", ['seconds=0', 'seconds=3600', 'seconds=1&interval=0'])
+def test_profile_endpoint_rejects_invalid_parameters(client, token, query):
+    response = client.get(f'/admin/profile?{query}', headers={'Authorization': f'Bearer {token}'})
+    assert response.status_code == 400
+
+def test_one_profile_at_a_time(app, client, token):
+    with app.extensions['profiler_lock']:
+        response = client.get('/admin/profile?seconds=0.1', headers={'Authorization': f'Bearer {token}'})
+    assert response.status_code == 409
+
+def test_request_profiler_samples_only_picked_requests():
+    profiler = RequestProfiler(sample_rate=1.0, interval=0.001)
+    stop = threading.Event()
+
+    def handle_request():
+        profiler.start_request()
+        busy_loop(stop)
+        profiler.end_request()
+
+    thread = threading.Thread(target=handle_request)
+    thread.start()
+    time.sleep(0.1)
+    stop.set()
+    thread.join()
+
+    counts, samples = profiler.snapshot(reset=True)
+    assert samples > 0
+    assert all(stack.endswith('busy_loop') or 'handle_request' in stack for stack in counts)
+    assert profiler.profiled_requests == 1
+    assert profiler.snapshot() == (Counter(), 0)
+
+    profiler.sample_rate = 0.0
+    assert profiler.start_request() is False
@@ -0,0 +1,136 @@
+import os
+import sys
+import time
+import pytest
+
+
+# Add the src directory to sys.path
+src_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src'))
+sys.path.insert(0, src_dir)
+
+from app import create_app
+from config import get_config
+from banking_common.ratelimit import MemoryStore, SQLiteStore, queue_time
+
+@pytest.fixture
+def app():
+    app = create_app('testing')
+    app.config['RATE_LIMIT_ENABLED'] = True
+    app.config['RATE_LIMIT_CLIENT'] = (1, 3)
+    app.config['RATE_LIMIT_ACCOUNT'] = (1, 2)
+    return app
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+@pytest.mark.parametrize("store_factory", [
+    lambda tmp_path: MemoryStore(),
+    lambda tmp_path: SQLiteStore(str(tmp_path / 'buckets.db')),
+])
+def test_token_bucket_refills(tmp_path, store_factory):
+    store = store_factory(tmp_path)
+
+    assert store.consume('key', rate=1, burst=2, now=100) == (True, 0.0)
+    assert store.consume('key', rate=1, burst=2, now=100) == (True, 0.0)
+    allowed, retry_after = store.consume('key', rate=1, burst=2, now=100)
+    assert not allowed
+    assert retry_after == pytest.approx(1.0)
+
+    # One second later one token is back
+    assert store.consume('key', rate=1, burst=2, now=101)[0]
+    # Other keys have their own bucket
+    assert store.consume('other', rate=1, burst=2, now=100)[0]
+
+@pytest.mark.parametrize("header, expected", [
+    ('t=1700000000.5', 1.5),
+    ('t=1700000000500', 1.5),
+    ('t=1700000000500000', 1.5),
+    ('1700000001', 1.0),
+    ('garbage', None),
+    (None, None),
+])
+def test_queue_time(header, expected):
+    result = queue_time(header, now=1700000002.0)
+    if expected is None:
+        assert result is None
+    else:
+        assert result == pytest.approx(expected)
+
+def from_address(address):
+    return {'environ_base': {'REMOTE_ADDR': address}}
+
+@pytest.mark.parametrize("store_factory", [
+    lambda tmp_path: MemoryStore(),
+    lambda tmp_path: SQLiteStore(str(tmp_path / 'buckets.db')),
+])
+def test_idle_buckets_are_pruned(tmp_path, store_factory):
+    store = store_factory(tmp_path)
+    store.consume('idle', rate=1, burst=2, now=100)
+    store.consume('busy', rate=1, burst=2, now=105)
+
+    assert store.prune(max_idle=4, now=106) == 1
+    assert len(store) == 1
+    assert store.consume('busy', rate=1, burst=2, now=106)[0]
+
+def test_client_is_limited(client):
+    for _ in range(3):
+        assert client.get('/maintenance/jobs', **from_address('10.0.0.1')).status_code == 200
+    # Exempt paths never consume tokens
+    assert client.get('/health', **from_address('10.0.0.1')).status_code == 200
+
+    response = client.get('/maintenance/jobs', **from_address('10.0.0.1'))
+    assert response.status_code == 429
+    assert int(response.headers['Retry-After']) >= 1
+
+    # Another client is unaffected
+    response = client.get('/maintenance/jobs', **from_address('10.0.0.2'))
+    assert response.status_code == 200
+
+def test_client_cannot_pick_its_own_bucket(app, client):
+    statuses = [
+        client.get('/maintenance/jobs', headers={'X-Client-Id': str(i)}, **from_address('10.0.0.1')).status_code
+        for i in range(4)
+    ]
+    assert statuses == [200, 200, 200, 429]
+    assert len(app.extensions['rate_limiter']) == 1
+
+def test_trusted_proxy_names_the_client(monkeypatch):
+    monkeypatch.setattr(get_config('testing'), 'RATE_LIMIT_TRUSTED_PROXIES', 1)
+    app = create_app('testing')
+    app.config.update(RATE_LIMIT_ENABLED=True, RATE_LIMIT_CLIENT=(1, 1))
+    client = app.test_client()
+    proxy = from_address('10.0.0.9')
+    assert client.get('/maintenance/jobs', headers={'X-Forwarded-For': '1.1.1.1'}, **proxy).status_code == 200
+    assert client.get('/maintenance/jobs', headers={'X-Forwarded-For': '1.1.1.1'}, **proxy).status_code == 429
+    assert client.get('/maintenance/jobs', headers={'X-Forwarded-For': '2.2.2.2'}, **proxy).status_code == 200
+
+def test_prune_job_is_scheduled(client):
+    names = [job['name'] for job in client.get('/maintenance/jobs').get_json()['jobs']]
+    assert 'rate_limit_prune' in names
+
+def test_account_is_limited_across_clients(client):
+    statuses = [
+        client.get('/transactions/search?q=rent&account_id=7', **from_address(address)).status_code
+        for address in ('10.0.0.1', '10.0.0.2', '10.0.0.3')
+    ]
+    assert statuses[-1] == 429
+    assert 'account' in client.get(
+        '/transactions/search?q=rent&account_id=7', **from_address('10.0.0.4')
+    ).get_json()['error']
+
+def test_request_queued_too_long_is_shed(app, client):
+    app.config['LOAD_SHED_MAX_QUEUE_TIME'] = 0.5
+    response = client.get('/maintenance/jobs', headers={'X-Request-Start': f't={time.time() - 2}'})
+    assert response.status_code == 503
+    assert 'Retry-After' in response.headers
+    assert app.extensions['load_shedder'].shed == 1
+
+def test_requests_over_in_flight_limit_are_shed(app, client):
+    app.extensions['load_shedder'].in_flight = app.config['LOAD_SHED_MAX_IN_FLIGHT']
+    response = client.get('/maintenance/jobs')
+    assert response.status_code == 503
+
+def test_in_flight_is_released(app, client):
+    client.get('/maintenance/jobs')
+    assert app.extensions['load_shedder'].in_flight == 0
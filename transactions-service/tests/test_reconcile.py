@@ -0,0 +1,79 @@
+import os
+import sys
+import sqlite3
+import pytest
+
+
+# Add the src directory to sys.path
+src_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src'))
+sys.path.insert(0, src_dir)
+
+from reconcile import reconcile, rebuild_balances
+
+@pytest.fixture
+def databases(tmp_path):
+    accounts_db = str(tmp_path / 'accounts.db')
+    transactions_db = str(tmp_path / 'transactions.db')
+
+    connection = sqlite3.connect(accounts_db)
+    connection.execute('CREATE TABLE account (id INTEGER PRIMARY KEY, user_id INTEGER NOT NULL, balance FLOAT)')
+    connection.executemany('INSERT INTO account (id, user_id, balance) VALUES (?, ?, ?)', [
+        (1, 1, 150.0),   # matches its ledger
+        (2, 2, 999.0),   # balance drifted from the ledger
+        (3, 3, 40.0),    # no transactions
+        (4, 4, 80.0),    # ledger has a gap
+        (5, 5, 120.0),   # one wrong row, later rows are right again
+    ])
+    connection.commit()
+    connection.close()
+
+    connection = sqlite3.connect(transactions_db)
+    connection.execute(
+        'CREATE TABLE transactions (id INTEGER PRIMARY KEY, account_id INTEGER NOT NULL, amount FLOAT NOT NULL, '
+        'type VARCHAR(10) NOT NULL, description VARCHAR(200), balance_after FLOAT NOT NULL, timestamp DATETIME)'
+    )
+    connection.executemany('INSERT INTO transactions (account_id, amount, type, balance_after) VALUES (?, ?, ?, ?)', [
+        (1, 100.0, 'deposit', 100.0),
+        (2, 200.0, 'deposit', 200.0),
+        (1, 70.0, 'deposit', 170.0),
+        (1, 20.0, 'withdrawal', 150.0),
+        (2, 50.0, 'transfer', 150.0),
+        (4, 100.0, 'deposit', 100.0),
+        (4, 10.0, 'withdrawal', 80.0),
+        (9, 10.0, 'deposit', 10.0),      # account 9 does not exist
+        (5, 100.0, 'deposit', 100.0),
+        (5, 10.0, 'deposit', 999.0),
+        (5, 10.0, 'deposit', 120.0),
+    ])
+    connection.commit()
+    connection.close()
+    return accounts_db, transactions_db
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_reconcile_reports_mismatches(databases, workers):
+    report = reconcile(*databases, workers=workers)
+
+    assert report['accounts_checked'] == 5
+    found = sorted((m['account_id'], m['kind']) for m in report['mismatches'])
+    assert found == [
+        (2, 'balance_mismatch'),
+        (4, 'balance_mismatch'),
+        (4, 'ledger_drift'),
+        (5, 'ledger_drift'),
+        (9, 'missing_account'),
+    ]
+    drifts = {m['account_id']: m for m in report['mismatches'] if m['kind'] == 'ledger_drift'}
+    assert (drifts[4]['transaction_id'], drifts[4]['actual'], drifts[4]['expected']) == (7, 80.0, 90.0)
+    assert (drifts[5]['transaction_id'], drifts[5]['actual'], drifts[5]['expected']) == (10, 999.0, 110.0)
+
+def test_rebuild_balances(databases):
+    accounts_db, transactions_db = databases
+    report = reconcile(accounts_db, transactions_db, workers=1)
+
+    assert rebuild_balances(accounts_db, report['mismatches']) == 2
+
+    report = reconcile(accounts_db, transactions_db, workers=1)
+    assert [m['kind'] for m in report['mismatches'] if m['kind'] == 'balance_mismatch'] == []
+    connection = sqlite3.connect(accounts_db)
+    assert connection.execute('SELECT balance FROM account WHERE id = 2').fetchone()[0] == 150.0
+    connection.close()
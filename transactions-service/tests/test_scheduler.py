@@ -0,0 +1,86 @@
+import os
+import sys
+import pytest
+
+
+# Add the src directory to sys.path
+src_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src'))
+sys.path.insert(0, src_dir)
+
+from banking_common.scheduler import Scheduler
+
+@pytest.fixture
+def scheduler():
+    scheduler = Scheduler()
+    yield scheduler
+    scheduler.shutdown()
+
+def test_run_pending_runs_due_jobs(scheduler):
+    calls = []
+    scheduler.add_job('due', lambda: calls.append('due'), interval=60, run_immediately=True)
+    scheduler.add_job('later', lambda: calls.append('later'), interval=60)
+
+    ran = scheduler.run_pending()
+
+    assert ran == ['due']
+    assert calls == ['due']
+
+def test_job_is_rescheduled_with_jitter(scheduler):
+    job = scheduler.add_job('job', lambda: None, interval=10, jitter=5)
+    now = job.next_run
+
+    scheduler.run_pending(now=now)
+
+    assert now + 10 <= job.next_run <= now + 15
+
+def test_duplicate_job_name_rejected(scheduler):
+    scheduler.add_job('job', lambda: None, interval=10)
+    with pytest.raises(ValueError):
+        scheduler.add_job('job', lambda: None, interval=10)
+
+def test_failed_job_is_recorded_in_metrics(scheduler):
+    def fail():
+        raise RuntimeError('boom')
+
+    scheduler.add_job('fail', fail, interval=60, run_immediately=True)
+    scheduler.run_pending()
+
+    metrics = scheduler.metrics()[0]
+    assert metrics['runs'] == 1
+    assert metrics['failures'] == 1
+    assert metrics['last_error'] == 'boom'
+    assert metrics['last_duration'] is not None
+    assert metrics['running'] is False
+
+def test_running_job_is_skipped(scheduler):
+    job = scheduler.add_job('job', lambda: None, interval=60)
+    job.running = True
+
+    assert scheduler.run_job('job') is False
+    assert job.skipped == 1
+    assert job.runs == 0
+
+def test_maintenance_jobs_endpoint():
+    from app import app
+
+    client = app.test_client()
+    response = client.get('/maintenance/jobs')
+    assert response.status_code == 200
+    names = [job['name'] for job in response.get_json()['jobs']]
+    assert 'analyze' in names
+    assert 'vacuum' in names
+
+def test_create_app_starts_the_scheduler(monkeypatch):
+    import config
+    from app import create_app
+
+    # Any WSGI server gets running jobs, not only `python app.py`
+    monkeypatch.setattr(config.TestingConfig, 'SCHEDULER_ENABLED', True)
+    scheduler = create_app('testing').extensions['scheduler']
+    try:
+        assert scheduler._thread is not None
+    finally:
+        scheduler.shutdown()
+
+    monkeypatch.setattr(config.TestingConfig, 'SCHEDULER_ENABLED', False)
+    assert create_app('testing').extensions['scheduler']._thread is None
@@ -0,0 +1,80 @@
+import os
+import sys
+import pytest
+from flask import json
+
+
+# Add the src directory to sys.path
+src_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src'))
+sys.path.insert(0, src_dir)
+
+from search import build_match_query
+
+def create_transaction(client, account_id, description, amount=10.00):
+    response = client.post(
+        '/transactions',
+        data=json.dumps({
+            'account_id': account_id,
+            'amount': amount,
+            'type': 'withdrawal',
+            'description': description,
+            'balance_after': 100.00
+        }),
+        content_type='application/json'
+    )
+    assert response.status_code == 201
+    return response.get_json()
+
+@pytest.mark.parametrize("q, expected", [
+    ('rent', '"rent"*'),
+    ('March rent', '"March" "rent"*'),
+    ('rent" OR *', '"rent" "OR"*'),
+    ('  ', None),
+    ('', None),
+])
+def test_build_match_query(q, expected):
+    assert build_match_query(q) == expected
+
+def test_search_matches_prefix(client):
+    create_transaction(client, 1, 'Rent payment March')
+    create_transaction(client, 1, 'Groceries')
+    create_transaction(client, 1, 'Rental car deposit')
+
+    response = client.get('/transactions/search?q=ren&account_id=1')
+    assert response.status_code == 200
+    data = response.get_json()
+    assert data['total'] == 2
+    descriptions = {t['description'] for t in data['transactions']}
+    assert descriptions == {'Rent payment March', 'Rental car deposit'}
+
+def test_search_is_scoped_to_account(client):
+    create_transaction(client, 1, 'Rent payment')
+    create_transaction(client, 2, 'Rent payment')
+
+    response = client.get('/transactions/search?q=rent&account_id=2')
+    data = response.get_json()
+    assert data['total'] == 1
+    assert data['transactions'][0]['account_id'] == 2
+
+def test_search_ranks_and_paginates(client):
+    create_transaction(client, 1, 'Office supplies')
+    create_transaction(client, 1, 'Rent rent rent')
+    create_transaction(client, 1, 'Rent payment for the flat downtown')
+
+    response = client.get('/transactions/search?q=rent&account_id=1&page=1&per_page=1')
+    data = response.get_json()
+    assert data['total'] == 2
+    assert data['pagination']['pages'] == 2
+    assert len(data['transactions']) == 1
+    assert data['transactions'][0]['description'] == 'Rent rent rent'
+
+@pytest.mark.parametrize("query_string", [
+    'account_id=1',
+    'q=rent',
+    'q=rent&account_id=1&per_page=0',
+    'q=rent&account_id=1&page=0',
+])
+def test_search_invalid_parameters(client, query_string):
+    response = client.get(f'/transactions/search?{query_string}')
+    assert response.status_code == 400
+    assert 'error' in response.get_json()
@@ -0,0 +1,151 @@
+import os
+import sys
+import sqlite3
+import pytest
+from flask import json
+
+
+# Add the src directory to sys.path
+src_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src'))
+sys.path.insert(0, src_dir)
+
+import config
+from app import create_app
+from models import Transaction, db
+from banking_common.scheduler import analyze
+
+SERVICE_HEADERS = {'Authorization': f'Bearer {config.TestingConfig.SERVICE_TOKEN}'}
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    uris = [f'sqlite:///{tmp_path / f"shard{i}.db"}' for i in range(3)]
+    monkeypatch.setattr(config.TestingConfig, 'SHARD_URIS', uris)
+    return create_app('testing')
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+def create_transaction(client, account_id, amount, type_='deposit', description='Test'):
+    response = client.post(
+        '/transactions',
+        data=json.dumps({
+            'account_id': account_id,
+            'amount': amount,
+            'type': type_,
+            'description': description,
+            'balance_after': 500.00
+        }),
+        content_type='application/json'
+    )
+    assert response.status_code == 201
+    return response.get_json()
+
+def test_rows_are_routed_by_account(app, client):
+    router = app.extensions['shard_router']
+    for account_id in range(1, 7):
+        create_transaction(client, account_id, 10.0)
+
+    with app.app_context():
+        for shard in range(len(router)):
+            account_ids = [t.account_id for t in router.session(shard).query(Transaction)]
+            assert len(account_ids) == 2
+            assert all(router.shard_for(a) == shard for a in account_ids)
+
+def test_ids_route_back_to_their_shard(app, client):
+    router = app.extensions['shard_router']
+    created = [create_transaction(client, account_id, 10.0) for account_id in (1, 2, 3, 1, 1)]
+
+    ids = [t['id'] for t in created]
+    assert len(set(ids)) == len(ids)
+    for transaction in created:
+        assert router.shard_for(transaction['id']) == router.shard_for(transaction['account_id'])
+        response = client.get(f'/transactions/{transaction["id"]}')
+        assert response.status_code == 200
+        assert response.get_json()['account_id'] == transaction['account_id']
+
+def test_archived_ids_are_not_reused(app, client):
+    first = [create_transaction(client, 2, 10.0)['id'] for _ in range(2)]
+    response = client.post('/transactions/archive', data=json.dumps({'account_id': 2, 'account_status': 'closing'}),
+                           content_type='application/json', headers=SERVICE_HEADERS)
+    assert response.get_json()['archived'] == 2
+
+    new_id = create_transaction(client, 2, 10.0)['id']
+    assert new_id > max(first)
+    assert app.extensions['shard_router'].shard_for(new_id) == app.extensions['shard_router'].shard_for(2)
+    response = client.post('/transactions/archive', data=json.dumps({'account_id': 2, 'account_status': 'closing'}),
+                           content_type='application/json', headers=SERVICE_HEADERS)
+    assert response.status_code == 200
+    assert response.get_json()['archived'] == 1
+
+def test_list_fans_out_and_merges(client):
+    for account_id, amount in [(1, 30.0), (2, 10.0), (3, 50.0), (1, 20.0), (2, 40.0)]:
+        create_transaction(client, account_id, amount)
+
+    response = client.get('/transactions?sort=amount&order=desc')
+    data = response.get_json()
+    assert data['total'] == 5
+    assert [t['amount'] for t in data['transactions']] == [50.0, 40.0, 30.0, 20.0, 10.0]
+
+    response = client.get('/transactions?sort=amount&order=asc&page=2&per_page=2')
+    data = response.get_json()
+    assert [t['amount'] for t in data['transactions']] == [30.0, 40.0]
+    assert data['pagination']['pages'] == 3
+
+    etag = response.headers['ETag']
+    response = client.get('/transactions?sort=amount&order=asc&page=2&per_page=2', headers={'If-None-Match': etag})
+    assert response.status_code == 304
+
+@pytest.mark.parametrize("page, per_page, expected_page, expected_per_page", [
+    (0, 5, 1, 5),
+    (1, 0, 1, 20),
+    (1, -1, 1, 20),
+])
+def test_list_clamps_pagination_like_unsharded(client, page, per_page, expected_page, expected_per_page):
+    for account_id in (1, 2, 3):
+        create_transaction(client, account_id, 10.0)
+
+    response = client.get(f'/transactions?page={page}&per_page={per_page}')
+    assert response.status_code == 200
+    data = response.get_json()
+    assert data['pagination']['page'] == expected_page
+    assert data['pagination']['per_page'] == expected_per_page
+    assert data['pagination']['pages'] == 1
+    assert len(data['transactions']) == min(3, expected_per_page)
+
+@pytest.mark.parametrize("order", ['asc', 'desc'])
+def test_list_merges_null_sort_values(client, order):
+    for account_id, description in ((1, 'Rent'), (2, None), (3, 'Coffee'), (4, None)):
+        create_transaction(client, account_id, 10.0, description=description)
+
+    response = client.get(f'/transactions?sort=description&order={order}')
+    assert response.status_code == 200
+    descriptions = [t['description'] for t in response.get_json()['transactions']]
+    expected = [None, None, 'Coffee', 'Rent']
+    assert descriptions == (expected if order == 'asc' else expected[::-1])
+
+def test_list_for_one_account_reads_one_shard(client):
+    for account_id in (1, 2, 1, 4):
+        create_transaction(client, account_id, 10.0)
+
+    data = client.get('/transactions?account_id=1').get_json()
+    assert data['total'] == 2
+    assert all(t['account_id'] == 1 for t in data['transactions'])
+
+def test_search_is_routed_to_the_account_shard(client):
+    create_transaction(client, 2, 10.0, description='Rent payment')
+    create_transaction(client, 3, 10.0, description='Rent payment')
+
+    data = client.get('/transactions/search?q=rent&account_id=2').get_json()
+    assert data['total'] == 1
+    assert data['transactions'][0]['account_id'] == 2
+
+def test_analyze_runs_on_every_shard(app, client, tmp_path):
+    for account_id in (1, 2, 3):
+        create_transaction(client, account_id, 10.0)
+
+    analyze(app, db)
+    for i in range(3):
+        with sqlite3.connect(tmp_path / f'shard{i}.db') as connection:
+            tables = {row[0] for row in connection.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        assert 'sqlite_stat1' in tables
@@ -0,0 +1,120 @@
+import os
+import sys
+import json
+import pytest
+
+
+# Add the src directory to sys.path
+src_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src'))
+sys.path.insert(0, src_dir)
+
+import config
+from app import create_app
+from banking_common.tracing import OTLPExporter, Span, Tracer, inject_headers, parse_traceparent
+
+TRACE_ID = '4bf92f3577b34da6a3ce929d0e0e4736'
+PARENT_ID = '00f067aa0ba902b7'
+
+@pytest.mark.parametrize("header, expected", [
+    (f'00-{TRACE_ID}-{PARENT_ID}-01', (TRACE_ID, PARENT_ID, True)),
+    (f'00-{TRACE_ID}-{PARENT_ID}-00', (TRACE_ID, PARENT_ID, False)),
+    (f'00-{TRACE_ID.upper()}-{PARENT_ID}-01', (TRACE_ID, PARENT_ID, True)),
+    (f'00-{"0" * 32}-{PARENT_ID}-01', None),
+    (f'ff-{TRACE_ID}-{PARENT_ID}-01', None),
+    ('garbage', None),
+    (None, None),
+])
+def test_parse_traceparent(header, expected):
+    assert parse_traceparent(header) == expected
+
+class ListExporter:
+    def __init__(self):
+        self.spans = []
+
+    def submit(self, span):
+        self.spans.append(span)
+
+@pytest.mark.parametrize("sample_rate, expected", [(0.0, None), (1.0, 'span')])
+def test_sampling_without_parent(sample_rate, expected):
+    tracer = Tracer(ListExporter(), sample_rate=sample_rate)
+    span = tracer.start_server_span('GET /', traceparent=None)
+    assert (span is not None) == (expected is not None)
+    tracer.end_span(span)
+
+def test_parent_sampling_decision_is_followed():
+    tracer = Tracer(ListExporter(), sample_rate=0.0)
+    span = tracer.start_server_span('GET /', traceparent=f'00-{TRACE_ID}-{PARENT_ID}-01')
+    assert span.trace_id == TRACE_ID
+    assert span.parent_id == PARENT_ID
+
+    child = tracer.start_span('work')
+    assert child.parent_id == span.span_id
+    assert inject_headers()['traceparent'] == f'00-{TRACE_ID}-{child.span_id}-01'
+    tracer.end_span(child)
+    tracer.end_span(span)
+    assert inject_headers() == {}
+
+    assert tracer.start_server_span('GET /', traceparent=f'00-{TRACE_ID}-{PARENT_ID}-00') is None
+
+def test_otlp_encoding():
+    exporter = OTLPExporter.__new__(OTLPExporter)
+    exporter.service_name = 'transactions-service'
+    span = Span(None, 'GET /transactions', TRACE_ID, PARENT_ID, kind='server', attributes={'http.status_code': 200})
+    span.end_ns = span.start_ns + 1000
+
+    encoded = exporter._encode([span])
+    resource_spans = encoded['resourceSpans'][0]
+    assert resource_spans['resource']['attributes'][0]['value']['stringValue'] == 'transactions-service'
+    encoded_span = resource_spans['scopeSpans'][0]['spans'][0]
+    assert encoded_span['traceId'] == TRACE_ID
+    assert encoded_span['parentSpanId'] == PARENT_ID
+    assert encoded_span['kind'] == 2
+
+def test_request_and_sql_spans_are_exported(tmp_path, monkeypatch):
+    trace_file = tmp_path / 'traces.jsonl'
+    monkeypatch.setattr(config.TestingConfig, 'TRACING_EXPORTER', 'file')
+    monkeypatch.setattr(config.TestingConfig, 'TRACING_FILE', str(trace_file))
+    monkeypatch.setattr(config.TestingConfig, 'TRACING_SAMPLE_RATE', 0.0)
+    app = create_app('testing')
+    client = app.test_client()
+
+    # Unsampled requests produce nothing
+    client.get('/transactions')
+
+    response = client.get('/transactions', headers={'traceparent': f'00-{TRACE_ID}-{PARENT_ID}-01'})
+    assert response.status_code == 200
+    assert response.headers['traceparent'].startswith(f'00-{TRACE_ID}-')
+
+    app.extensions['tracer'].exporter.flush()
+    spans = [json.loads(line) for line in trace_file.read_text().splitlines()]
+    assert all(span['trace_id'] == TRACE_ID for span in spans)
+
+    server = next(span for span in spans if span['kind'] == 'server')
+    assert server['name'] == 'GET /transactions'
+    assert server['parent_id'] == PARENT_ID
+    assert server['attributes']['http.status_code'] == 200
+    assert server['service'] == 'transactions-service'
+
+    queries = [span for span in spans if span['name'] == 'db.query']
+    assert queries
+    assert all(span['parent_id'] == server['span_id'] for span in queries)
+    assert any('FROM transactions' in span['attributes']['db.statement'] for span in queries)
+
+def test_fan_out_queries_are_traced(tmp_path, monkeypatch):
+    trace_file = tmp_path / 'traces.jsonl'
+    monkeypatch.setattr(config.TestingConfig, 'TRACING_EXPORTER', 'file')
+    monkeypatch.setattr(config.TestingConfig, 'TRACING_FILE', str(trace_file))
+    monkeypatch.setattr(config.TestingConfig, 'SHARD_URIS', [f'sqlite:///{tmp_path / f"shard{i}.db"}' for i in range(2)])
+    app = create_app('testing')
+    client = app.test_client()
+
+    response = client.get('/transactions', headers={'traceparent': f'00-{TRACE_ID}-{PARENT_ID}-01'})
+    assert response.status_code == 200
+
+    app.extensions['tracer'].exporter.flush()
+    spans = [json.loads(line) for line in trace_file.read_text().splitlines()]
+    server = next(span for span in spans if span['kind'] == 'server')
+    queries = [span for span in spans if span['name'] == 'db.query']
+    # Aggregates and rows, once on each shard
+    assert len(queries) >= 4
+    assert all(span['parent_id'] == server['span_id'] for span in queries)
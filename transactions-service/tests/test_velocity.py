@@ -0,0 +1,170 @@
+import os
+import sys
+import pytest
+from datetime import datetime, timedelta
+from flask import json
+from sqlalchemy import event
+
+
+# Add the src directory to sys.path
+src_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src'))
+sys.path.insert(0, src_dir)
+
+import config
+from app import create_app
+from models import db, Transaction
+from fx import RateTable
+from velocity import SlidingWindow, VelocityTracker
+
+RATES = RateTable('USD', {'EUR': 0.92, 'JPY': 149.5}, 'test')
+
+def test_window_evicts_expired_buckets():
+    window = SlidingWindow(buckets=4, width=10)
+    window.add(5.0, now=0)
+    window.add(7.0, now=15)
+    assert (window.count, window.total) == (2, 12.0)
+
+    # The first bucket falls out of the 40 second window
+    window.advance(now=42)
+    assert (window.count, window.total) == (1, 7.0)
+
+    # Everything has expired after a full idle window
+    window.advance(now=100)
+    assert (window.count, window.total) == (0, 0.0)
+
+def test_tracker_limits_count():
+    tracker = VelocityTracker(window=60, buckets=6, max_count=2)
+    assert tracker.try_record(1, 10.0, now=0) is None
+    assert tracker.try_record(1, 10.0, now=1) is None
+    assert tracker.try_record(1, 10.0, now=2) is not None
+    # Other accounts have their own window
+    assert tracker.try_record(2, 10.0, now=2) is None
+    # Once the first debits leave the window there is room again
+    assert tracker.try_record(1, 10.0, now=61) is None
+    assert tracker.rejected_count == 1
+
+def test_tracker_limits_amount():
+    tracker = VelocityTracker(window=60, buckets=6, max_amount=100.0)
+    assert tracker.try_record(1, 60.0, now=0) is None
+    assert 'exceed' in tracker.try_record(1, 50.0, now=1)
+    assert tracker.try_record(1, 40.0, now=1) is None
+    assert tracker.rejected_amount == 1
+
+def test_undo_releases_capacity():
+    tracker = VelocityTracker(window=60, buckets=6, max_count=1)
+    assert tracker.try_record(1, 10.0, now=0) is None
+    tracker.undo(1, 10.0, now=0)
+    assert tracker.try_record(1, 10.0, now=1) is None
+
+def test_normalize_converts_into_the_limit_currency():
+    tracker = VelocityTracker(max_amount=1000.0, currency='USD')
+    assert tracker.normalize(149500.0, 'JPY', RATES) == pytest.approx(1000.0)
+    assert tracker.normalize(92.0, 'EUR', RATES) == pytest.approx(100.0)
+    assert tracker.normalize(50.0, 'USD', RATES) == 50.0
+    # Without a rate for either side amounts count as they are
+    assert tracker.normalize(50.0, 'CHF', RATES) == 50.0
+    assert tracker.normalize(50.0, 'JPY', None) == 50.0
+    assert VelocityTracker(currency='GBP').normalize(50.0, 'JPY', RATES) == 50.0
+
+def test_prune_drops_idle_accounts():
+    tracker = VelocityTracker(window=60, buckets=6, max_count=5)
+    tracker.try_record(1, 10.0, now=0)
+    tracker.try_record(2, 10.0, now=50)
+    assert tracker.prune(now=70) == 1
+    assert tracker.metrics()['accounts_tracked'] == 1
+
+@pytest.fixture
+def app(monkeypatch):
+    monkeypatch.setattr(config.TestingConfig, 'VELOCITY_MAX_COUNT', 2)
+    monkeypatch.setattr(config.TestingConfig, 'VELOCITY_MAX_AMOUNT', 1000.0)
+    app = create_app('testing')
+    yield app
+    with app.app_context():
+        db.session.remove()
+        db.drop_all()
+
+def post_transaction(client, type_, amount, account_id=1, currency='USD'):
+    return client.post(
+        '/transactions',
+        data=json.dumps({
+            'account_id': account_id,
+            'amount': amount,
+            'type': type_,
+            'balance_after': 500.00,
+            'currency': currency
+        }),
+        content_type='application/json'
+    )
+
+def test_create_transaction_enforces_velocity(app):
+    client = app.test_client()
+    assert post_transaction(client, 'withdrawal', 10.0).status_code == 201
+    assert post_transaction(client, 'transfer', 10.0).status_code == 201
+
+    response = post_transaction(client, 'withdrawal', 10.0)
+    assert response.status_code == 429
+    assert 'velocity' in response.get_json()['error'].lower()
+
+    # Deposits are not limited
+    assert post_transaction(client, 'deposit', 10.0).status_code == 201
+
+    metrics = client.get('/maintenance/velocity').get_json()
+    assert metrics['rejected_count'] == 1
+    assert metrics['accepted'] == 2
+
+def test_amount_limit_applies_in_the_limit_currency(app):
+    client = app.test_client()
+    # 149500 JPY is 1000 USD, the whole allowance
+    assert post_transaction(client, 'withdrawal', 149500.0, currency='JPY').status_code == 201
+    response = post_transaction(client, 'withdrawal', 1495.0, currency='JPY')
+    assert response.status_code == 429
+    assert '1000.0 USD' in response.get_json()['error']
+
+    # 1000 EUR is more than 1000 USD even though the number is the same
+    assert post_transaction(client, 'withdrawal', 1000.0, account_id=2, currency='EUR').status_code == 429
+    assert post_transaction(client, 'withdrawal', 900.0, account_id=2, currency='EUR').status_code == 201
+
+def test_rebuild_converts_into_the_limit_currency(app):
+    with app.app_context():
+        db.session.add(Transaction(account_id=1, amount=92000.0, type='withdrawal', balance_after=0, currency='JPY',
+                                   timestamp=datetime.utcnow() - timedelta(minutes=5)))
+        db.session.commit()
+
+        tracker = VelocityTracker(max_amount=1000.0)
+        assert tracker.rebuild(db.session, rates=RATES) == 1
+    # 92000 JPY is about 615 USD
+    assert tracker.try_record(1, 380.0) is None
+    assert tracker.try_record(1, 10.0) is not None
+
+def test_rebuild_from_recent_history(app):
+    with app.app_context():
+        db.session.add_all([
+            Transaction(account_id=1, amount=400.0, type='withdrawal', balance_after=0,
+                        timestamp=datetime.utcnow() - timedelta(minutes=5)),
+            Transaction(account_id=1, amount=400.0, type='withdrawal', balance_after=0,
+                        timestamp=datetime.utcnow() - timedelta(hours=2)),
+            Transaction(account_id=1, amount=400.0, type='deposit', balance_after=0),
+        ])
+        db.session.commit()
+
+        tracker = VelocityTracker(max_amount=1000.0)
+        assert tracker.rebuild(db.session) == 1
+    assert tracker.try_record(1, 500.0) is None
+    assert tracker.try_record(1, 200.0) is not None
+
+def test_rebuild_reads_only_the_window_through_an_index(app):
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if 'FROM transactions' in statement:
+            statements.append((statement, parameters))
+
+    with app.app_context():
+        event.listen(db.engine, 'before_cursor_execute', capture)
+        try:
+            VelocityTracker().rebuild(db.session)
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', capture)
+        statement, parameters = statements[0]
+        plan = db.session.connection().exec_driver_sql(f'EXPLAIN QUERY PLAN {statement}', parameters).all()
+    assert any('ix_transactions_type_timestamp' in row[-1] for row in plan)
@@ -0,0 +1,72 @@
+import os
+import sys
+import pytest
+from flask import json
+
+
+# Add the src directory to sys.path
+src_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src'))
+sys.path.insert(0, src_dir)
+
+msgpack = pytest.importorskip('msgpack')
+
+def create_transactions(client):
+    for account_id, amount in [(1, 100.00), (1, 50.00), (2, 75.00)]:
+        response = client.post(
+            '/transactions',
+            data=json.dumps({
+                'account_id': account_id,
+                'amount': amount,
+                'type': 'deposit',
+                'description': 'Test deposit',
+                'balance_after': 500.00
+            }),
+            content_type='application/json'
+        )
+        assert response.status_code == 201
+
+def test_list_transactions_as_msgpack(client):
+    create_transactions(client)
+
+    response = client.get('/transactions?sort=amount&order=asc', headers={'Accept': 'application/msgpack'})
+    assert response.status_code == 200
+    assert response.mimetype == 'application/msgpack'
+    assert 'Accept' in response.headers['Vary']
+
+    data = msgpack.unpackb(response.data)
+    assert data['total'] == 3
+    table = data['transactions']
+    assert table['columns'] == ['id', 'account_id', 'amount', 'type', 'description', 'balance_after', 'timestamp', 'currency']
+    amounts = [row[table['columns'].index('amount')] for row in table['rows']]
+    assert amounts == [50.0, 75.0, 100.0]
+
+@pytest.mark.parametrize("accept", [
+    None,
+    '*/*',
+    'application/json',
+    'application/json, application/msgpack;q=0.5',
+])
+def test_json_is_the_default(client, accept):
+    create_transactions(client)
+    headers = {'Accept': accept} if accept else {}
+
+    response = client.get('/transactions', headers=headers)
+    assert response.mimetype == 'application/json'
+    assert len(response.get_json()['transactions']) == 3
+
+def test_etag_differs_per_format(client):
+    create_transactions(client)
+
+    json_etag = client.get('/transactions').headers['ETag']
+    response = client.get('/transactions', headers={'Accept': 'application/msgpack', 'If-None-Match': json_etag})
+    assert response.status_code == 200
+    assert response.headers['ETag'] != json_etag
+
+def test_get_transaction_as_msgpack(client):
+    create_transactions(client)
+
+    response = client.get('/transactions/1', headers={'Accept': 'application/x-msgpack'})
+    data = msgpack.unpackb(response.data)
+    assert data['id'] == 1
+    assert data['amount'] == 100.0
+    assert isinstance(data['timestamp'], str)
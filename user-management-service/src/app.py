@@ -0,0 +1,203 @@
+import time
+
+_import_started = time.perf_counter()
+
+import os
+import sys
+
+# Add the current directory to sys.path
+current_dir = os.path.dirname(os.path.abspath(__file__))
+if current_dir not in sys.path:
+    sys.path.insert(0, current_dir)
+
+from flask import Blueprint, Flask, current_app, jsonify, request
+from sqlalchemy.exc import IntegrityError
+import logging
+from config import get_config
+from models import db, User
+from auth import HasherBusy, InvalidToken, PasswordHasher, TokenSigner, TTLCache
+
+_import_ms = round((time.perf_counter() - _import_started) * 1000, 1)
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+bp = Blueprint('users', __name__)
+
+MIN_PASSWORD_LENGTH = 8
+
+def _evict_user(user_id):
+    current_app.extensions['user_cache'].delete(f'id:{user_id}')
+
+def _load_user(user_id):
+    """Return the cached public record of a user, loading it on a miss.
+
+    Only public fields are cached. Credentials are always read from the
+    database, since other worker processes can't evict their copies.
+    """
+    cache = current_app.extensions['user_cache']
+    key = f'id:{user_id}'
+    record = cache.get(key)
+    if record is not None:
+        return record
+    user = db.session.get(User, user_id)
+    if user is None:
+        return None
+    record = user.to_dict()
+    cache.set(key, record)
+    return record
+
+def _validate_password(password):
+    if not isinstance(password, str) or len(password) < MIN_PASSWORD_LENGTH:
+        raise ValueError(f"Password must be at least {MIN_PASSWORD_LENGTH} characters")
+    return password
+
+@bp.route('/users', methods=['POST'])
+def create_user():
+    data = request.get_json(silent=True)
+    if not data or 'username' not in data or 'password' not in data:
+        return jsonify({'error': 'Invalid input'}), 400
+    try:
+        password_hash = current_app.extensions['password_hasher'].hash(_validate_password(data['password']))
+        user = User(username=data['username'], email=data.get('email'), password_hash=password_hash)
+        db.session.add(user)
+        db.session.commit()
+        return jsonify(user.to_dict()), 201
+    except ValueError as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 400
+    except HasherBusy as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 503
+    except IntegrityError:
+        db.session.rollback()
+        return jsonify({'error': 'Username already exists'}), 409
+    except Exception as e:
+        db.session.rollback()
+        logging.error(f'Unexpected error: {str(e)}')
+        return jsonify({'error': 'An unexpected error occurred'}), 500
+
+@bp.route('/users/<int:user_id>', methods=['GET'])
+def get_user(user_id):
+    record = _load_user(user_id)
+    if record is None:
+        return jsonify({'error': 'User does not exist'}), 404
+    return jsonify(record)
+
+@bp.route('/users/<int:user_id>', methods=['PUT'])
+def update_user(user_id):
+    user = db.session.get(User, user_id)
+    if user is None:
+        return jsonify({'error': 'User does not exist'}), 404
+    data = request.get_json(silent=True)
+    if not data:
+        return jsonify({'error': 'Invalid input'}), 400
+
+    try:
+        if 'username' in data:
+            user.username = data['username']
+        if 'email' in data:
+            user.email = data['email']
+        if 'password' in data:
+            user.password_hash = current_app.extensions['password_hasher'].hash(_validate_password(data['password']))
+        db.session.commit()
+    except ValueError as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 400
+    except HasherBusy as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 503
+    except IntegrityError:
+        db.session.rollback()
+        return jsonify({'error': 'Username already exists'}), 409
+    finally:
+        _evict_user(user_id)
+    return jsonify(user.to_dict())
+
+@bp.route('/users/<int:user_id>', methods=['DELETE'])
+def delete_user(user_id):
+    user = db.session.get(User, user_id)
+    if user is None:
+        return jsonify({'error': 'User does not exist'}), 404
+    db.session.delete(user)
+    db.session.commit()
+    _evict_user(user_id)
+    return jsonify({'message': 'User deleted successfully'}), 200
+
+@bp.route('/auth/token', methods=['POST'])
+def issue_token():
+    data = request.get_json(silent=True)
+    if not data or 'username' not in data or 'password' not in data:
+        return jsonify({'error': 'Invalid input'}), 400
+
+    user = User.query.filter_by(username=data['username']).first()
+    hasher = current_app.extensions['password_hasher']
+    try:
+        if user is None or not hasher.verify(user.password_hash, str(data['password'])):
+            return jsonify({'error': 'Invalid credentials'}), 401
+    except HasherBusy as e:
+        return jsonify({'error': str(e)}), 503
+
+    signer = current_app.extensions['token_signer']
+    token = signer.issue(user.id, user.username)
+    return jsonify({'token': token, 'token_type': 'Bearer', 'expires_in': signer.max_age}), 200
+
+@bp.route('/auth/verify', methods=['GET'])
+def verify_token():
+    header = request.headers.get('Authorization', '')
+    scheme, _, token = header.partition(' ')
+    if scheme.lower() != 'bearer' or not token:
+        return jsonify({'error': 'Missing bearer token'}), 401
+    try:
+        claims = current_app.extensions['token_signer'].verify(token)
+    except InvalidToken as e:
+        return jsonify({'error': str(e)}), 401
+    return jsonify(claims), 200
+
+@bp.route('/health', methods=['GET'])
+def health():
+    return jsonify({
+        'status': 'ok',
+        'import_ms': current_app.config['IMPORT_MS'],
+        'boot_ms': current_app.config['BOOT_MS']
+    }), 200
+
+@bp.app_errorhandler(404)
+def not_found(e):
+    return jsonify(error=str(e.description)), 404
+
+def init_db(app):
+    with app.app_context():
+        db.create_all()
+
+def create_app(config_name=None):
+    boot_started = time.perf_counter()
+    app = Flask(__name__)
+    app.config.from_object(get_config(config_name))
+    if not app.config['SECRET_KEY']:
+        raise RuntimeError('SECRET_KEY must be set outside development and testing')
+
+    # Engines connect lazily; the only query at boot is create_all when CREATE_SCHEMA is set
+    db.init_app(app)
+
+    app.extensions['password_hasher'] = PasswordHasher(
+        max_workers=app.config['PASSWORD_HASH_WORKERS'],
+        timeout=app.config['PASSWORD_HASH_TIMEOUT']
+    )
+    app.extensions['token_signer'] = TokenSigner(app.config['SECRET_KEY'], max_age=app.config['TOKEN_MAX_AGE'])
+    app.extensions['user_cache'] = TTLCache(maxsize=app.config['USER_CACHE_SIZE'], ttl=app.config['USER_CACHE_TTL'])
+
+    app.register_blueprint(bp)
+
+    if app.config['CREATE_SCHEMA']:
+        init_db(app)
+
+    app.config['IMPORT_MS'] = _import_ms
+    app.config['BOOT_MS'] = round((time.perf_counter() - boot_started) * 1000, 1)
+    logger.info('App created in %.1f ms (imports took %.1f ms)', app.config['BOOT_MS'], app.config['IMPORT_MS'])
+    return app
+
+if __name__ == '__main__':
+    app = create_app()
+    app.run(debug=True, host='0.0.0.0', port=5000)
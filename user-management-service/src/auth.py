@@ -0,0 +1,111 @@
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+
+from itsdangerous import BadSignature, SignatureExpired, URLSafeTimedSerializer
+from werkzeug.security import check_password_hash, generate_password_hash
+
+
+class InvalidToken(Exception):
+    pass
+
+
+class HasherBusy(Exception):
+    pass
+
+
+class PasswordHasher:
+    """Runs password hashing on a bounded worker pool.
+
+    The pool caps how many CPU-heavy hashes run at the same time. The
+    calling request thread still waits for its result, for at most
+    ``timeout`` seconds, after which ``HasherBusy`` is raised.
+    """
+
+    def __init__(self, max_workers=4, timeout=5):
+        self.timeout = timeout
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='hasher')
+
+    def _run(self, func, *args):
+        future = self._executor.submit(func, *args)
+        try:
+            return future.result(self.timeout)
+        except FutureTimeout:
+            # Don't leave an abandoned hash queued behind the others
+            future.cancel()
+            raise HasherBusy("Password hashing is overloaded")
+
+    def hash(self, password):
+        return self._run(generate_password_hash, password)
+
+    def verify(self, password_hash, password):
+        return self._run(check_password_hash, password_hash, password)
+
+    def shutdown(self):
+        self._executor.shutdown(wait=True)
+
+
+class TokenSigner:
+    """Issues and verifies stateless HMAC-signed tokens.
+
+    Verification only checks the signature and age, so it never touches
+    the database.
+    """
+
+    def __init__(self, secret_key, max_age=3600, salt='user-token'):
+        if not secret_key:
+            raise ValueError("A secret key is required to sign tokens")
+        self.max_age = max_age
+        self._serializer = URLSafeTimedSerializer(secret_key, salt=salt)
+
+    def issue(self, user_id, username):
+        return self._serializer.dumps({'user_id': user_id, 'username': username})
+
+    def verify(self, token):
+        try:
+            return self._serializer.loads(token, max_age=self.max_age)
+        except SignatureExpired:
+            raise InvalidToken("Token has expired")
+        except BadSignature:
+            raise InvalidToken("Invalid token")
+
+
+class TTLCache:
+    """A small thread-safe LRU cache whose entries also expire after ``ttl`` seconds."""
+
+    def __init__(self, maxsize=10000, ttl=60):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        now = time.monotonic()
+        with self._lock:
+            item = self._data.get(key)
+            if item is None or item[1] < now:
+                if item is not None:
+                    del self._data[key]
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return item[0]
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + self.ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
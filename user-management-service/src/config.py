@@ -0,0 +1,43 @@
+import os
+
+
+class Config:
+    SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL', 'sqlite:///users.db')
+    SQLALCHEMY_TRACK_MODIFICATIONS = False
+    # Signs tokens. Only development and testing fall back to a known key,
+    # anywhere else the app refuses to start without one.
+    SECRET_KEY = os.environ.get('SECRET_KEY')
+    # Create missing tables at boot. Production schemas are created ahead of deploys.
+    CREATE_SCHEMA = True
+    TOKEN_MAX_AGE = 3600
+    USER_CACHE_SIZE = 10000
+    USER_CACHE_TTL = 60
+    # Password hashing is CPU bound, this caps how many run at once
+    PASSWORD_HASH_WORKERS = 4
+    PASSWORD_HASH_TIMEOUT = 5
+
+
+class DevelopmentConfig(Config):
+    DEBUG = True
+    SECRET_KEY = os.environ.get('SECRET_KEY', 'dev-secret-key')
+
+
+class TestingConfig(Config):
+    TESTING = True
+    SQLALCHEMY_DATABASE_URI = 'sqlite:///:memory:'
+    SECRET_KEY = os.environ.get('SECRET_KEY', 'dev-secret-key')
+
+
+class ProductionConfig(Config):
+    CREATE_SCHEMA = False
+
+
+configs = {
+    'development': DevelopmentConfig,
+    'testing': TestingConfig,
+    'production': ProductionConfig
+}
+
+
+def get_config(name=None):
+    return configs[name or os.environ.get('APP_ENV', 'development')]
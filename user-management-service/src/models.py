@@ -0,0 +1,45 @@
+from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy.orm import DeclarativeBase, validates
+from datetime import datetime
+
+
+class Base(DeclarativeBase):
+    pass
+
+db = SQLAlchemy(model_class=Base)
+
+class User(db.Model):
+    __tablename__ = 'users'
+
+    id = db.Column(db.Integer, primary_key=True)
+    username = db.Column(db.String(80), unique=True, nullable=False)
+    email = db.Column(db.String(120))
+    password_hash = db.Column(db.String(256), nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    @validates('username')
+    def validate_username(self, key, value):
+        if not isinstance(value, str) or not value.strip():
+            raise ValueError("Username is required")
+        if len(value) > 80:
+            raise ValueError("Username is too long")
+        return value.strip()
+
+    @validates('email')
+    def validate_email(self, key, value):
+        if value is None:
+            return value
+        if not isinstance(value, str) or '@' not in value or len(value) > 120:
+            raise ValueError("Invalid email")
+        return value
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'username': self.username,
+            'email': self.email,
+            'created_at': self.created_at.isoformat() if self.created_at else None
+        }
+
+    def __repr__(self):
+        return f'<User {self.username}>'
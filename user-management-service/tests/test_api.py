@@ -0,0 +1,189 @@
+import os
+import sys
+import sqlite3
+import pytest
+from flask import json
+
+
+# Add the src directory to sys.path
+src_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src'))
+sys.path.insert(0, src_dir)
+
+import config
+from app import create_app
+from models import db
+from auth import HasherBusy
+
+@pytest.fixture
+def app():
+    app = create_app('testing')
+    yield app
+    with app.app_context():
+        db.session.remove()
+        db.drop_all()
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+def create_user(client, username='alice', password='correct horse', email='alice@example.com'):
+    return client.post(
+        '/users',
+        data=json.dumps({'username': username, 'password': password, 'email': email}),
+        content_type='application/json'
+    )
+
+def test_create_user(client):
+    response = create_user(client)
+    assert response.status_code == 201
+    data = response.get_json()
+    assert data['username'] == 'alice'
+    assert data['email'] == 'alice@example.com'
+    assert 'password' not in data
+    assert 'password_hash' not in data
+
+@pytest.mark.parametrize("payload, expected_status", [
+    ({'username': 'bob'}, 400),                                   # Missing password
+    ({'password': 'long enough'}, 400),                           # Missing username
+    ({'username': 'bob', 'password': 'short'}, 400),              # Password too short
+    ({'username': '', 'password': 'long enough'}, 400),           # Empty username
+    ({'username': 'bob', 'password': 'long enough', 'email': 'nope'}, 400),  # Invalid email
+])
+def test_create_user_with_invalid_input(client, payload, expected_status):
+    response = client.post('/users', data=json.dumps(payload), content_type='application/json')
+    assert response.status_code == expected_status
+    assert 'error' in response.get_json()
+
+def test_create_duplicate_user(client):
+    assert create_user(client).status_code == 201
+    response = create_user(client)
+    assert response.status_code == 409
+
+def test_get_user_is_cached(app, client):
+    user_id = create_user(client).get_json()['id']
+
+    assert client.get(f'/users/{user_id}').status_code == 200
+    response = client.get(f'/users/{user_id}')
+    assert response.status_code == 200
+    assert response.get_json()['username'] == 'alice'
+    assert 'password_hash' not in response.get_json()
+    assert app.extensions['user_cache'].hits >= 1
+
+    assert client.get('/users/999').status_code == 404
+
+def test_update_user_invalidates_cache(client):
+    user_id = create_user(client).get_json()['id']
+    client.get(f'/users/{user_id}')
+
+    response = client.put(f'/users/{user_id}', data=json.dumps({'email': 'new@example.com'}),
+                          content_type='application/json')
+    assert response.status_code == 200
+    assert client.get(f'/users/{user_id}').get_json()['email'] == 'new@example.com'
+
+def test_delete_user(client):
+    user_id = create_user(client).get_json()['id']
+    client.get(f'/users/{user_id}')
+
+    assert client.delete(f'/users/{user_id}').status_code == 200
+    assert client.get(f'/users/{user_id}').status_code == 404
+    assert client.delete(f'/users/{user_id}').status_code == 404
+
+def test_issue_and_verify_token(client):
+    user_id = create_user(client).get_json()['id']
+
+    response = client.post('/auth/token', data=json.dumps({'username': 'alice', 'password': 'correct horse'}),
+                           content_type='application/json')
+    assert response.status_code == 200
+    token = response.get_json()['token']
+
+    response = client.get('/auth/verify', headers={'Authorization': f'Bearer {token}'})
+    assert response.status_code == 200
+    assert response.get_json() == {'user_id': user_id, 'username': 'alice'}
+
+@pytest.mark.parametrize("username, password", [
+    ('alice', 'wrong password'),
+    ('nobody', 'correct horse'),
+])
+def test_issue_token_with_bad_credentials(client, username, password):
+    create_user(client)
+    response = client.post('/auth/token', data=json.dumps({'username': username, 'password': password}),
+                           content_type='application/json')
+    assert response.status_code == 401
+
+@pytest.mark.parametrize("header", [
+    None,
+    'Bearer',
+    'Basic abc',
+    'Bearer not-a-token',
+])
+def test_verify_rejects_bad_tokens(client, header):
+    headers = {'Authorization': header} if header else {}
+    response = client.get('/auth/verify', headers=headers)
+    assert response.status_code == 401
+    assert 'error' in response.get_json()
+
+def test_password_change_applies_to_login(client):
+    user_id = create_user(client).get_json()['id']
+    client.post('/auth/token', data=json.dumps({'username': 'alice', 'password': 'correct horse'}),
+                content_type='application/json')
+
+    client.put(f'/users/{user_id}', data=json.dumps({'password': 'battery staple'}), content_type='application/json')
+
+    response = client.post('/auth/token', data=json.dumps({'username': 'alice', 'password': 'correct horse'}),
+                           content_type='application/json')
+    assert response.status_code == 401
+    response = client.post('/auth/token', data=json.dumps({'username': 'alice', 'password': 'battery staple'}),
+                           content_type='application/json')
+    assert response.status_code == 200
+
+def test_cache_holds_no_credentials(app, client):
+    user_id = create_user(client).get_json()['id']
+    client.get(f'/users/{user_id}')
+    assert 'password_hash' not in app.extensions['user_cache'].get(f'id:{user_id}')
+
+def test_login_reads_credentials_from_the_database(app, client):
+    user_id = create_user(client).get_json()['id']
+    client.get(f'/users/{user_id}')
+
+    # Another worker process deletes the user; this process's cache never hears of it
+    with app.app_context():
+        db.session.execute(db.text('DELETE FROM users'))
+        db.session.commit()
+
+    response = client.post('/auth/token', data=json.dumps({'username': 'alice', 'password': 'correct horse'}),
+                           content_type='application/json')
+    assert response.status_code == 401
+
+def test_overloaded_hasher_returns_503(app, client, monkeypatch):
+    create_user(client)
+
+    def busy(*args):
+        raise HasherBusy("Password hashing is overloaded")
+    monkeypatch.setattr(app.extensions['password_hasher'], 'verify', busy)
+
+    response = client.post('/auth/token', data=json.dumps({'username': 'alice', 'password': 'correct horse'}),
+                           content_type='application/json')
+    assert response.status_code == 503
+
+def test_health(client):
+    response = client.get('/health')
+    assert response.status_code == 200
+    data = response.get_json()
+    assert data['status'] == 'ok'
+    assert data['boot_ms'] >= 0
+    assert data['import_ms'] >= 0
+
+def test_production_app_leaves_the_schema_alone(tmp_path, monkeypatch):
+    database = tmp_path / 'users.db'
+    monkeypatch.setattr(config.ProductionConfig, 'SQLALCHEMY_DATABASE_URI', f'sqlite:///{database}')
+    monkeypatch.setattr(config.ProductionConfig, 'SECRET_KEY', 'production-secret')
+    app = create_app('production')
+
+    assert app.test_client().get('/health').status_code == 200
+    with sqlite3.connect(database) as connection:
+        assert connection.execute("SELECT name FROM sqlite_master WHERE type = 'table'").fetchall() == []
+
+def test_production_app_requires_a_secret_key(monkeypatch):
+    monkeypatch.setattr(config.ProductionConfig, 'SECRET_KEY', None)
+    with pytest.raises(RuntimeError, match='SECRET_KEY'):
+        create_app('production')
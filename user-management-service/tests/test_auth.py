@@ -0,0 +1,63 @@
+import os
+import sys
+import threading
+import time
+import pytest
+
+
+# Add the src directory to sys.path
+src_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src'))
+sys.path.insert(0, src_dir)
+
+from auth import HasherBusy, InvalidToken, PasswordHasher, TokenSigner, TTLCache
+
+def test_password_hasher_round_trip():
+    hasher = PasswordHasher(max_workers=2)
+    password_hash = hasher.hash('correct horse')
+    assert password_hash != 'correct horse'
+    assert hasher.verify(password_hash, 'correct horse')
+    assert not hasher.verify(password_hash, 'wrong')
+    hasher.shutdown()
+
+def test_token_signed_with_other_key_is_rejected():
+    token = TokenSigner('one').issue(1, 'alice')
+    assert TokenSigner('one').verify(token) == {'user_id': 1, 'username': 'alice'}
+    with pytest.raises(InvalidToken):
+        TokenSigner('two').verify(token)
+
+def test_expired_token_is_rejected():
+    signer = TokenSigner('secret', max_age=-1)
+    with pytest.raises(InvalidToken, match='expired'):
+        signer.verify(signer.issue(1, 'alice'))
+
+def test_token_signer_requires_key():
+    with pytest.raises(ValueError):
+        TokenSigner(None)
+
+def test_cache_evicts_least_recently_used():
+    cache = TTLCache(maxsize=2, ttl=60)
+    cache.set('a', 1)
+    cache.set('b', 2)
+    cache.get('a')
+    cache.set('c', 3)
+    assert cache.get('a') == 1
+    assert cache.get('b') is None
+    assert cache.get('c') == 3
+
+def test_cache_entries_expire():
+    cache = TTLCache(ttl=0.01)
+    cache.set('a', 1)
+    time.sleep(0.02)
+    assert cache.get('a') is None
+    assert cache.misses == 1
+
+def test_password_hasher_times_out():
+    hasher = PasswordHasher(max_workers=1, timeout=0.01)
+    release = threading.Event()
+    hasher._executor.submit(release.wait)
+    try:
+        with pytest.raises(HasherBusy):
+            hasher.hash('correct horse')
+    finally:
+        release.set()
+        hasher.shutdown()